@@ -0,0 +1,65 @@
+import pytest
+from treevalue import TreeValue, FastTreeValue, func_treelize
+
+from treetensor.common import leafwise_call, broadcast_treelize
+from treetensor.utils import replaceable_partial
+
+
+@pytest.mark.unittest
+class TestCommonDispatch:
+    def test_leafwise_call(self):
+        t1 = TreeValue({'a': 1, 'b': {'x': 2}})
+        t2 = TreeValue({'b': {'x': 20}, 'a': 10})
+        spec, results = leafwise_call(lambda x, y, scale=1: (x + y) * scale, (t1, t2), {'scale': 2})
+        assert dict(zip(spec.paths, results)) == {('a',): 22, ('b', 'x'): 44}
+
+        spec, results = leafwise_call(sum, ([t1, t2, 100],), {})
+        assert dict(zip(spec.paths, results)) == {('a',): 111, ('b', 'x'): 122}
+
+        with pytest.raises(KeyError):
+            leafwise_call(lambda x, y: x + y, (t1, TreeValue({'a': 1})), {})
+        with pytest.raises(TypeError):
+            leafwise_call(lambda x: x, (1,), {})
+
+    def test_leafwise_broadcast(self):
+        t1 = TreeValue({'a': 1, 'b': {'x': 2, 'y': 3}})
+        t2 = TreeValue({'b': 10, 'a': 100})
+        spec, results = leafwise_call(lambda x, y: x * y, (t2, t1), {})
+        assert dict(zip(spec.paths, results)) == {('a',): 100, ('b', 'x'): 20, ('b', 'y'): 30}
+
+        with pytest.raises(KeyError):
+            leafwise_call(lambda x, y: x + y, (t1, TreeValue({'a': 1, 'b': {'x': 2}})), {})
+
+        # the prefix tree with more leaves is the first argument
+        p = TreeValue({'a': 1, 'b': 2, 'c': 3})
+        t = TreeValue({'a': {'x': 10, 'y': 20}, 'b': 30, 'c': 40})
+        for args in [(p, t), (t, p)]:
+            spec, results = leafwise_call(lambda x, y: x * y, args, {})
+            assert dict(zip(spec.paths, results)) == {('a', 'x'): 10, ('a', 'y'): 20, ('b',): 60, ('c',): 120}
+
+    def test_broadcast_treelize(self):
+        calls = []
+        treelize = broadcast_treelize(replaceable_partial(func_treelize, return_type=FastTreeValue), FastTreeValue)
+
+        @treelize()
+        def mul(x, y):
+            calls.append((x, y))
+            return x * y
+
+        t = FastTreeValue({'obs': {'a': 1, 'b': 2}, 'reward': 3})
+        assert mul(t, {'obs': 10, 'reward': 100}) == FastTreeValue({'obs': {'a': 10, 'b': 20}, 'reward': 300})
+        assert mul(TreeValue({'obs': 10, 'reward': 100}), y=t) == \
+               FastTreeValue({'obs': {'a': 10, 'b': 20}, 'reward': 300})
+        assert len(calls) == 6
+        assert mul(t, t) == FastTreeValue({'obs': {'a': 1, 'b': 4}, 'reward': 9})
+        assert mul(t, 2) == FastTreeValue({'obs': {'a': 2, 'b': 4}, 'reward': 6})
+        assert mul(2, 3) == 6
+        with pytest.raises(KeyError):
+            mul(t, {'obs': 10})
+
+        @treelize(inherit=False)
+        def add(x, y):
+            return x + y
+
+        with pytest.raises(TypeError):  # raised by the original func_treelize
+            add(t, FastTreeValue({'obs': 10, 'reward': 100}))
@@ -24,3 +24,7 @@ class TestCommonObject:
         assert not Object({'a': False, 'b': {'x': False}}).any()
         assert Object({'a': True, 'b': {'x': False}}).any()
         assert Object({'a': True, 'b': {'x': True}}).any()
+
+    def test_pack(self):
+        packed = Object({'a': 1, 'b': {'x': 2, 'y': 3}}).pack()
+        assert (packed * 2 + 1).unpack() == Object({'a': 3, 'b': {'x': 5, 'y': 7}})
@@ -0,0 +1,121 @@
+import gc
+
+import numpy as np
+import pytest
+import torch
+
+import treetensor.torch as ttorch
+from treetensor.common import Object, ScalarArray, TreeSpec
+
+
+@pytest.mark.unittest
+class TestCommonScalars:
+    def test_pack(self):
+        t = Object({'a': 1.0, 'b': {'x': 2.0, 'y': 3.5}})
+        p = t.pack()
+        assert isinstance(p, ScalarArray)
+        assert isinstance(p.spec, TreeSpec)
+        assert len(p) == 3
+        assert p.values.dtype == np.float64
+        assert p['a'] == 1.0
+        assert p['b.y'] == 3.5
+        assert p[('b', 'x')] == 2.0
+        assert p.unpack() == t
+        assert 'leaves: 3' in repr(p)
+        assert 'leaves: 3' in repr(p.spec)
+
+        assert Object({'a': 2.0, 'b': {'x': 1.0, 'y': 0.0}}).pack().spec is p.spec
+        assert ScalarArray.from_tree({'a': True, 'b': False}).values.dtype == np.bool_
+        assert Object({'a': 1, 'b': 2}).pack().values.dtype.kind == 'i'
+
+        with pytest.raises(TypeError):
+            Object({'a': 'str', 'b': 1}).pack()
+        with pytest.raises(TypeError):
+            Object({'a': [1, 2], 'b': [3, 4]}).pack()
+        with pytest.raises(ValueError):
+            ScalarArray(p.spec, np.zeros(2))
+
+    def test_operators(self):
+        p = Object({'a': 1.0, 'b': {'x': 2.0, 'y': 3.5}}).pack()
+        q = Object({'b': {'y': 7, 'x': 4}, 'a': 2}).pack()
+
+        assert (p / q).unpack() == Object({'a': 0.5, 'b': {'x': 0.5, 'y': 0.5}})
+        assert (p + 1).unpack() == Object({'a': 2.0, 'b': {'x': 3.0, 'y': 4.5}})
+        assert (1 - p).unpack() == Object({'a': 0.0, 'b': {'x': -1.0, 'y': -2.5}})
+        assert (2 ** q).unpack() == Object({'a': 4, 'b': {'x': 16, 'y': 128}})
+        assert (q // 3 * 3 + q % 3 == q).all()
+        assert (-p).unpack() == Object({'a': -1.0, 'b': {'x': -2.0, 'y': -3.5}})
+        assert (abs(-p) == p).all()
+        assert (p + Object({'a': 1, 'b': {'x': 1, 'y': 1}})).unpack()['b']['y'] == 4.5
+        assert (p * {'a': 0, 'b': {'x': 1, 'y': 2}}).unpack()['b']['y'] == 7.0
+
+        mask = p > 1.5
+        assert mask.unpack() == Object({'a': False, 'b': {'x': True, 'y': True}})
+        assert not mask.all()
+        assert mask.any()
+        assert (~mask | mask).all()
+        assert not (~mask & mask).any()
+        assert (mask ^ mask).unpack() == Object({'a': False, 'b': {'x': False, 'y': False}})
+        assert (p <= p).all() and (p >= p).all() and not (p != p).any() and not (p < p).any()
+        with pytest.raises(ValueError):
+            bool(mask)
+        with pytest.raises(TypeError):
+            _ = p + 'str'
+        with pytest.raises(ValueError):
+            _ = p + Object({'a': 1, 'b': 2}).pack()
+
+    def test_spec_order(self):
+        a, b = TreeSpec((('a',), ('b',))), TreeSpec((('b',), ('a',)))
+        p, q = ScalarArray(a, np.array([1, 2])), ScalarArray(b, np.array([20, 10]))
+        assert (p + q).values.tolist() == [11, 22]
+        assert a.order_of(b).tolist() == [1, 0]
+        with pytest.raises(ValueError):
+            a.order_of(TreeSpec((('a',), ('c',))))
+        assert TreeSpec.of([('x',), ('y', 'z')]) is TreeSpec.of((('x',), ('y', 'z')))
+
+    def test_broadcast_of(self):
+        deep = TreeSpec.of([('obs', 'a'), ('obs', 'b', 'c'), ('reward',)])
+        prefix = TreeSpec.of([('reward',), ('obs',)])
+        assert deep.broadcast_of(prefix).tolist() == [1, 1, 0]
+        assert deep.broadcast_of(prefix) is deep.broadcast_of(prefix)
+        assert deep.broadcast_of(deep).tolist() == [0, 1, 2]
+        assert deep.broadcast_of(TreeSpec.of([('obs', 'b'), ('obs', 'a'), ('reward',)])).tolist() == [1, 0, 2]
+
+        with pytest.raises(ValueError):
+            deep.broadcast_of(TreeSpec.of([('obs',)]))
+        with pytest.raises(ValueError):
+            deep.broadcast_of(TreeSpec.of([('obs',), ('reward',), ('done',)]))
+        with pytest.raises(ValueError):
+            prefix.broadcast_of(deep)
+
+    def test_spec_cache(self):
+        from treetensor.common.scalars import _get_spec
+        prefix = TreeSpec.of([('a',), ('b',)])
+        for i in range(5000):  # the trees with changing keys, such as the ids of the episodes
+            spec = TreeSpec.of([('a',), ('b', f'k{i}')])
+            assert spec.broadcast_of(prefix).tolist() == [0, 1]
+        assert _get_spec.cache_info().currsize <= _get_spec.cache_info().maxsize
+
+        other = TreeSpec((('b',), ('a',)))
+        assert prefix.order_of(other).tolist() == [1, 0]
+        assert prefix.broadcast_of(other).tolist() == [1, 0]
+        assert len(prefix._orders) == 1 and len(prefix._broadcasts) == 1
+        del other
+        gc.collect()
+        assert len(prefix._orders) == 0 and len(prefix._broadcasts) == 0
+
+    def test_reductions(self):
+        p = Object({'a': 1.0, 'b': {'x': 2.0, 'y': 3.0}}).pack()
+        assert p.sum() == 6.0
+        assert p.mean() == 2.0
+        assert p.min() == 1.0
+        assert p.max() == 3.0
+        assert isinstance(p.sum(), float)
+
+    def test_tensor(self):
+        p = ttorch.Tensor({'a': torch.tensor(1.5), 'b': {'x': torch.tensor(2.5)}}).tolist().pack()
+        assert p.tensor().tolist() == p.values.tolist()
+        t = p.to_tensor()
+        assert isinstance(t, ttorch.Tensor)
+        assert (t == ttorch.Tensor({'a': torch.tensor(1.5, dtype=torch.float64),
+                                    'b': {'x': torch.tensor(2.5, dtype=torch.float64)}})).all()
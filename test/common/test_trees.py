@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+import torch
+
+import treetensor.numpy as tnp
+import treetensor.torch as ttorch
+from treetensor.common import Object
+
+
+def _wide_tree(n=64):
+    return ttorch.randn({f'k{i}': (16, 8) for i in range(n)})
+
+
+@pytest.mark.unittest
+class TestCommonTrees:
+    def test_scalar_operator(self):
+        t = Object({'a': 1, 'b': {'x': 2, 'y': 3}})
+        assert t + 1 == Object({'a': 2, 'b': {'x': 3, 'y': 4}})
+        assert 10 - t == Object({'a': 9, 'b': {'x': 8, 'y': 7}})
+        assert t * 0.5 == Object({'a': 0.5, 'b': {'x': 1.0, 'y': 1.5}})
+        assert 2 ** t == Object({'a': 2, 'b': {'x': 4, 'y': 8}})
+        assert -t == Object({'a': -1, 'b': {'x': -2, 'y': -3}})
+        assert ~t == Object({'a': -2, 'b': {'x': -3, 'y': -4}})
+        assert type(t + 1) is Object
+
+        tt = ttorch.tensor({'a': [1.0, -2.0], 'b': {'x': [3.0]}})
+        assert isinstance(tt * 2, ttorch.Tensor)
+        assert ttorch.equal(tt * 2, ttorch.tensor({'a': [2.0, -4.0], 'b': {'x': [6.0]}}))
+        assert ttorch.equal(1 - tt, ttorch.tensor({'a': [0.0, 3.0], 'b': {'x': [-2.0]}}))
+        assert ttorch.equal(tt > 0, ttorch.tensor({'a': [True, False], 'b': {'x': [True]}}))
+        assert ttorch.equal(tt == 1.0, ttorch.tensor({'a': [True, False], 'b': {'x': [False]}}))
+
+        nt = tnp.array({'a': [1, 2], 'b': {'x': [3]}})
+        r = nt <= 2
+        assert isinstance(r, tnp.ndarray)
+        assert np.array_equal(r.a, [True, True])
+        assert np.array_equal(r.b.x, [False])
+
+    def test_tree_operator(self):
+        t1 = ttorch.tensor({'a': [1.0, 2.0], 'b': {'x': [3.0], 'y': [4.0]}})
+        t2 = ttorch.tensor({'b': {'y': [1.0], 'x': [2.0]}, 'a': [3.0, 4.0]})
+        assert ttorch.equal(t1 + t1, t1 * 2)
+        assert ttorch.equal(t1 - t2, ttorch.tensor({'a': [-2.0, -2.0], 'b': {'x': [1.0], 'y': [3.0]}}))
+        assert ttorch.equal(t2 - t1, -(t1 - t2))
+        assert ttorch.equal(t1 < t2, ttorch.tensor({'a': [True, True], 'b': {'x': [False], 'y': [False]}}))
+
+        # the other operands are broadcast by the original operators
+        assert ttorch.equal(t1 + torch.tensor([1.0]), t1 + 1)
+        assert (Object({'a': 1, 'b': 2}) + Object({'a': 10, 'b': {'x': 20}})) == \
+               Object({'a': 11, 'b': {'x': 22}})
+        with pytest.raises(KeyError):
+            _ = t1 + ttorch.tensor({'a': [1.0, 2.0], 'b': {'x': [3.0]}})
+
+    def test_prefix_operator(self):
+        t = ttorch.tensor({'obs': {'a': [1.0, 2.0], 'b': [3.0]}, 'reward': [1.0]})
+        expected = ttorch.tensor({'obs': {'a': [0.5, 1.0], 'b': [1.5]}, 'reward': [2.0]})
+        assert ttorch.equal(t * {'obs': 0.5, 'reward': 2.0}, expected)
+        assert ttorch.equal({'obs': 0.5, 'reward': 2.0} * t, expected)
+        assert ttorch.equal(t * Object({'obs': 0.5, 'reward': 2.0}), expected)
+        assert ttorch.equal(t > {'obs': 1.5, 'reward': 0.0},
+                            ttorch.tensor({'obs': {'a': [False, True], 'b': [True]}, 'reward': [True]}))
+
+        p, d = ttorch.tensor({'a': 2.0}), ttorch.tensor({'a': {'x': [1.0, 2.0]}})
+        expected = ttorch.tensor({'a': {'x': [2.0, 4.0]}})
+        for r in [ttorch.mul(p, d), ttorch.mul(d, p), torch.mul(p, d), p * d, d * p]:
+            assert ttorch.equal(r, expected)
+        assert ttorch.equal(ttorch.eq(p, d), p == d)
+        assert ttorch.equal(ttorch.eq(p, d), ttorch.tensor({'a': {'x': [False, True]}}))
+        pn, dn = tnp.array({'a': 2.0}), tnp.array({'a': {'x': [1.0, 2.0]}})
+        assert np.multiply(pn, dn).a.x.tolist() == [2.0, 4.0]
+        assert tnp.multiply(pn, dn).a.x.tolist() == [2.0, 4.0]
+
+        s = ttorch.tensor({'obs': [2.0], 'reward': [3.0]})
+        assert ttorch.equal(s + t, ttorch.tensor({'obs': {'a': [3.0, 4.0], 'b': [5.0]}, 'reward': [4.0]}))
+        with pytest.raises(KeyError):
+            _ = t * {'obs': 0.5}
+        with pytest.raises(KeyError):
+            _ = t * {'obs': 0.5, 'reward': 2.0, 'done': 1.0}
+
+    def test_operator_cache(self):
+        t = Object({'a': 1, 'b': 2})
+        assert t + 1 == Object({'a': 2, 'b': 3})
+        t.c = 3
+        assert t + 1 == Object({'a': 2, 'b': 3, 'c': 4})
+        del t.a
+        assert t * 2 == Object({'b': 4, 'c': 6})
+
+        r = (t + 1) * 2
+        assert r == Object({'b': 6, 'c': 8})
+        r.b = 0
+        assert r + 1 == Object({'b': 1, 'c': 9})
+
+
+@pytest.mark.benchmark
+class TestCommonTreesBenchmark:
+    @pytest.mark.parametrize('op', ['add', 'mul', 'gt', 'tree'])
+    def test_operator(self, benchmark, op):
+        t = _wide_tree()
+        benchmark({
+            'add': lambda: t + 1,
+            'mul': lambda: t * 0.99,
+            'gt': lambda: t > 0,
+            'tree': lambda: t + t,
+        }[op])
+
+    @pytest.mark.parametrize('op', ['add', 'mul', 'gt', 'tree'])
+    def test_dict(self, benchmark, op):
+        d = {key: value for key, value in _wide_tree().items()}
+        benchmark({
+            'add': lambda: {key: value + 1 for key, value in d.items()},
+            'mul': lambda: {key: value * 0.99 for key, value in d.items()},
+            'gt': lambda: {key: value > 0 for key, value in d.items()},
+            'tree': lambda: {key: value + d[key] for key, value in d.items()},
+        }[op])
@@ -0,0 +1,65 @@
+import builtins
+
+import pytest
+import torch
+from treevalue import TreeValue, flatten
+
+import treetensor.torch as ttorch
+from treetensor.common import ireduce, Object
+
+
+@pytest.mark.unittest
+class TestCommonWrappers:
+    def test_ireduce(self):
+        @ireduce(builtins.sum, piter=list)
+        def _f(x):
+            return x
+
+        assert _f(Object({'a': 1, 'b': {'x': 2}})) == 3
+        assert _f(5) == 5
+
+    def test_ireduce_stream(self):
+        calls = []
+
+        @ireduce(builtins.all, stream=True)
+        def _positive(x, threshold=0):
+            calls.append(x)
+            return x > threshold
+
+        t = Object({'a': 1, 'b': {'x': -1, 'y': 2}, 'c': 3})
+        assert not _positive(t)
+        values = [value for _, value in flatten(t)]
+        assert calls == values[:values.index(-1) + 1]  # stops at the first decisive leaf
+
+        calls.clear()
+        assert _positive({'a': 1, 'b': {'x': 2}})
+        assert sorted(calls) == [1, 2]
+        assert not _positive(t, threshold=5)
+        assert _positive(-1, threshold=-2)  # not a tree
+
+        @ireduce(builtins.sum, stream=True)
+        def _dot(x, y, scale=1):
+            return x * y * scale
+
+        a = TreeValue({'a': 1, 'b': {'x': 2}})
+        assert _dot(a, TreeValue({'b': {'x': 3}, 'a': 4})) == 10
+        assert _dot(a, y=TreeValue({'a': 1, 'b': {'x': 1}}), scale=2) == 6
+        assert _dot(a, 2) == 6
+        with pytest.raises(KeyError):
+            _dot(a, TreeValue({'a': 1}))
+        with pytest.raises(KeyError):
+            _dot(a, TreeValue({'a': 1, 'b': {'y': 1}}))
+
+    def test_stream_reductions(self):
+        t = ttorch.Tensor({'a': torch.tensor([1., 2.]), 'b': {'x': torch.tensor([[3., 4.]])}})
+        assert ttorch.sum(t).item() == 10.
+        assert t.mean().item() == 2.5
+        assert not ttorch.all(t > 1)
+        assert ttorch.any(t > 3)
+        assert ttorch.equal(t, t.clone())
+        assert not ttorch.equal(t, t + 1)
+        with pytest.raises(KeyError):
+            ttorch.equal(t, ttorch.Tensor({'a': torch.tensor([1., 2.])}))
+        assert t.numpy().sum() == 10.
+        assert t.numpy().size == 4
+        assert t.shape.count(2) == 2
@@ -1,4 +1,5 @@
 import unittest
+import warnings
 
 import numpy as np
 import pytest
@@ -71,6 +72,41 @@ class TestNumpyArray:
         assert self._DEMO_1.sum() == 94.0
         assert self._DEMO_2.sum() == 91.0
         assert self._DEMO_3.sum() == 0.0
+        assert self._DEMO_1.sum(dtype=np.float32).dtype == np.float32
+        sums = self._DEMO_1.sum(reduce=False)
+        assert isinstance(sums, tnp.ndarray)
+        assert sums.a == self._DEMO_1.a.sum()
+
+    def test_reductions(self):
+        t = tnp.ndarray({'a': np.array([1, 2]), 'b': {'x': np.array([[3, 4]])}})
+        assert t.mean(reduce=True) == 2.5
+        assert t.var(reduce=True) == 1.25
+        assert np.isclose(t.std(ddof=1, reduce=True), np.std([1, 2, 3, 4], ddof=1))
+        assert t.max(reduce=True) == 4
+        assert t.min(reduce=True) == 1
+        assert t.argmax(reduce=True) == 3
+        assert t.argmin(reduce=True) == 0
+        assert np.array_equal(t.mean(axis=-1).b.x, np.array([3.5]))
+
+        # the methods reduce each leaf by default
+        assert isinstance(t.mean(), tnp.ndarray)
+        assert t.mean().a == 1.5
+        assert t.var().b.x == 0.25
+        assert t.max().b.x == 4
+        assert t.min().a == 1
+        assert t.argmax().a == 1
+        assert t.argmin().b.x == 0
+        assert t.std() == tnp.ndarray({'a': 0.5, 'b': {'x': 0.5}})
+
+    def test_complex_var(self):
+        t = tnp.ndarray({'a': np.array([1 + 2j, 3 - 1j]), 'b': {'x': np.array([2j, -1 + 0.5j, 4])}})
+        data = np.concatenate([t.a, t.b.x])
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', np.ComplexWarning)
+            assert np.isclose(t.var(reduce=True), np.var(data))
+            assert np.isclose(t.std(ddof=1, reduce=True), np.std(data, ddof=1))
+            assert np.isclose(tnp.var(t), np.var(data))
+            assert np.isreal(tnp.std(t))
 
     def test_all(self):
         assert self._DEMO_1.all()
@@ -269,3 +305,46 @@ class TestNumpyArray:
                 'd': ttorch.Tensor([3, 9, 11.0], dtype=torch.float64),
             }
         })).all()
+
+    def test_array_ufunc(self):
+        t = tnp.ndarray({'a': np.array([1., 2.]), 'b': {'x': np.array([3., 4.])}})
+        r = np.add(t, t)
+        assert isinstance(r, tnp.ndarray)
+        assert np.array_equal(r.a, np.array([2., 4.]))
+        assert np.allclose(np.exp(t).b.x, np.exp(np.array([3., 4.])))
+        assert np.array_equal((np.array([1., 1.]) + t).b.x, np.array([4., 5.]))
+        assert np.array_equal(np.add(t, tnp.ndarray({'b': {'x': np.array([1., 1.])}, 'a': 1.})).b.x,
+                              np.array([4., 5.]))
+
+        out = tnp.ndarray({'a': np.zeros(2), 'b': {'x': np.zeros(2)}})
+        a = out.a
+        assert np.multiply(t, 2, out=out) is out
+        assert out.a is a
+        assert np.array_equal(a, np.array([2., 4.]))
+
+        q, r = np.divmod(t, 2)
+        assert np.array_equal(q.b.x, np.array([1., 2.]))
+        assert np.array_equal(r.a, np.array([1., 0.]))
+        assert np.add.reduce(t).b.x == 7.
+        assert np.array_equal(np.multiply.outer(t, np.array([1, 2])).a, np.array([[1., 2.], [2., 4.]]))
+
+        with pytest.raises(KeyError):
+            np.add(t, tnp.ndarray({'a': np.zeros(2)}))
+        assert np.array_equal(tnp.exp(t).a, np.exp(np.array([1., 2.])))
+
+    def test_array_function(self):
+        t = tnp.ndarray({'a': np.array([1., 2.]), 'b': {'x': np.array([3., 4.])}})
+        assert np.sum(t) == 10.
+        assert np.mean(t) == 2.5
+        assert np.max(t) == 4.
+        assert np.amin(t) == 1.
+        assert np.stack([t, t]).b.x.shape == (2, 2)
+        assert np.array_equal(np.clip(t, 0, 2).b.x, np.array([2., 2.]))
+        assert np.array_equal(np.where(t > 2, t, 0).a, np.array([0., 0.]))
+
+        shapes = np.shape(t)
+        assert isinstance(shapes, Object)
+        assert shapes.b.x == (2,)
+
+        assert np.all(np.isclose(t, t))
+        assert tnp.allclose(t, t + 1e-12)
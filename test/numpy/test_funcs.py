@@ -221,3 +221,165 @@ class TestNumpyFuncs:
             'a': [6.0, 7.0, 8.0],
             'c': {'x': [12.0, 13.0, 14.0, 15.0, 16.0, 17.0]},
         }))
+
+    def test_stack_out(self):
+        a = {'a': np.array([1, 2]), 'c': {'x': 1.0}}
+        b = tnp.ndarray({'c': {'x': 2.5}, 'a': np.array([3, 4])})
+        nd = tnp.stack([a, b])
+        assert isinstance(nd, tnp.ndarray)
+        assert np.array_equal(nd.a, np.array([[1, 2], [3, 4]]))
+        assert nd.c.x.dtype == np.float64
+        assert np.array_equal(nd.c.x, np.array([1.0, 2.5]))
+        assert tnp.stack([a, b], axis=-1).a.shape == (2, 2)
+        assert tnp.stack([a, b], dtype=np.float32).a.dtype == np.float32
+
+        out = tnp.stack([b, a], out=nd)
+        assert out.a is nd.a
+        assert np.array_equal(nd.a, np.array([[3, 4], [1, 2]]))
+
+        with pytest.raises(ValueError):
+            tnp.stack([a, {'a': np.array([1, 2])}])
+        with pytest.raises(ValueError):
+            tnp.stack([])
+
+    def test_concatenate_out(self):
+        a = tnp.ndarray({'a': np.array([[1, 2]]), 'c': {'x': np.array([1.0])}})
+        b = tnp.ndarray({'a': np.array([[3, 4], [5, 6]]), 'c': {'x': np.array([2.0, 3.0])}})
+        nd = tnp.concatenate([a, b])
+        assert np.array_equal(nd.a, np.array([[1, 2], [3, 4], [5, 6]]))
+        assert np.array_equal(nd.c.x, np.array([1.0, 2.0, 3.0]))
+        assert tnp.concatenate([a, b], axis=None).a.shape == (6,)
+
+        out = tnp.concatenate([b, a], out=nd)
+        assert out.c.x is nd.c.x
+        assert np.array_equal(nd.c.x, np.array([2.0, 3.0, 1.0]))
+
+    def test_split_views(self):
+        x = tnp.ndarray({'a': np.arange(6), 'c': {'x': np.arange(12).reshape(6, 2)}})
+        ns = tnp.split(x, 3)
+        assert len(ns) == 3
+        assert np.array_equal(ns[1].a, np.array([2, 3]))
+        assert np.array_equal(ns[2].c.x, np.array([[8, 9], [10, 11]]))
+        assert np.shares_memory(ns[1].c.x, x.c.x)
+
+    def test_collate(self):
+        batch = tnp.collate([
+            {'obs': np.zeros((2, 2)), 'done': False, 'reward': 1},
+            {'obs': np.ones((2, 2)), 'done': True, 'reward': 2},
+        ])
+        assert isinstance(batch, tnp.ndarray)
+        assert batch.obs.shape == (2, 2, 2)
+        assert np.array_equal(batch.done, np.array([False, True]))
+        assert np.array_equal(batch.reward, np.array([1, 2]))
+
+        obs, action = tnp.collate([({'x': np.zeros(3)}, 1), ({'x': np.ones(3)}, 0)])
+        assert obs.x.shape == (2, 3)
+        assert np.array_equal(action, np.array([1, 0]))
+
+        out = tnp.collate([{'obs': np.ones((2, 2)), 'done': True, 'reward': 3}] * 2, out=batch)
+        assert out.obs is batch.obs
+        assert np.array_equal(batch.reward, np.array([3, 3]))
+        with pytest.raises(ValueError):
+            tnp.collate([])
+
+    def test_unstack(self):
+        batch = tnp.ndarray({'obs': np.arange(6).reshape(3, 2), 'done': np.array([False, False, True])})
+        samples = tnp.unstack(batch)
+        assert len(samples) == 3
+        assert np.array_equal(samples[0].obs, np.array([0, 1]))
+        assert samples[-1].done.shape == ()
+        assert samples[-1].done
+        assert np.shares_memory(samples[1].obs, batch.obs)
+        assert np.shares_memory(samples[1].done, batch.done)
+        assert [bool(s.done) for s in samples] == [False, False, True]
+        assert len(samples[:2]) == 2
+        with pytest.raises(IndexError):
+            _ = samples[3]
+
+        columns = tnp.unstack({'obs': batch.obs}, axis=-1)
+        assert len(columns) == 2
+        assert np.array_equal(columns[1].obs, np.array([1, 3, 5]))
+        assert np.array_equal(tnp.unstack(batch.obs)[2], np.array([4, 5]))
+        with pytest.raises(ValueError):
+            tnp.unstack({'a': np.zeros(2), 'b': np.zeros(3)})
+
+    def test_sum(self):
+        assert tnp.sum(self._DEMO_1) == 71
+        assert tnp.sum({'a': np.array([1, 2]), 'b': 3}) == 6
+        assert tnp.sum(np.array([1, 2])) == 3
+        assert tnp.sum(self._DEMO_1, dtype=np.float32).dtype == np.float32
+        sums = tnp.sum(self._DEMO_1, reduce=False)
+        assert isinstance(sums, tnp.ndarray)
+        assert (sums.a, sums.b, sums.x.c, sums.x.d) == (24, 16, 15, 16)
+        sums = tnp.sum(self._DEMO_1, axis=-1)
+        assert np.array_equal(sums.a, np.array([6, 18]))
+        assert np.array_equal(sums.x.d, np.array([16]))
+        with pytest.warns(UserWarning):
+            tnp.sum(self._DEMO_1, 0, reduce=True)
+
+    def test_mean_var_std(self):
+        leaves = np.concatenate([
+            np.array([[1, 2, 3], [5, 6, 7]]).reshape(-1), np.array([1, 3, 5, 7]),
+            np.array([3, 5, 7]), np.array([7, 9]),
+        ])
+        assert np.isclose(tnp.mean(self._DEMO_1), leaves.mean())
+        assert np.isclose(tnp.var(self._DEMO_1), leaves.var())
+        assert np.isclose(tnp.var(self._DEMO_1, ddof=1), leaves.var(ddof=1))
+        assert np.isclose(tnp.std(self._DEMO_1), leaves.std())
+        assert np.isclose(tnp.std(self._DEMO_1, ddof=1), leaves.std(ddof=1))
+
+        t = tnp.ndarray({'a': np.array([1, 2], dtype=np.float32), 'b': np.array([], dtype=np.float32)})
+        assert tnp.mean(t).dtype == np.float32
+        assert tnp.mean(t, dtype=np.float64).dtype == np.float64
+        assert tnp.var(t) == 0.25
+        assert tnp.mean(tnp.ndarray({'a': np.array([1.0 + 1j, 3.0 - 1j])})) == 2.0
+        assert tnp.var(tnp.ndarray({'a': np.array([1j]), 'b': np.array([-1j])})) == 1.0
+        with pytest.warns(RuntimeWarning):
+            assert np.isnan(tnp.mean({'a': np.array([])}))
+        with pytest.warns(RuntimeWarning):
+            assert np.isnan(tnp.var({'a': np.array([1.0])}, ddof=1))
+
+        # stable for the large offsets, the same as the two-pass algorithm
+        rs = np.random.RandomState(0)
+        parts = [rs.randn(n) + 1e8 for n in (5, 100, 37)]
+        assert np.isclose(tnp.var({'a': parts[0], 'b': parts[1], 'c': parts[2]}), np.concatenate(parts).var())
+
+        means = tnp.mean(self._DEMO_1, reduce=False)
+        assert means.a == 4.0
+        assert means.x.d == 8.0
+
+    def test_max_min(self):
+        assert tnp.max(self._DEMO_1) == 9
+        assert tnp.min(self._DEMO_1) == 1
+        assert tnp.max({'a': np.array([]), 'b': np.array([1.5])}) == 1.5
+        assert np.isnan(tnp.max({'a': np.array([np.nan]), 'b': np.array([1.5])}))
+        maxs = tnp.max(self._DEMO_1, axis=0)
+        assert np.array_equal(maxs.a, np.array([5, 6, 7]))
+        assert maxs.b == 7
+        assert np.array_equal(maxs.x.d, np.array([7, 9]))
+        with pytest.raises(ValueError):
+            tnp.min({'a': np.array([])})
+
+    def test_argmax_argmin(self):
+        t = tnp.ndarray({'b': {'x': np.array([[3, 9]])}, 'a': np.array([1, 9, 0])})
+        assert tnp.argmax(t) == 1  # a, b.x
+        assert tnp.argmin(t) == 2
+        assert tnp.argmax(t) == np.argmax(np.array([1, 9, 0, 3, 9]))
+        assert tnp.argmax({'a': np.array([]), 'b': np.array([[1, 2]])}) == 1
+        assert tnp.argmin({'a': np.array([1.0, 2.0]), 'b': np.array([np.nan, -1.0])}) == 2
+        indices = tnp.argmax(t, reduce=False)
+        assert (indices.a, indices.b.x) == (1, 1)
+        with pytest.raises(ValueError):
+            tnp.argmax({'a': np.array([])})
+
+    def test_percentile(self):
+        t = tnp.ndarray({'a': np.array([1, 2]), 'b': {'x': np.array([[3, 4]])}})
+        assert tnp.percentile(t, 50) == 2.5
+        assert np.allclose(tnp.percentile(t, [25, 75], method='nearest'), np.array([2, 3]))
+        assert np.allclose(tnp.percentile(t.b, 50), 3.5)
+        assert np.array_equal(t.b.x, np.array([[3, 4]]))
+        assert np.array_equal(t.a, np.array([1, 2]))
+        p = tnp.percentile(t, 50, reduce=False)
+        assert p.a == 1.5
+        assert p.b.x == 3.5
+        assert np.allclose(tnp.percentile(t, 50, axis=-1).b.x, np.array([3.5]))
@@ -0,0 +1,128 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+import torch
+
+import treetensor.numpy as tnp
+import treetensor.torch as ttorch
+from treetensor import profiler
+
+
+def _tree():
+    return ttorch.Tensor({'a': torch.randn(2, 3), 'b': {'x': torch.randn(3, 4), 'y': torch.randn(2)}})
+
+
+@pytest.mark.unittest
+class TestProfilerProfile:
+    def test_disabled(self):
+        assert not profiler.is_profiling()
+        prof = profiler.Profile()
+        _ = ttorch.sin(_tree())
+        assert prof.stats == {}
+
+    def test_stats(self):
+        t = _tree()
+        with profiler.profile() as prof:
+            assert profiler.is_profiling()
+            _ = ttorch.sin(t)
+            _ = ttorch.sin(t)
+            _ = t.sum(dim=0)
+            _ = t.std(dim=0)
+            _ = t.exp()
+            _ = ttorch.add(t, 1)
+            _ = tnp.all(t.numpy())
+        assert not profiler.is_profiling()
+        _ = ttorch.sin(t)
+
+        stats = prof.stats
+        sin = stats['treetensor.torch.funcs.base.sin']
+        assert sin.calls == 2
+        assert sin.leaves == 6
+        assert sin.total_time >= sin.leaf_time + sin.result_time
+        assert sin.bookkeeping_time >= 0.0
+        assert 0.0 <= sin.overhead <= 1.0
+        assert 'calls: 2' in repr(sin)
+
+        assert stats['treetensor.torch.tensor.Tensor.sum'].calls == 1
+        assert stats['treetensor.torch.tensor.Tensor.sum'].leaves == 3
+        assert stats['treetensor.torch.tensor.Tensor.std'].leaves == 3
+        assert stats['treetensor.torch.tensor.Tensor.exp'].leaves == 3  # with the foreach kernel
+        assert stats['treetensor.torch.funcs.math.add'].leaves == 3
+        assert stats['treetensor.torch.tensor.Tensor.numpy'].leaves == 3
+        assert any(name.startswith('treetensor.numpy.') for name in stats)
+
+        prof.clear()
+        assert prof.stats == {}
+
+    def test_nested(self):
+        t = _tree()
+        with profiler.profile() as outer:
+            with profiler.profile() as inner:
+                _ = t.sum()
+            _ = t.sum()
+        s = outer.stats['treetensor.torch.tensor.Tensor.sum']
+        assert s.calls == 2
+        assert s.leaves == 6
+        assert inner.stats['treetensor.torch.tensor.Tensor.sum'].calls == 1
+
+    def test_print_stats(self):
+        t = _tree()
+        with profiler.profile() as prof:
+            _ = ttorch.cos(t)
+            _ = t.abs()
+
+        f = io.StringIO()
+        prof.print_stats(file=f)
+        lines = f.getvalue().splitlines()
+        assert lines[0].startswith('2 function calls (6 leaves) in ')
+        assert 'ncalls' in lines[2] and 'bookkeeping' in lines[2]
+        assert any(line.endswith('treetensor.torch.funcs.base.cos') for line in lines)
+        assert any(line.endswith('treetensor.torch.tensor.Tensor.abs') for line in lines)
+
+        f = io.StringIO()
+        prof.print_stats(sort='name', limit=1, file=f)
+        lines = f.getvalue().splitlines()
+        assert len(lines) == 4
+        assert lines[3].endswith('treetensor.torch.funcs.base.cos')
+
+        with pytest.raises(ValueError):
+            prof.print_stats(sort='unknown')
+
+    def test_chrome_trace(self, tmp_path):
+        t = _tree()
+        with profiler.profile() as prof:
+            _ = ttorch.sin(t)
+            _ = t.sum(dim=0)
+
+        path = os.path.join(tmp_path, 'trace.json')
+        prof.export_chrome_trace(path)
+        with open(path) as f:
+            trace = json.load(f)
+        events = trace['traceEvents']
+        assert [e['name'] for e in events] == [
+            'treetensor.torch.funcs.base.sin', 'treetensor.torch.tensor.Tensor.sum',
+        ]
+        assert all(e['ph'] == 'X' and e['dur'] >= 0 for e in events)
+        assert events[0]['ts'] <= events[1]['ts']
+        assert events[0]['args']['leaves'] == 3
+
+        with profiler.profile(record_events=False) as prof:
+            _ = ttorch.sin(t)
+        assert prof.chrome_trace()['traceEvents'] == []
+        assert prof.stats['treetensor.torch.funcs.base.sin'].calls == 1
+
+    def test_environ(self, tmp_path):
+        path = os.path.join(tmp_path, 'trace.json')
+        env = dict(os.environ, TREETENSOR_PROFILE='1', TREETENSOR_PROFILE_TRACE=path)
+        code = 'import treetensor.torch as ttorch; ttorch.sin(ttorch.Tensor({"a": [1.0, 2.0]}))'
+        process = subprocess.run([sys.executable, '-W', 'ignore', '-c', code],
+                                 env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        assert process.returncode == 0
+        assert 'function calls' in process.stderr.decode()
+        assert 'treetensor.torch.funcs.base.sin' in process.stderr.decode()
+        with open(path) as f:
+            assert json.load(f)['traceEvents']
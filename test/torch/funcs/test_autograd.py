@@ -1,3 +1,6 @@
+import pytest
+import torch
+
 import treetensor.torch as ttorch
 from .base import choose_mark
 
@@ -29,3 +32,67 @@ class TestTorchFuncsAutograd:
         tt1r = ttorch.detach_(tt1)
         assert tt1r is tt1
         assert not tt1.requires_grad.any()
+
+    @choose_mark()
+    def test_grad_norm(self):
+        tt1 = ttorch.tensor({
+            'a': [1.0, 2.0],
+            'b': {'x': [[3.0, 4.0]], 'y': [5.0]}
+        }, requires_grad=True)
+        assert ttorch.grad_norm(tt1).item() == 0.0
+
+        (tt1.a ** 2 + tt1.b.x ** 2).sum().backward()
+        assert torch.isclose(ttorch.grad_norm(tt1), torch.tensor(120.0).sqrt())
+        assert torch.isclose(ttorch.grad_norm(tt1, 1), torch.tensor(20.0))
+        assert torch.isclose(ttorch.grad_norm(tt1, float('inf')), torch.tensor(8.0))
+
+    @choose_mark()
+    def test_clip_grad_norm_(self):
+        tt1 = ttorch.tensor({
+            'a': [1.0, 2.0],
+            'b': {'x': [[3.0, 4.0]]}
+        }, requires_grad=True)
+        (tt1 ** 2).sum().backward()
+        total = ttorch.clip_grad_norm_(tt1, 1.0)
+        assert torch.isclose(total, torch.tensor(120.0).sqrt())
+        assert torch.isclose(ttorch.grad_norm(tt1), torch.tensor(1.0), atol=1e-5)
+        assert ttorch.isclose(tt1.grad, ttorch.tensor({
+            'a': [0.1826, 0.3651],
+            'b': {'x': [[0.5477, 0.7303]]}
+        }), atol=1e-4).all()
+
+        ttorch.clip_grad_norm_(tt1, 10.0)
+        assert torch.isclose(ttorch.grad_norm(tt1), torch.tensor(1.0), atol=1e-5)
+
+        tt1.a.grad[0] = float('nan')
+        with pytest.raises(RuntimeError):
+            ttorch.clip_grad_norm_(tt1, 1.0, error_if_nonfinite=True)
+
+    @choose_mark()
+    def test_zero_grad_(self):
+        tt1 = ttorch.tensor({
+            'a': [1.0, 2.0],
+            'b': {'x': [[3.0, 4.0]]}
+        }, requires_grad=True)
+        (tt1 ** 2).sum().backward()
+        assert ttorch.zero_grad_(tt1, set_to_none=False) is tt1
+        assert ttorch.equal(tt1.grad, ttorch.zeros_like(tt1))
+
+        ttorch.zero_grad_(tt1)
+        assert tt1.a.grad is None
+        assert tt1.b.x.grad is None
+
+    @choose_mark()
+    def test_accumulate_grad_(self):
+        tt1 = ttorch.tensor({
+            'a': [1.0, 2.0],
+            'b': {'x': [[3.0, 4.0]]}
+        }, requires_grad=True)
+        g = ttorch.tensor({'b': {'x': [[1.0, 2.0]]}, 'a': [3.0, 4.0]})
+        assert ttorch.accumulate_grad_(tt1, g) is tt1
+        assert tt1.a.grad is not g.a
+        ttorch.accumulate_grad_(tt1, g)
+        assert ttorch.equal(tt1.grad, g * 2)
+
+        with pytest.raises(KeyError):
+            ttorch.accumulate_grad_(tt1, ttorch.tensor({'a': [1.0, 2.0]}))
@@ -312,3 +312,70 @@ class TestTorchFuncsReduction:
             'a': [1.1799, 0.4652, 1.0866, 1.3533],
             'b': {'x': [0.8139, 0.9073, 2.1392, 0.6403, 0.4041]},
         }), atol=1e-4).all()
+
+    @choose_mark(name='max')
+    def test_reduce_scope_extreme(self, monkeypatch):
+        from treetensor.torch.base.reduce import _extreme
+        x = torch.randn(3, 4, 5)
+        for name in ['max', 'min']:
+            monkeypatch.delattr(torch, f'a{name}')  # the same as torch<1.7
+            func = _extreme(name)
+            monkeypatch.undo()
+            amax = getattr(torch, f'a{name}')
+            assert func is not amax
+            assert torch.equal(func(x, dim=1), amax(x, dim=1))
+            assert torch.equal(func(x, dim=(0, -1)), amax(x, dim=(0, -1)))
+            assert torch.equal(func(x, dim=(0, 2), keepdim=True), amax(x, dim=(0, 2), keepdim=True))
+
+    @choose_mark(name='sum')
+    def test_reduce_scope(self):
+        t = ttorch.Tensor({
+            'loss': {'h1': torch.tensor([1., 2.]), 'h2': torch.tensor([3., 4., 5.])},
+            'm': torch.ones(2, 3),
+        })
+        r1 = ttorch.sum(t.loss, dim=0, scope='tree')
+        assert isinstance(r1, torch.Tensor) and not isinstance(r1, ttorch.Tensor)
+        assert r1.item() == 15.
+        assert ttorch.sum(t, scope='tree').item() == 21.
+        assert ttorch.max(t.loss, 0, scope='tree').item() == 5.
+        assert ttorch.min(t, scope='tree').item() == 1.
+
+        r2 = ttorch.sum(t, scope='subtree:loss')
+        assert isinstance(r2, ttorch.Tensor)
+        assert r2.loss.item() == 15.
+        assert r2.m.item() == 6.
+        r3 = ttorch.mean(t, dim=0, keepdim=True, scope='subtree:loss')
+        assert r3.loss.tolist() == [3.]
+        assert r3.m.tolist() == [[1., 1., 1.]]
+        with pytest.raises(ValueError):
+            ttorch.sum(t, scope='subtree:')
+        with pytest.raises(ValueError):
+            ttorch.sum(t, scope='subtree:.')
+        assert (ttorch.sum(t, dim=0, scope='leaf') == ttorch.sum(t, dim=0)).all()
+
+        x = ttorch.Tensor({'a': torch.ones(2, 3), 'b': torch.ones(4, 3) * 4})
+        assert ttorch.mean(x, 0, scope='tree').tolist() == [3., 3., 3.]
+        assert ttorch.mean(x, 0, scope='tree', keepdim=True).shape == (1, 3)
+        assert ttorch.isclose(ttorch.std(x, dim=0, scope='tree'),
+                              torch.cat([x.a, x.b]).std(dim=0)).all()
+        assert ttorch.all(x > 0, dim=0, scope='tree').tolist() == [True, True, True]
+        assert not ttorch.any(x > 5, scope='tree')
+
+        y = ttorch.Tensor({'a': torch.ones(3, 2) * 2, 'b': torch.ones(3, 4)})
+        assert ttorch.sum(y, dim=1, scope='tree').tolist() == [8., 8., 8.]
+        assert ttorch.sum(y, dim=(0, 1), scope='tree', keepdim=True).tolist() == [[24.]]
+        assert ttorch.sum(y, dim=-1, scope='tree', keepdim=True).shape == (3, 1)
+        assert ttorch.sum(torch.ones(2, 2), 1, scope='tree').tolist() == [2., 2.]
+
+        with pytest.raises(ValueError):
+            ttorch.sum(y, dim=0, scope='tree')
+        with pytest.raises(IndexError):
+            ttorch.sum(y, dim=2, scope='tree')
+        with pytest.raises(ValueError):
+            ttorch.sum(y, scope='tree', reduce=True)
+        with pytest.raises(ValueError):
+            ttorch.sum(y, scope='forest')
+        with pytest.raises(ValueError):
+            ttorch.masked_select(y, y > 1, scope='tree')
+        with pytest.raises(KeyError):
+            ttorch.sum(t, scope='subtree:nothing')
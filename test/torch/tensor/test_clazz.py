@@ -1,6 +1,7 @@
 import unittest
 
 import numpy as np
+import pytest
 import torch
 from hbutils.testing import vpython, OS
 from treevalue import typetrans, TreeValue, func_treelize
@@ -50,6 +51,40 @@ class TestTorchTensorClass:
     def test_numel(self):
         assert self._DEMO_1.numel() == 18
 
+    @choose_mark()
+    def test_shape(self):
+        t = ttorch.randn({'a': (2, 3), 'b': {'x': (3, 4)}})
+        assert t.shape == ttorch.Size({'a': (2, 3), 'b': {'x': (3, 4)}})
+        assert t.shape is t.shape
+
+        t.b.y = torch.randn(5, 1)
+        assert t.shape == ttorch.Size({'a': (2, 3), 'b': {'x': (3, 4), 'y': (5, 1)}})
+        assert t.numel() == 23
+
+        t.torch.transpose_(0, 1)
+        assert t.shape == ttorch.Size({'a': (3, 2), 'b': {'x': (4, 3), 'y': (1, 5)}})
+
+    @choose_mark()
+    def test_dtype(self):
+        t = ttorch.tensor({'a': [1, 2], 'b': {'x': [3.0, 4.0]}})
+        assert t.dtype == Object({'a': torch.int64, 'b': {'x': torch.float32}})
+        t.a = t.a.float()
+        assert t.dtype == Object({'a': torch.float32, 'b': {'x': torch.float32}})
+
+    @choose_mark()
+    def test_device(self):
+        t = ttorch.tensor({'a': [1, 2], 'b': {'x': [3.0, 4.0]}})
+        assert t.device == Object({'a': torch.device('cpu'), 'b': {'x': torch.device('cpu')}})
+
+    @choose_mark()
+    def test_nbytes(self):
+        assert self._DEMO_1.nbytes == 144
+        assert ttorch.zeros({'a': (2, 3), 'b': {'x': (4,)}}, dtype=torch.float16).nbytes == 20
+
+    @choose_mark()
+    def test_devices(self):
+        assert self._DEMO_1.devices == {torch.device('cpu')}
+
     # Here is a bug in torch on Windows and python3.10 environment
     # RuntimeError: Numpy is not available
     # The only solution I found is to downgrade python to 3.9 ==,
@@ -71,6 +106,117 @@ class TestTorchTensorClass:
         assert ttorch.all(self._DEMO_1.cpu() == self._DEMO_1)
         assert _all_is(self._DEMO_1.cpu(), self._DEMO_1).reduce(lambda **kws: all(kws.values()))
 
+    @choose_mark()
+    @unittest.skipUnless(torch.cuda.is_available(), 'CUDA required')
+    def test_pin_memory(self):
+        t = self._DEMO_1.pin_memory()
+        assert ttorch.all(t == self._DEMO_1)
+        assert t.is_pinned().reduce(lambda **kws: all(kws.values()))
+
+    @choose_mark()
+    def test_batch(self):
+        t = ttorch.Tensor({
+            'a': torch.arange(12).reshape(6, 2),
+            'b': {'x': torch.arange(6).float(), 'y': torch.arange(6) % 2 == 0},
+        })
+
+        r = t.batch[1:4]
+        assert isinstance(r, ttorch.Tensor)
+        assert ttorch.equal(r, ttorch.Tensor({
+            'a': [[2, 3], [4, 5], [6, 7]],
+            'b': {'x': [1.0, 2.0, 3.0], 'y': [False, True, False]},
+        }))
+        assert r.a.data_ptr() == t.a[1].data_ptr()
+        assert ttorch.equal(t.batch[-1], ttorch.Tensor({'a': [10, 11], 'b': {'x': 5.0, 'y': False}}))
+        assert ttorch.equal(t.batch[:, ...], t)
+
+        # index tensors are copied, the same as torch
+        r = t.batch[torch.tensor([0, 2, 4])]
+        assert r.b.x.tolist() == [0.0, 2.0, 4.0]
+        r.a.zero_()
+        r.b.x.zero_()
+        assert t.a[2].tolist() == [4, 5]
+        assert t.b.x.tolist() == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+        assert t.batch[[-1, -2]].b.x.tolist() == [5.0, 4.0]
+
+        # indices with a constant step are turned into views by batch.view
+        r = t.batch.view[torch.tensor([1, 3, 5])]
+        assert r.a.untyped_storage().data_ptr() == t.a.untyped_storage().data_ptr()
+        assert r.b.x.tolist() == [1.0, 3.0, 5.0]
+        r = t.batch.view[[4]]
+        assert r.a.shape == (1, 2)
+        assert r.a.untyped_storage().data_ptr() == t.a.untyped_storage().data_ptr()
+        assert t.batch.view[t.b.y].b.x.tolist() == [0.0, 2.0, 4.0]
+        assert t.batch.view[[]].a.shape == (0, 2)
+        assert t.batch.view[1:3].b.x.tolist() == [1.0, 2.0]
+
+        s = ttorch.Tensor({'a': torch.zeros(6, 2), 'b': {'x': torch.zeros(6)}})
+        s.batch.view[torch.tensor([0, 2, 4])].a.fill_(1)
+        assert s.a[:, 0].tolist() == [1.0, 0.0, 1.0, 0.0, 1.0, 0.0]
+        with pytest.raises(IndexError):
+            _ = t.batch.view[torch.tensor([2, 0])]
+        with pytest.raises(IndexError):
+            _ = t.batch.view[torch.tensor([4, 5, 6])]
+
+        # the other indices
+        r = t.batch[torch.tensor([5, 0, 0, 2])]
+        assert r.a.untyped_storage().data_ptr() != t.a.untyped_storage().data_ptr()
+        assert r.b.x.tolist() == [5.0, 0.0, 0.0, 2.0]
+        assert t.batch[torch.tensor([[0, 1], [2, 3]])].a.shape == (2, 2, 2)
+        assert t.batch[[]].a.shape == (0, 2)
+
+        # masks
+        r = t.batch[t.b.y]
+        assert r.b.x.tolist() == [0.0, 2.0, 4.0]
+        assert r.a.tolist() == [[0, 1], [4, 5], [8, 9]]
+        assert t.batch[[True, False, False, False, False, True]].b.x.tolist() == [0.0, 5.0]
+        assert t.batch[~t.b.y & (t.b.x > 2)].b.x.tolist() == [3.0, 5.0]
+
+        with pytest.raises(IndexError):
+            _ = t.batch[torch.tensor([0.5])]
+        with pytest.raises(IndexError):
+            _ = t.batch[torch.ones(2, 3, dtype=torch.bool)]
+
+        # out-of-range indices and masks with the wrong length
+        with pytest.raises(IndexError):
+            _ = t.batch[torch.tensor([4, 5, 6])]
+        with pytest.raises(IndexError):
+            _ = t.batch[torch.tensor([10])]
+        with pytest.raises(IndexError):
+            _ = t.batch[torch.tensor([True, False, True])]
+        with pytest.raises(IndexError):
+            t.batch[torch.tensor([True, False, True])] = 0
+        with pytest.raises(IndexError):
+            _ = t.batch.view[torch.tensor([10])]
+
+    @choose_mark(name='batch')
+    def test_batch_setitem(self):
+        t = ttorch.Tensor({'a': torch.zeros(5, 2), 'b': {'x': torch.zeros(5)}})
+        t.batch[1:3] = 1
+        assert t.b.x.tolist() == [0.0, 1.0, 1.0, 0.0, 0.0]
+        t.batch[torch.tensor([0, 4])] = ttorch.Tensor({'a': [[2, 3], [4, 5]], 'b': {'x': [6.0, 7.0]}})
+        assert t.a.tolist() == [[2.0, 3.0], [1.0, 1.0], [1.0, 1.0], [0.0, 0.0], [4.0, 5.0]]
+        assert t.b.x.tolist() == [6.0, 1.0, 1.0, 0.0, 7.0]
+        t.batch[t.b.x > 5] = -1
+        assert t.b.x.tolist() == [-1.0, 1.0, 1.0, 0.0, -1.0]
+        t.batch[:, ...] = 0
+        assert (t == 0).all()
+
+        # dicts are assigned leaf by leaf, just like the trees
+        t.batch[1] = {'a': torch.tensor([8.0, 9.0]), 'b': {'x': 3.0}}
+        assert t.a.tolist() == [[0.0, 0.0], [8.0, 9.0], [0.0, 0.0], [0.0, 0.0], [0.0, 0.0]]
+        assert t.b.x.tolist() == [0.0, 3.0, 0.0, 0.0, 0.0]
+        t.batch[torch.tensor([2, 3])] = {'a': torch.ones(2, 2), 'b': {'x': torch.tensor([4, 5])}}
+        assert t.a.tolist() == [[0.0, 0.0], [8.0, 9.0], [1.0, 1.0], [1.0, 1.0], [0.0, 0.0]]
+        assert t.b.x.tolist() == [0.0, 3.0, 4.0, 5.0, 0.0]
+
+        with pytest.raises(KeyError):
+            t.batch[0] = ttorch.Tensor({'a': [1, 2]})
+        with pytest.raises(KeyError):
+            t.batch[0] = {'a': torch.tensor([1.0, 2.0])}
+        with pytest.raises(IndexError):
+            t.batch[torch.tensor([1, 7])] = 1
+
     @choose_mark()
     def test_to(self):
         assert ttorch.all(self._DEMO_1.to(torch.float32) == ttorch.Tensor({
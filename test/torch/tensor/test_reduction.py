@@ -239,3 +239,23 @@ class TestTorchTensorReduction:
             'a': [1.1799, 0.4652, 1.0866, 1.3533],
             'b': {'x': [0.8139, 0.9073, 2.1392, 0.6403, 0.4041]},
         }), atol=1e-4).all()
+
+    @choose_mark(name='sum')
+    def test_reduce_scope(self):
+        t0 = ttorch.Tensor({
+            'a': [[1., 2.], [3., 4.]],
+            'b': {'x': [[0., 3.]], 'y': [[2., -1.], [1., 1.], [0., 0.]]},
+        })
+        t1 = t0.sum(dim=0, scope='tree')
+        assert isinstance(t1, torch.Tensor)
+        assert t1.tolist() == [7., 9.]
+        assert t0.max(0, keepdim=True, scope='tree').tolist() == [[3., 4.]]
+
+        t2 = t0.mean(dim=0, scope='subtree:b')
+        assert t2.a.tolist() == [2., 3.]
+        assert t2.b.tolist() == [0.75, 0.75]
+        with pytest.raises(ValueError):
+            t0.sum(scope='subtree:')
+        with pytest.raises(ValueError):
+            t0.sum(scope='subtree:.')
+        assert (t0.sum(scope='leaf') == t0.sum(reduce=False)).all()
@@ -0,0 +1,92 @@
+import pytest
+import torch
+
+import treetensor.torch as ttorch
+
+
+def _spec():
+    return {'obs': torch.zeros(3), 'reward': 0.0, 'done': False, 'info': {'step': 0}}
+
+
+def _item(i):
+    return {'obs': torch.full((3,), float(i)), 'reward': i * 0.5, 'done': i % 3 == 0, 'info': {'step': i}}
+
+
+def _batch(start, n):
+    return ttorch.stack([ttorch.tensor(_item(i)) for i in range(start, start + n)])
+
+
+# noinspection DuplicatedCode
+@pytest.mark.unittest
+class TestTorchBuffer:
+    def test_init(self):
+        buffer = ttorch.RingBuffer(_spec(), capacity=8)
+        assert len(buffer) == 0
+        assert buffer.capacity == 8
+        assert isinstance(buffer.storage, ttorch.Tensor)
+        assert buffer.storage.shape == ttorch.Size({
+            'obs': (8, 3), 'reward': (8,), 'done': (8,), 'info': {'step': (8,)},
+        })
+        assert buffer.storage.done.dtype == torch.bool
+        assert buffer.storage.info.step.dtype == torch.long
+
+        with pytest.raises(ValueError):
+            ttorch.RingBuffer(_spec(), capacity=0)
+
+    def test_push(self):
+        buffer = ttorch.RingBuffer(ttorch.tensor(_spec()), capacity=4)
+        for i in range(6):
+            buffer.push(_item(i))
+        assert len(buffer) == 4
+
+        items = buffer.sample([0, 1, 2, 3])
+        assert torch.equal(items.info.step, torch.tensor([2, 3, 4, 5]))
+        assert torch.equal(items.obs[:, 0], torch.tensor([2.0, 3.0, 4.0, 5.0]))
+        assert torch.equal(items.done, torch.tensor([False, True, False, False]))
+        assert torch.equal(buffer.sample(-1).info.step, torch.tensor(5))
+        assert buffer.sample([[0, 1], [2, 3]]).obs.shape == (2, 2, 3)
+
+        with pytest.raises(IndexError):
+            buffer.sample([4])
+        with pytest.raises(ValueError):
+            buffer.push({'obs': torch.zeros(3)})
+        with pytest.raises(ValueError):
+            buffer.push({'obs': torch.zeros(3), 'reward': 0.0, 'done': False, 'other': 0})
+
+    def test_push_batch(self):
+        buffer = ttorch.RingBuffer(_spec(), capacity=8)
+        buffer.push_batch(_batch(0, 5))
+        assert len(buffer) == 5
+        buffer.push_batch(_batch(5, 5))  # wrap around
+        assert len(buffer) == 8
+        assert torch.equal(buffer.sample(torch.arange(8)).info.step, torch.arange(2, 10))
+
+        buffer.push_batch(_batch(10, 20))  # larger than capacity
+        assert len(buffer) == 8
+        assert torch.equal(buffer.sample(torch.arange(8)).info.step, torch.arange(22, 30))
+        assert torch.equal(buffer.sample(torch.arange(8)).reward, torch.arange(22, 30) * 0.5)
+
+        with pytest.raises(ValueError):
+            buffer.push_batch({'obs': torch.zeros(2, 3), 'reward': torch.zeros(3),
+                               'done': torch.zeros(3, dtype=torch.bool), 'info': {'step': torch.zeros(3)}})
+
+    def test_sample_random(self):
+        buffer = ttorch.RingBuffer(_spec(), capacity=16)
+        with pytest.raises(IndexError):
+            buffer.sample_random(4)
+
+        buffer.push_batch(_batch(0, 10))
+        items = buffer.sample_random(32, generator=torch.Generator().manual_seed(0))
+        assert items.obs.shape == (32, 3)
+        assert ((items.info.step >= 0) & (items.info.step < 10)).all()
+        assert torch.equal(items.obs[:, 0], items.info.step.float())
+
+        buffer.clear()
+        assert len(buffer) == 0
+        assert buffer.sample([]).obs.shape == (0, 3)
+
+    def test_shared(self):
+        buffer = ttorch.RingBuffer(_spec(), capacity=4, shared=True)
+        assert buffer.storage.obs.is_shared()
+        buffer.push(_item(1))
+        assert torch.equal(buffer.sample([0]).obs, torch.ones(1, 3))
@@ -0,0 +1,68 @@
+import pytest
+import torch
+
+import treetensor.torch as ttorch
+from treetensor import profiler
+from treetensor.common import Object
+
+
+# noinspection DuplicatedCode
+@pytest.mark.unittest
+class TestTorchDispatch:
+    def _tree(self):
+        return ttorch.Tensor({'a': torch.tensor([-1., 2.]), 'b': {'x': torch.tensor([3., -4., 0.])}})
+
+    def test_leafwise(self):
+        t = self._tree()
+        r = torch.nn.functional.relu(t)
+        assert isinstance(r, ttorch.Tensor)
+        assert torch.equal(r.a, torch.tensor([0., 2.]))
+        assert torch.equal(r.b.x, torch.tensor([3., 0., 0.]))
+
+        r = torch.zeros(2) + ttorch.Tensor({'a': torch.ones(2), 'b': torch.ones(2)})
+        assert torch.equal(r.b, torch.ones(2))
+        r = torch.where(t > 0, t, torch.tensor(0.))
+        assert torch.equal(r.b.x, torch.tensor([3., 0., 0.]))
+
+        other = ttorch.Tensor({'b': {'x': torch.ones(3)}, 'a': torch.ones(2)})
+        assert torch.equal(torch.hypot(t, other).a, torch.hypot(t.a, torch.ones(2)))
+        with pytest.raises(KeyError):
+            torch.hypot(t, ttorch.Tensor({'a': torch.ones(2)}))
+
+    def test_results(self):
+        t = self._tree()
+        values, indices = torch.sort(t)
+        assert isinstance(values, ttorch.Tensor)
+        assert torch.equal(indices.b.x, torch.tensor([1, 2, 0]))
+        r = torch.sort(t)
+        assert torch.equal(r.values.a, torch.tensor([-1., 2.]))
+
+        n = torch.numel(t)
+        assert isinstance(n, Object)
+        assert n.b.x == 3
+
+        pieces = torch.unbind(ttorch.Tensor({'a': torch.ones(2, 3), 'b': torch.zeros(2)}))
+        assert isinstance(pieces, tuple)
+        assert len(pieces) == 2
+        assert pieces[1].a.shape == (3,)
+
+        # different lengths of the leaves
+        pieces = torch.unbind(t)
+        assert isinstance(pieces, Object)
+        assert len(pieces.b.x) == 3
+
+    def test_overrides(self):
+        t = self._tree()
+        assert torch.sum(t).item() == 0.
+        assert torch.equal(torch.add(t, 1).a, torch.tensor([0., 3.]))
+        assert torch.stack([t, t]).b.x.shape == (2, 3)
+        assert torch.equal(torch.max(t), torch.tensor(3.))
+        assert torch.equal(torch.max(t, dim=0).indices.b.x, torch.tensor(0))
+
+    def test_profile(self):
+        t = self._tree()
+        with profiler.profile() as prof:
+            _ = torch.nn.functional.relu(t)
+        stats = prof.stats['torch.relu']
+        assert stats.calls == 1
+        assert stats.leaves == 2
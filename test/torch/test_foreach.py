@@ -0,0 +1,162 @@
+import pytest
+import torch
+
+import treetensor.torch as ttorch
+from treetensor.torch.base import no_foreach
+
+
+def _demo():
+    return ttorch.tensor({
+        'a': [[1.5, -2.0, 3.0], [0.25, 4.0, -1.0]],
+        'b': {'x': [2, -3, 4], 'y': [[0.5]]},
+    })
+
+
+def _same(t1, t2):
+    return t1.dtype == t2.dtype and ttorch.isclose(t1, t2, equal_nan=True).all()
+
+
+# noinspection DuplicatedCode
+@pytest.mark.unittest
+class TestTorchForeach:
+    @pytest.mark.parametrize('name, args, kwargs', [
+        ('abs', (), {}),
+        ('neg', (), {}),
+        ('exp', (), {}),
+        ('sqrt', (), {}),
+        ('sigmoid', (), {}),
+        ('add', (2,), {}),
+        ('add', (0.5,), {'alpha': 3}),
+        ('sub', (1.5,), {}),
+        ('mul', (3,), {}),
+        ('div', (2,), {}),
+        ('div', (2,), {'rounding_mode': 'floor'}),
+        ('pow', (2,), {}),
+        ('pow', (0.5,), {}),
+        ('clamp', (), {'min': -1, 'max': 2.5}),
+        ('clamp', (0.5,), {}),
+        ('clamp', (), {'max': 1}),
+    ])
+    def test_scalar(self, name, args, kwargs):
+        t = _demo()
+        with no_foreach():
+            expected = getattr(ttorch, name)(t, *args, **kwargs)
+        assert _same(getattr(ttorch, name)(t, *args, **kwargs), expected)
+        assert _same(getattr(t, name)(*args, **kwargs), expected)
+
+    @pytest.mark.parametrize('name', ['add', 'sub', 'mul', 'div', 'pow'])
+    def test_tree(self, name):
+        t1 = _demo()
+        t2 = ttorch.tensor({
+            'b': {'y': [[2.0]], 'x': [1, 2, 3]},
+            'a': [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]],
+        })
+        with no_foreach():
+            expected = getattr(ttorch, name)(t1, t2)
+        assert _same(getattr(ttorch, name)(t1, t2), expected)
+        assert _same(getattr(t1, name)(t2), expected)
+
+    @pytest.mark.parametrize('name, args, kwargs', [
+        ('abs_', (), {}),
+        ('neg_', (), {}),
+        ('exp_', (), {}),
+        ('sqrt_', (), {}),
+        ('sigmoid_', (), {}),
+        ('clamp_', (), {'min': -1, 'max': 2.5}),
+    ])
+    def test_inplace(self, name, args, kwargs):
+        t = _demo().float()
+        with no_foreach():
+            expected = getattr(ttorch, name)(_demo().float(), *args, **kwargs)
+        tr = getattr(ttorch, name)(t, *args, **kwargs)
+        assert tr is t
+        assert _same(t, expected)
+
+        t = _demo().float()
+        assert getattr(t, name)(*args, **kwargs) is t
+        assert _same(t, expected)
+
+    @pytest.mark.parametrize('name', ['add_', 'sub_', 'mul_', 'div_', 'pow_'])
+    def test_method_inplace(self, name):
+        t1, t2 = _demo().float(), _demo().float() + 1
+        with no_foreach():
+            expected = getattr(_demo().float(), name)(t2)
+        assert getattr(t1, name)(t2) is t1
+        assert _same(t1, expected)
+
+        t1 = _demo().float()
+        with no_foreach():
+            expected = getattr(_demo().float(), name)(2)
+        getattr(t1, name)(2)
+        assert _same(t1, expected)
+
+    @pytest.mark.parametrize('name', ['add', 'sub', 'mul', 'div', 'pow'])
+    def test_prefix(self, name):
+        t = _demo().float()
+        for other in [
+            {'a': 2.0, 'b': 0.5},
+            ttorch.tensor({'a': 2.0, 'b': {'x': [1.0, 2.0, 3.0], 'y': 0.5}}),
+        ]:
+            with no_foreach():
+                expected = getattr(ttorch, name)(t, other)
+            assert _same(getattr(ttorch, name)(t, other), expected)
+            assert _same(expected.b.y, getattr(torch, name)(t.b.y, 0.5))
+
+            t1 = _demo().float()
+            assert getattr(t1, f'{name}_')(other) is t1
+            assert _same(t1, expected)
+
+        with pytest.raises(KeyError):
+            getattr(ttorch, name)(t, {'a': 2.0})
+
+    def test_fallback(self):
+        t = _demo()
+        # different structure, broadcast by the original function
+        r = ttorch.add(t, ttorch.tensor({'a': 1.0, 'b': {'x': 2, 'y': 3.0}}))
+        assert _same(r.a, t.a + 1.0)
+        assert _same(r.b.x, t.b.x + 2)
+
+        # tensor operand
+        r = ttorch.mul(t, torch.tensor(2))
+        assert _same(r, t * 2)
+
+        # gradient required
+        t = ttorch.randn({'a': (2, 3), 'b': {'x': (3,)}}, requires_grad=True)
+        ttorch.mul(t, 2).sum().backward()
+        assert ttorch.equal(t.grad, ttorch.full_like(t, 2.0))
+
+    def test_inplace_error(self):
+        t = _demo()
+        with pytest.raises(RuntimeError):
+            ttorch.sqrt_(t)
+
+
+def _wide_tree(n=64):
+    return ttorch.randn({f'k{i}': (16, 8) for i in range(n)})
+
+
+@pytest.mark.benchmark
+class TestTorchForeachBenchmark:
+    @pytest.mark.parametrize('foreach', [True, False])
+    def test_add(self, benchmark, foreach):
+        t1, t2 = _wide_tree(), _wide_tree()
+        if foreach:
+            benchmark(ttorch.add, t1, t2)
+        else:
+            def _func():
+                with no_foreach():
+                    return ttorch.add(t1, t2)
+
+            benchmark(_func)
+
+    @pytest.mark.parametrize('foreach', [True, False])
+    def test_mul_exp(self, benchmark, foreach):
+        t = _wide_tree()
+        if foreach:
+            benchmark(lambda: ttorch.exp(ttorch.mul(t, 0.5)))
+        else:
+            def _func():
+                with no_foreach():
+                    return ttorch.exp(ttorch.mul(t, 0.5))
+
+            benchmark(_func)
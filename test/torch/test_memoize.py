@@ -0,0 +1,163 @@
+import gc
+
+import pytest
+import torch
+
+import treetensor.torch as ttorch
+
+
+# noinspection DuplicatedCode
+@pytest.mark.unittest
+class TestTorchMemoize:
+    def test_identity(self):
+        calls = []
+
+        @ttorch.memoize(maxsize=4)
+        def f(x, scale=1.0):
+            calls.append(1)
+            return x * scale
+
+        t = ttorch.randn({'a': (2, 3), 'b': {'x': (4,)}})
+        r1 = f(t)
+        r2 = f(t)
+        assert r1 is r2
+        assert len(calls) == 1
+        assert f(t, scale=2.0) is not r1
+        assert len(calls) == 2
+
+        assert f(ttorch.clone(t)) is not r1
+        assert len(calls) == 3
+        assert f.cache_info().hits == 1
+        assert f.cache_info().misses == 3
+
+    def test_identity_inplace(self):
+        @ttorch.memoize()
+        def f(x):
+            return x + 1
+
+        t = ttorch.tensor({'a': [1.0, 2.0], 'b': {'x': [3.0]}})
+        r1 = f(t)
+        assert f(t) is r1
+
+        t.b.x.add_(1)
+        r2 = f(t)
+        assert r2 is not r1
+        assert ttorch.equal(r2, ttorch.tensor({'a': [2.0, 3.0], 'b': {'x': [5.0]}}))
+
+    def test_identity_release(self):
+        @ttorch.memoize()
+        def f(x):
+            return x.sum()
+
+        t = ttorch.randn({'a': (2, 3), 'b': {'x': (4,)}})
+        f(t)
+        assert f.cache_info().currsize == 1
+        del t
+        gc.collect()
+        assert f.cache_info().currsize == 0
+        assert f.cache_info().nbytes == 0
+
+    def test_identity_alias(self):
+        @ttorch.memoize(maxsize=None)
+        def f(x):
+            return x[:, 0]
+
+        t = ttorch.randn({'a': (2, 3), 'b': {'x': (4, 5)}})
+        r1 = f(t)
+        assert f(t) is r1
+        assert f.cache_info().hits == 1
+
+        # the view keeps the input alive, so it is not held by the cache
+        del t, r1
+        gc.collect()
+        assert f.cache_info().currsize == 0
+
+        # and is dropped when the result is released
+        t = ttorch.randn({'a': (2, 3)})
+        f(t)
+        gc.collect()
+        assert f.cache_info().currsize == 0
+        r2 = f(t)
+        assert f(t) is r2
+        assert f.cache_info().hits == 2
+
+    def test_structure(self):
+        @ttorch.memoize(key='structure')
+        def f(x):
+            return ttorch.ones_like(x)
+
+        r1 = f(ttorch.randn({'a': (2, 3), 'b': {'x': (4,)}}))
+        assert f(ttorch.randn({'a': (2, 3), 'b': {'x': (4,)}})) is r1
+        assert f(ttorch.randn({'a': (2, 3), 'b': {'x': (5,)}})) is not r1
+        assert f(ttorch.randn({'a': (2, 3), 'b': {'y': (4,)}})) is not r1
+        assert f(ttorch.randn({'a': (2, 3), 'b': {'x': (4,)}}, dtype=torch.float64)) is not r1
+
+    def test_content(self):
+        @ttorch.memoize(key='content')
+        def f(x):
+            return x * 2
+
+        t = ttorch.tensor({'a': [1, 2, 3], 'b': {'x': [[True, False]]}})
+        r1 = f(t)
+        assert f(ttorch.clone(t)) is r1
+        assert f(ttorch.tensor({'a': [1, 2, 4], 'b': {'x': [[True, False]]}})) is not r1
+        assert f(ttorch.tensor({'a': [1.0, 2.0, 3.0], 'b': {'x': [[True, False]]}})) is not r1
+
+    def test_lru(self):
+        @ttorch.memoize(maxsize=2, key='content')
+        def f(x):
+            return x + 1
+
+        t1, t2, t3 = ttorch.tensor([1]), ttorch.tensor([2]), ttorch.tensor([3])
+        r1 = f(t1)
+        f(t2)
+        assert f(t1) is r1
+        f(t3)  # t2 is evicted
+        assert f.cache_info().currsize == 2
+        assert f(t1) is r1
+        hits = f.cache_info().hits
+        f(t2)
+        assert f.cache_info().hits == hits
+
+    def test_maxbytes(self):
+        @ttorch.memoize(maxsize=None, key='content', maxbytes=100)
+        def f(x):
+            return ttorch.zeros({'a': (x, 2), 'b': (x,)}, dtype=torch.float32)
+
+        f(2)
+        assert f.cache_info().nbytes == 24
+        f(4)
+        assert f.cache_info().nbytes == 72
+        f(3)  # the result of 2 is evicted
+        assert f.cache_info().nbytes == 84
+        assert f.cache_info().currsize == 2
+
+        f(10)  # too large to be cached
+        assert f.cache_info().currsize == 2
+        f.cache_clear()
+        assert f.cache_info() == (0, 0, None, 0, 0)
+
+    def test_bare_and_uncacheable(self):
+        calls = []
+
+        @ttorch.memoize
+        def f(x, opts):
+            calls.append(1)
+            return x
+
+        t = ttorch.randn({'a': (2,)})
+        f(t, {'k': [1, 2]})
+        f(t, {'k': [1, 2]})
+        assert len(calls) == 1
+
+        f(t, {1, 2})
+        f(t, {1, 2})
+        assert len(calls) == 3
+
+        f(t, {1: 'a', 'k': 'b'})
+        f(t, {1: 'a', 'k': 'b'})
+        assert len(calls) == 5
+
+    def test_invalid_key(self):
+        with pytest.raises(ValueError):
+            ttorch.memoize(key='unknown')
@@ -0,0 +1,121 @@
+import io
+
+import pytest
+import torch
+
+import treetensor.torch as ttorch
+from treetensor import profiler
+from treetensor.common import Object
+
+
+# noinspection DuplicatedCode
+@pytest.mark.unittest
+class TestTorchMemory:
+    def test_memory_summary(self):
+        big = torch.zeros(1024, 1024)
+        small = torch.zeros(3)
+        t = ttorch.Tensor({'a': big[:2], 'b': {'x': small, 'y': big[2:4], 'z': small}})
+        report = ttorch.memory_summary(t)
+        assert isinstance(report, ttorch.MemoryReport)
+        assert report.logical_bytes == t.nbytes == 2 * 8192 + 2 * 12
+        assert report.storage_bytes == 4 * 1024 * 1024 + 12
+        assert len(report.storages) == 2
+        assert report.devices == {'cpu': 4 * 1024 * 1024 + 12}
+
+        assert report.subtrees[''].leaves == 4
+        assert report.subtrees['a'].logical_bytes == 8192
+        assert report.subtrees['a'].storage_bytes == 4 * 1024 * 1024
+        assert report.subtrees['b'].leaves == 3
+        assert report.subtrees['b'].logical_bytes == 8192 + 24
+        assert report.subtrees['b'].storage_bytes == 4 * 1024 * 1024 + 12
+        assert report.subtrees['b.x'].storage_bytes == 12
+
+        views = report.views
+        assert len(views) == 1
+        assert views[0].paths == ['a', 'b.y']
+        assert views[0].used_bytes == 2 * 8192
+        assert views[0].unused_bytes == 4 * 1024 * 1024 - 2 * 8192
+        assert sorted(s.paths for s in report.shared) == [['a', 'b.y'], ['b.x', 'b.z']]
+
+        text = str(report)
+        assert text.startswith('Logical bytes: 16.02 KiB, storage bytes: 4.00 MiB, storages: 2')
+        assert 'Storages kept alive by views:' in text
+        assert '3.98 MiB unused of 4.00 MiB on cpu: a, b.y' in text
+        assert 'Shared storages:' in text
+        assert 'storages: 2' in repr(report)
+
+    def test_memory_summary_other(self):
+        report = ttorch.memory_summary(torch.arange(10)[::2])
+        assert report.logical_bytes == 40
+        assert report.storage_bytes == 80
+        assert report.storages[0].used_bytes == 72
+        assert list(report.subtrees) == ['']
+
+        report = ttorch.memory_summary(Object({'a': torch.zeros(2), 'b': 'str', 'c': torch.zeros(0)}))
+        assert report.subtrees[''].leaves == 2
+        assert report.logical_bytes == 8
+        assert not report.views
+
+        t = ttorch.Tensor({'a': torch.zeros(2, device='meta'), 'b': torch.zeros(3, device='meta')})
+        report = ttorch.memory_summary(t)
+        assert len(report.storages) == 2
+        assert report.devices == {'meta': 20}
+        assert not report.shared
+
+    def test_memory_report(self):
+        base = torch.zeros(100)
+        t = ttorch.Tensor({'a': base[:10], 'b': {'x': torch.zeros(3)}})
+        report = t.memory_report()
+        assert report.logical_bytes == 52
+        assert report.storage_bytes == 412
+        assert report.subtrees['a'].storage_bytes == 400
+
+    def test_memory_tracker(self):
+        t = ttorch.Tensor({'a': torch.zeros(2, 3), 'b': {'x': torch.zeros(4)}})
+        with ttorch.MemoryTracker() as tracker:
+            assert profiler.is_profiling()
+            _ = ttorch.sin(t)
+            _ = t.add_(1)
+            _ = t.sum()
+            _ = t.batch[0]
+        assert not profiler.is_profiling()
+        _ = ttorch.sin(t)
+
+        stats = tracker.stats
+        assert stats['treetensor.torch.funcs.base.sin'].calls == 1
+        assert stats['treetensor.torch.funcs.base.sin'].new_bytes == 40
+        assert stats['treetensor.torch.tensor.Tensor.add_'].new_bytes == 0
+        assert stats['treetensor.torch.tensor.Tensor.sum'].new_bytes == 4
+        if not torch.cuda.is_available():
+            assert all(s.peak_bytes == 0 for s in stats.values())
+        assert 'calls: 1' in repr(stats['treetensor.torch.tensor.Tensor.sum'])
+
+        f = io.StringIO()
+        tracker.print_stats(limit=1, file=f)
+        lines = f.getvalue().splitlines()
+        assert len(lines) == 2
+        assert 'ncalls' in lines[0]
+        assert lines[1].endswith('treetensor.torch.funcs.base.sin')
+
+    def test_legacy_storage(self, monkeypatch):
+        import warnings
+        from treetensor.torch import memory
+        monkeypatch.setattr(memory, '_HAS_UNTYPED_STORAGE', False)  # the same as torch<2.0
+        big = torch.zeros(1024, 1024)
+        t = ttorch.Tensor({'a': big[:2], 'b': {'x': torch.zeros(3), 'y': big[2:4]}})
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # TypedStorage is deprecated on torch>=2.0
+            report = ttorch.memory_summary(t)
+            assert report.storage_bytes == 4 * 1024 * 1024 + 12
+            assert [s.paths for s in report.shared] == [['a', 'b.y']]
+
+            with ttorch.MemoryTracker() as tracker:
+                _ = ttorch.sin(t)
+            assert tracker.stats['treetensor.torch.funcs.base.sin'].new_bytes == 16 * 1024 + 12
+
+    def test_memory_tracker_with_profile(self):
+        t = ttorch.Tensor({'a': torch.zeros(2, 3)})
+        with profiler.profile() as prof, ttorch.MemoryTracker() as tracker:
+            _ = ttorch.cos(t)
+        assert prof.stats['treetensor.torch.funcs.base.cos'].calls == 1
+        assert tracker.stats['treetensor.torch.funcs.base.cos'].new_bytes == 24
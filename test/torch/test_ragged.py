@@ -0,0 +1,95 @@
+import pytest
+import torch
+
+import treetensor.torch as ttorch
+from treetensor.common import Object
+
+
+def _samples():
+    return [
+        {'tokens': torch.tensor([1, 2, 3]), 'label': 0, 'img': torch.ones(2, 3, 4)},
+        {'tokens': torch.tensor([4]), 'label': 1, 'img': torch.ones(3, 1, 4) * 2},
+    ]
+
+
+# noinspection DuplicatedCode
+@pytest.mark.unittest
+class TestTorchRagged:
+    def test_pad_stack(self):
+        padded, mask = ttorch.pad_stack(_samples(), pad_value=-1)
+        assert isinstance(padded, ttorch.Tensor)
+        assert isinstance(mask, ttorch.Tensor)
+        assert padded.tokens.tolist() == [[1, 2, 3], [4, -1, -1]]
+        assert mask.tokens.tolist() == [[True, True, True], [True, False, False]]
+        assert padded.label.tolist() == [0, 1]
+        assert mask.label.tolist() == [True, True]
+
+        assert padded.img.shape == (2, 3, 3, 4)
+        assert mask.img.shape == (2, 3, 3)
+        assert mask.img.sum().item() == 2 * 3 + 3 * 1
+        assert padded.img[0, 2].eq(-1).all()
+        assert padded.img[1, :, 1:].eq(-1).all()
+        assert padded.img[1, :, 0].eq(2).all()
+
+        padded = ttorch.pad_stack([ttorch.tensor(s) for s in _samples()], return_mask=False)
+        assert padded.tokens.tolist() == [[1, 2, 3], [4, 0, 0]]
+
+        with pytest.raises(ValueError):
+            ttorch.pad_stack([])
+        with pytest.raises(ValueError):
+            ttorch.pad_stack([{'a': torch.zeros(2)}, {'b': torch.zeros(2)}])
+        with pytest.raises(ValueError):
+            ttorch.pad_stack([{'a': torch.zeros(2)}, {'a': torch.zeros(2, 1)}])
+
+    def test_masked_reduce(self):
+        padded, mask = ttorch.pad_stack(_samples())
+        s = ttorch.masked_sum(padded, mask)
+        assert s.tokens.item() == 10
+        assert s.img.item() == 2 * 3 * 4 + 2 * 3 * 1 * 4
+
+        m = ttorch.masked_mean(padded, mask, dim=0)
+        assert torch.allclose(m.tokens, torch.tensor([2.5, 2.0, 3.0]))
+        assert torch.allclose(m.label, torch.tensor(0.5))
+
+        m = ttorch.masked_mean(padded.tokens, mask.tokens, dim=1, keepdim=True)
+        assert m.tolist() == [[2.0], [4.0]]
+
+        m = ttorch.masked_mean(ttorch.Tensor({'a': torch.ones(2, 2)}),
+                               ttorch.Tensor({'a': torch.tensor([[True, False], [False, False]])}), dim=1)
+        assert m.a[0].item() == 1.0
+        assert m.a[1].isnan()
+
+        with pytest.raises(KeyError):
+            ttorch.masked_sum(padded, ttorch.Tensor({'tokens': mask.tokens}))
+
+    def test_ragged(self):
+        r = ttorch.ragged_stack([
+            {'e': torch.ones(3, 2), 'n': torch.tensor([1])},
+            {'e': torch.zeros(0, 2), 'n': torch.tensor([2, 3])},
+            {'e': torch.arange(4.).reshape(2, 2), 'n': torch.tensor([4, 5, 6])},
+        ])
+        assert isinstance(r, Object)
+        assert isinstance(r.e, ttorch.RaggedTensor)
+        assert len(r.e) == 3
+        assert r.e.values.shape == (5, 2)
+        assert r.e.lengths.tolist() == [3, 0, 2]
+        assert r.e.offsets.tolist() == [0, 3, 3, 5]
+        assert r.e[2].tolist() == [[0.0, 1.0], [2.0, 3.0]]
+        assert r.e[-2].shape == (0, 2)
+        with pytest.raises(IndexError):
+            _ = r.e[3]
+        assert r.e.segment_ids().tolist() == [0, 0, 0, 2, 2]
+        assert 'items: 3' in repr(r.e)
+
+        assert r.e.sum().tolist() == [[3.0, 3.0], [0.0, 0.0], [2.0, 4.0]]
+        mean = r.e.mean()
+        assert mean[0].tolist() == [1.0, 1.0]
+        assert mean[1].isnan().all()
+        assert r.n.sum().tolist() == [1, 5, 15]
+        assert r.n.mean().tolist() == [1.0, 2.5, 5.0]
+
+        padded, mask = r.n.to_padded(pad_value=-1)
+        assert padded.tolist() == [[1, -1, -1], [2, 3, -1], [4, 5, 6]]
+        assert mask.tolist() == [[True, False, False], [True, True, False], [True, True, True]]
+        assert r.e.to_padded(return_mask=False).shape == (3, 3, 2)
+        assert r.e.to(torch.float64).values.dtype == torch.float64
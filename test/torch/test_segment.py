@@ -0,0 +1,66 @@
+import math
+
+import pytest
+import torch
+
+import treetensor.torch as ttorch
+
+
+# noinspection DuplicatedCode
+@pytest.mark.unittest
+class TestTorchSegment:
+    def _tree(self):
+        return ttorch.Tensor({
+            'reward': torch.tensor([1., -2., 3., 4., 5.]),
+            'obs': torch.tensor([[1, 1], [2, 2], [3, 3], [4, 4], [5, 5]]),
+        })
+
+    def test_segment_sum(self):
+        ids = torch.tensor([0, 0, 2, 2, 1])
+        s = ttorch.segment_sum(self._tree(), ids)
+        assert isinstance(s, ttorch.Tensor)
+        assert s.reward.tolist() == [-1., 5., 7.]
+        assert s.obs.tolist() == [[3, 3], [5, 5], [7, 7]]
+        assert s.obs.dtype == torch.long
+
+        s = ttorch.segment_sum(self._tree(), [0, 0, 2, 2, 1], num_segments=5)
+        assert s.reward.tolist() == [-1., 5., 7., 0., 0.]
+        assert ttorch.segment_sum(torch.ones(3), torch.tensor([1, 1, 1])).tolist() == [0., 3.]
+
+    def test_segment_mean(self):
+        m = ttorch.segment_mean(self._tree(), torch.tensor([0, 0, 3, 3, 3]))
+        assert m.reward[0].item() == -0.5
+        assert math.isnan(m.reward[1].item())
+        assert m.reward[3].item() == 4.
+        assert m.obs.dtype == torch.float32
+        assert m.obs[3].tolist() == [4., 4.]
+
+    def test_segment_max(self):
+        m = ttorch.segment_max(self._tree(), torch.tensor([0, 0, 2, 2, 2]))
+        assert m.reward.tolist() == [1., 0., 5.]
+        assert m.obs.tolist() == [[2, 2], [0, 0], [5, 5]]
+        m = ttorch.segment_max(torch.tensor([-3., -1.]), torch.tensor([0, 0]))
+        assert m.tolist() == [-1.]
+
+    def test_segment_max_legacy(self, monkeypatch):
+        from treetensor.torch import segment
+        monkeypatch.setattr(segment, '_HAS_SCATTER_REDUCE', False)  # the same as torch<1.12
+        m = ttorch.segment_max(self._tree(), torch.tensor([0, 0, 2, 2, 2]))
+        assert m.reward.tolist() == [1., 0., 5.]
+        assert m.obs.tolist() == [[2, 2], [0, 0], [5, 5]]
+        m = ttorch.segment_max(torch.tensor([-3., -1.]), torch.tensor([0, 0]), num_segments=2)
+        assert m.tolist() == [-1., 0.]
+
+    def test_segment_errors(self):
+        with pytest.raises(ValueError):
+            ttorch.segment_sum(self._tree(), torch.tensor([0, 1]))
+        with pytest.raises(ValueError):
+            ttorch.segment_sum(self._tree(), torch.tensor([[0, 1, 1, 1, 1]]))
+        with pytest.raises(ValueError):
+            ttorch.segment_sum(self._tree(), torch.tensor([0., 1., 1., 1., 1.]))
+        with pytest.raises(IndexError):
+            ttorch.segment_sum(self._tree(), torch.tensor([0, 1, 1, 1, 2]), num_segments=2)
+        with pytest.raises(IndexError):
+            ttorch.segment_sum(self._tree(), torch.tensor([-1, 0, 0, 1, 1]))
+        with pytest.raises(IndexError):
+            ttorch.segment_max(self._tree(), torch.tensor([-1, 0, 0, 1, 1]), num_segments=2)
@@ -0,0 +1,63 @@
+import pytest
+import torch
+
+import treetensor.torch as ttorch
+from treetensor.common import Object
+
+
+def _demo():
+    return ttorch.Tensor({
+        'a': torch.randn(100),
+        'b': {'x': torch.randn(60), 'y': torch.randn(50)},
+        'c': torch.randint(0, 5, (10,)),
+    })
+
+
+# noinspection DuplicatedCode
+@pytest.mark.unittest
+class TestTorchShard:
+    def test_shard_plan(self):
+        plan = ttorch.shard_plan(_demo(), ['cpu', 'meta'])
+        assert plan == Object({
+            'a': torch.device('cpu'),
+            'b': {'x': torch.device('meta'), 'y': torch.device('meta')},
+            'c': torch.device('cpu'),
+        })
+
+        plan1 = ttorch.shard_plan(_demo(), ['cpu', 'meta'], policy='by_key')
+        plan2 = ttorch.shard_plan(ttorch.Tensor({'b': {'y': torch.randn(1)}}), ['cpu', 'meta'], policy='by_key')
+        assert plan1.b.y == plan2.b.y
+
+        with pytest.raises(ValueError):
+            ttorch.shard_plan(_demo(), ['cpu'], policy='random')
+        with pytest.raises(ValueError):
+            ttorch.shard_plan(_demo(), [])
+
+    def test_shard(self):
+        t = _demo()
+        st = ttorch.shard(t, ['cpu', 'meta'])
+        assert isinstance(st, ttorch.Tensor)
+        assert st.devices == {torch.device('cpu'), torch.device('meta')}
+        assert st.a.device == torch.device('cpu')
+        assert st.b.x.device == torch.device('meta')
+        assert st.a is t.a
+
+        # operations are executed on the devices of leaves
+        r = st * 2 + ttorch.shard_like(ttorch.ones_like(t), st)
+        assert r.a.device == torch.device('cpu')
+        assert r.b.y.device == torch.device('meta')
+        assert r.b.y.shape == (50,)
+
+        with pytest.raises(KeyError):
+            ttorch.shard_like(t, ttorch.Tensor({'a': torch.randn(100)}))
+
+    def test_gather_shards(self):
+        t = _demo()
+        st = ttorch.shard(t, ['cpu', 'cpu'])
+        assert ttorch.equal(st, t)
+
+        st = ttorch.shard(t, ['cpu', 'meta'])
+        gt = ttorch.gather_shards(st, 'meta')
+        assert gt.devices == {torch.device('meta')}
+        assert gt.shape == t.shape
+        assert ttorch.gather_shards(torch.randn(3), 'meta').device == torch.device('meta')
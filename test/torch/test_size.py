@@ -63,3 +63,74 @@ class TestTorchSize:
             'b': {'x': [3, 4, ]},
             'c': [5],
         }).count(3) == 2
+
+    @choose_mark()
+    def test_broadcast_shapes(self):
+        t = ttorch.Size({
+            'a': [1, 2],
+            'b': {'x': [3, 1, 4]},
+            'c': [],
+        })
+        assert t.broadcast_shapes([3, 1, 1]) == ttorch.Size({
+            'a': [3, 1, 2],
+            'b': {'x': [3, 1, 4]},
+            'c': [3, 1, 1],
+        })
+        assert t.broadcast_shapes({
+            'a': [0, 1],
+            'b': {'x': [2, 1]},
+            'c': [5],
+        }) == ttorch.Size({
+            'a': [0, 2],
+            'b': {'x': [3, 2, 4]},
+            'c': [5],
+        })
+
+        assert t.broadcast_shapes(ttorch.Size({
+            'a': [4, 1, 1],
+            'b': {'x': [2, 1, 1, 1]},
+            'c': [2],
+        })) == ttorch.Size({
+            'a': [4, 1, 2],
+            'b': {'x': [2, 3, 1, 4]},
+            'c': [2],
+        })
+
+        with pytest.raises(RuntimeError):
+            t.broadcast_shapes([2, 1, 1])
+        with pytest.raises(ValueError):
+            t.broadcast_shapes({'a': [1], 'b': {'y': [1]}, 'c': [1]})
+
+    @choose_mark()
+    def test___eq__(self):
+        t = ttorch.Size({
+            'a': [1, 2, 3],
+            'b': {'x': [3, 4, ]},
+            'c': [],
+        })
+        assert t == ttorch.Size({'a': [1, 2, 3], 'b': {'x': [3, 4]}, 'c': []})
+        assert not (t != ttorch.Size({'a': [1, 2, 3], 'b': {'x': [3, 4]}, 'c': []}))
+        assert t != ttorch.Size({'a': [1, 2, 3], 'b': {'x': [3, 4]}, 'c': [1]})
+        assert t != ttorch.Size({'a': [1, 2, 3], 'b': {'y': [3, 4]}, 'c': []})
+        assert t != ttorch.Size({'a': [1, 2, 3], 'b': {'x': [3, 5]}, 'c': []})
+
+        assert hash(t) == hash(ttorch.Size({'a': [1, 2, 3], 'b': {'x': [3, 4]}, 'c': []}))
+        assert len({t, ttorch.Size({'a': [1, 2, 3], 'b': {'x': [3, 4]}, 'c': []})}) == 1
+
+    @choose_mark(name='numel')
+    def test_modified(self):
+        t = ttorch.Size({
+            'a': [1, 2, 3],
+            'b': {'x': [3, 4, ]},
+            'c': [5],
+        })
+        assert t.numel() == 23
+        t.c = torch.Size([3, 3])
+        assert t.numel() == 27
+        assert t.count(3) == 4
+
+        t.b.x = torch.Size([2])
+        assert t.numel() == 17
+        assert t.count(3) == 3
+        del t['c']
+        assert t.numel() == 8
@@ -1,3 +1,4 @@
+import threading
 import unittest
 
 import pytest
@@ -12,6 +13,12 @@ N, M, T = 200, 2, 50
 S1, S2, S3 = 32, 128, 512
 
 
+def _clear_timelines(streams):
+    for s in streams:
+        s.timeline.clear()
+    return streams
+
+
 # noinspection DuplicatedCode
 @pytest.mark.unittest
 class TestTorchStream:
@@ -59,3 +66,145 @@ class TestTorchStream:
             assert torch.isclose(
                 c[f'a{i}'], torch.matmul(a[f'a{i}'], b[f'a{i}'])
             ).all(), f'Not match on item {f"a{i}"!r}.'
+
+    def test_stream_cpu(self):
+        a = ttorch.randn({f'a{i}': (S1, S2) for i in range(6)})
+        b = ttorch.randn({f'a{i}': (S2, S1) for i in range(6)})
+        with ttorch.stream(3, backend='cpu') as executor:
+            streams = _clear_timelines(executor.streams)
+            assert ttorch.current_streams() == streams
+            assert [s.index for s in streams] == [0, 1, 2]
+            c = ttorch.matmul(a, b)
+            d = ttorch.neg(c)
+            for i in range(6):
+                assert torch.isclose(d[f'a{i}'], -(a[f'a{i}'] @ b[f'a{i}'])).all()
+
+            # the consumers follow the streams of the producers, no need to wait
+            launches = sum(len(s.timeline) for s in streams)
+            assert launches == 12
+            assert all(item[0] == 'launch' for s in streams for item in s.timeline)
+            assert all(s.timeline.count(('launch', 'matmul')) == 2 for s in streams)
+            assert all(s.timeline.count(('launch', 'neg')) == 2 for s in streams)
+        assert ttorch.current_streams() is None
+
+    def test_stream_cpu_affinity(self):
+        t = ttorch.randn({'obs': (3, 4), 'reward': (3,), 'done': (3,)})
+        with ttorch.stream(4, backend='cpu') as executor:
+            s0, s1, s2, s3 = _clear_timelines(executor.streams)
+            assert ttorch.stream_affinity(t.obs, 2) is t.obs
+            x = ttorch.exp(t)
+            i = s2.timeline.index(('wait', 0, 0))
+            assert s2.timeline[i + 1] == ('launch', 'exp')
+
+            # pinned by the leaf keys, so the assignment is stable
+            deltas = []
+            for _ in range(2):
+                ttorch.stream_affinity(x)
+                counts = [s.timeline.count(('launch', 'neg')) for s in (s0, s1, s2, s3)]
+                y = ttorch.neg(x)
+                deltas.append([s.timeline.count(('launch', 'neg')) - c
+                               for s, c in zip((s0, s1, s2, s3), counts)])
+            assert deltas[0] == deltas[1]
+            assert sum(deltas[0]) == 3
+            assert ttorch.equal(y, -x)
+
+        # consumed on the current stream after the stream support is closed
+        _clear_timelines((s0, s1, s2, s3))
+        z = ttorch.stream_wait(y)
+        assert z is y
+        assert any(item[0] == 'wait' for item in s0.timeline)
+
+    def test_stream_cpu_cross(self):
+        a = ttorch.tensor({'x': [1.0, 2.0], 'y': [3.0, 4.0]})
+        with ttorch.stream(2, backend='cpu') as executor:
+            s0, s1 = executor.streams
+            ttorch.stream_affinity(a.x, 0)
+            ttorch.stream_affinity(a.y, 1)
+            b = ttorch.exp(a)
+            c = ttorch.Tensor({'x': b.y, 'y': b.x})
+            ttorch.stream_affinity(c.x, 0)
+            ttorch.stream_affinity(c.y, 1)
+            _clear_timelines((s0, s1))
+
+            d = ttorch.add(c, 1)
+            # each leaf waits for the event recorded on the other stream
+            assert s0.timeline[0][:2] == ('wait', 1)
+            assert s1.timeline[0][:2] == ('wait', 0)
+            assert torch.isclose(d.x, torch.tensor([3.0, 4.0]).exp() + 1).all()
+
+    def test_stream_invalid_backend(self):
+        with pytest.raises(ValueError):
+            ttorch.stream(2, backend='tpu')
+
+    def test_stream_per_thread(self):
+        barrier = threading.Barrier(2)
+        results = {}
+
+        def _worker(name, cnt):
+            with ttorch.stream(cnt, backend='cpu'):
+                barrier.wait()
+                results[name] = len(ttorch.current_streams())
+                barrier.wait()
+
+        threads = [threading.Thread(target=_worker, args=(f't{cnt}', cnt)) for cnt in (2, 5)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+
+        assert results == {'t2': 2, 't5': 5}
+        assert ttorch.current_streams() is None
+
+    def test_stream_thread_pool(self):
+        a = ttorch.randn({f'a{i}': (S1, S2) for i in range(8)})
+        b = ttorch.randn({f'a{i}': (S2, S1) for i in range(8)})
+        names = []
+
+        class _Executor(ttorch.ThreadPoolStreamExecutor):
+            def call(self, func, *args, **kwargs):
+                names.append(threading.current_thread().name)
+                return func(*args, **kwargs)
+
+        executor = _Executor(4)
+        try:
+            with ttorch.stream(executor=executor) as e:
+                assert e is executor
+                assert ttorch.current_executor() is executor
+                assert ttorch.current_streams() is None
+                c = ttorch.matmul(a, b)
+                d = c.exp().sum(dim=1)
+                with pytest.raises(RuntimeError):
+                    ttorch.matmul(a, a)
+        finally:
+            executor.close()
+
+        assert isinstance(c, ttorch.Tensor)
+        assert len(names) == 16  # leaves of the 2 matmul calls
+        assert all(name.startswith('treetensor') for name in names)
+        for i in range(8):
+            assert torch.isclose(c[f'a{i}'], a[f'a{i}'] @ b[f'a{i}']).all()
+            assert torch.isclose(d[f'a{i}'], (a[f'a{i}'] @ b[f'a{i}']).exp().sum(dim=1)).all()
+        assert ttorch.current_executor() is None
+
+    def test_stream_thread_backend(self):
+        a = ttorch.randn({f'a{i}': (S1, S2) for i in range(4)})
+        b = ttorch.randn({f'a{i}': (S2, S1) for i in range(4)})
+        with ttorch.stream(2, backend='thread') as e:
+            assert isinstance(e, ttorch.ThreadPoolStreamExecutor)
+            c = ttorch.matmul(a, b)
+        for i in range(4):
+            assert torch.isclose(c[f'a{i}'], a[f'a{i}'] @ b[f'a{i}']).all()
+
+        # the executor created by the context is shut down at exit
+        assert ttorch.current_executor() is None
+        with pytest.raises(RuntimeError):
+            e.submit(lambda: None)
+
+        # while the given one is still usable
+        executor = ttorch.ThreadPoolStreamExecutor(2)
+        try:
+            with ttorch.stream(executor=executor):
+                pass
+            assert executor.submit(lambda: 1).result() == 1
+        finally:
+            executor.close()
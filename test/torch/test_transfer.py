@@ -0,0 +1,82 @@
+import unittest
+
+import pytest
+import torch
+
+import treetensor.torch as ttorch
+from treetensor.common import Object
+
+
+def _demo(seed):
+    torch.manual_seed(seed)
+    return ttorch.Tensor({
+        'obs': torch.randn(4, 3),
+        'action': torch.randint(0, 5, (4,)),
+        'done': torch.rand(4) > 0.5,
+        'info': {
+            'half': torch.randn(4, 2).half(),
+            'empty': torch.zeros(0, 3),
+            'strided': torch.randn(3, 4).T,
+        },
+    })
+
+
+# noinspection DuplicatedCode
+@pytest.mark.unittest
+class TestTorchTransfer:
+    def test_transfer_cpu(self):
+        pipeline = ttorch.TransferPipeline('cpu')
+        assert pipeline.device == torch.device('cpu')
+        assert not pipeline.pin_memory
+
+        t = _demo(0)
+        r = pipeline.transfer(t)
+        assert isinstance(r, ttorch.Tensor)
+        assert ttorch.equal(r, t)
+        assert r.dtype == t.dtype
+        assert r.shape == t.shape
+
+        # all the leaves share one packed buffer
+        ptrs = {leaf.untyped_storage().data_ptr() for leaf in (r.obs, r.action, r.done, r.info.half)}
+        assert len(ptrs) == 1
+        assert r.obs.data_ptr() != t.obs.data_ptr()
+
+        # the results are not overwritten when the staging buffers are reused
+        r2 = pipeline(_demo(1))
+        r3 = pipeline(_demo(2))
+        assert ttorch.equal(r, t)
+        assert ttorch.equal(r2, _demo(1))
+        assert ttorch.equal(r3, _demo(2))
+
+    def test_transfer_mixed(self):
+        pipeline = ttorch.TransferPipeline('cpu', buffers=1)
+        t = Object({'a': torch.randn(3), 'b': 'text', 'c': {'d': 1}})
+        r = pipeline.transfer(t)
+        assert isinstance(r, Object)
+        assert r.b == 'text'
+        assert r.c.d == 1
+        assert torch.equal(r.a, t.a)
+
+        assert torch.equal(pipeline.transfer(torch.arange(5)), torch.arange(5))
+        assert pipeline.transfer(Object({'a': 'text'})).a == 'text'
+
+        with pytest.raises(ValueError):
+            ttorch.TransferPipeline('cpu', buffers=0)
+
+    def test_iterate(self):
+        pipeline = ttorch.TransferPipeline('cpu')
+        batches = [_demo(i) for i in range(5)]
+        results = list(pipeline.iterate(batches))
+        assert len(results) == 5
+        for batch, result in zip(batches, results):
+            assert ttorch.equal(batch, result)
+        assert list(pipeline.iterate([])) == []
+
+    @unittest.skipUnless(torch.cuda.is_available(), 'CUDA required')
+    def test_transfer_cuda(self):
+        pipeline = ttorch.TransferPipeline('cuda')
+        assert pipeline.pin_memory
+        batches = [_demo(i) for i in range(5)]
+        for batch, result in zip(batches, pipeline.iterate(batches)):
+            assert result.devices == {torch.device('cuda', torch.cuda.current_device())}
+            assert ttorch.equal(result.cpu(), batch)
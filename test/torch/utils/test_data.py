@@ -0,0 +1,132 @@
+from collections import namedtuple
+
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import Dataset
+
+import treetensor.torch as ttorch
+from treetensor.common import Object
+from treetensor.torch.utils.data import tree_collate, TreeDataLoader
+
+
+def _get_item(i, name=True):
+    item = {
+        'obs': {
+            'scalar': torch.full((12,), float(i)),
+            'image': torch.randn(3, 8, 8),
+        },
+        'action': torch.tensor([i]),
+        'reward': np.array([i * 0.5], dtype=np.float32),
+        'done': i % 2 == 0,
+        'step': i,
+    }
+    if name:
+        item['name'] = f'item{i}'
+    return item
+
+
+class _Dataset(Dataset):
+    def __init__(self, n, name=False):
+        self.n = n
+        self.name = name
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, index):
+        if index == 13:
+            raise IndexError('broken item')
+        return _get_item(index, self.name)
+
+
+# noinspection DuplicatedCode
+@pytest.mark.unittest
+class TestTorchUtilsData:
+    def test_tree_collate(self):
+        batch = tree_collate([_get_item(i, name=False) for i in range(4)])
+        assert isinstance(batch, ttorch.Tensor)
+        assert batch.obs.image.shape == (4, 3, 8, 8)
+        assert torch.equal(batch.obs.scalar[:, 0], torch.tensor([0.0, 1.0, 2.0, 3.0]))
+        assert batch.action.shape == (4, 1)
+        assert batch.reward.shape == (4, 1)
+        assert batch.reward.dtype == torch.float32
+        assert torch.equal(batch.done, torch.tensor([True, False, True, False]))
+        assert torch.equal(batch.step, torch.tensor([0, 1, 2, 3]))
+
+        batch = tree_collate([_get_item(i) for i in range(4)])
+        assert isinstance(batch, Object)
+        assert batch.name == ['item0', 'item1', 'item2', 'item3']
+        assert batch.obs.image.shape == (4, 3, 8, 8)
+
+        # the same as the stack of trees
+        samples = [ttorch.tensor(_get_item(i, name=False)) for i in range(4)]
+        assert ttorch.equal(tree_collate(samples), ttorch.stack(samples))
+
+    def test_tree_collate_keys_order(self):
+        batch = tree_collate([{'a': 1, 'b': 2.0}, {'b': 3.0, 'a': 4}])
+        assert torch.equal(batch.a, torch.tensor([1, 4]))
+        assert torch.equal(batch.b, torch.tensor([2.0, 3.0]))
+
+        with pytest.raises(ValueError):
+            tree_collate([{'a': 1, 'b': 2.0}, {'a': 4}])
+        with pytest.raises(ValueError):
+            tree_collate([{'a': 1, 'b': 2.0}, {'a': 4, 'c': 3.0}])
+        with pytest.raises(ValueError):
+            tree_collate([])
+
+    def test_tree_collate_tuple(self):
+        pair = namedtuple('pair', ['x', 'y'])
+        batch = tree_collate([pair({'a': torch.ones(2)}, i) for i in range(3)])
+        assert isinstance(batch, pair)
+        assert batch.x.a.shape == (3, 2)
+        assert torch.equal(batch.y, torch.tensor([0, 1, 2]))
+
+        x, y = tree_collate([({'a': torch.ones(2)}, torch.zeros(1)) for _ in range(3)])
+        assert x.a.shape == (3, 2)
+        assert y.shape == (3, 1)
+
+    def test_tree_collate_out(self):
+        samples = [{'a': torch.randn(2), 'b': {'c': True}} for _ in range(3)]
+        out = tree_collate(samples)
+        ptr = out.a.data_ptr()
+
+        samples = [{'a': torch.randn(2), 'b': {'c': False}} for _ in range(3)]
+        result = tree_collate(samples, out=out)
+        assert result.a.data_ptr() == ptr
+        assert torch.equal(out.a, torch.stack([s['a'] for s in samples]))
+        assert not out.b.c.any()
+
+    @pytest.mark.parametrize('prefetch', [0, 1, 3])
+    def test_loader(self, prefetch):
+        loader = TreeDataLoader(_Dataset(10, name=True), batch_size=4, prefetch=prefetch)
+        assert loader.collate_fn is tree_collate
+        batches = list(loader)
+        assert len(batches) == len(loader) == 3
+        assert [b.action.shape[0] for b in batches] == [4, 4, 2]
+        assert torch.equal(torch.cat([b.step for b in batches]), torch.arange(10))
+        assert batches[2].name == ['item8', 'item9']
+
+    def test_loader_device(self):
+        loader = TreeDataLoader(_Dataset(10), batch_size=5, device='cpu')
+        batches = list(loader)
+        assert all(b.devices == {torch.device('cpu')} for b in batches)
+        assert torch.equal(batches[1].step, torch.arange(5, 10))
+        assert batches[0].obs.image.untyped_storage().data_ptr() == \
+               batches[0].action.untyped_storage().data_ptr()
+
+    def test_loader_error(self):
+        loader = TreeDataLoader(_Dataset(20), batch_size=4, prefetch=2)
+        with pytest.raises(IndexError):
+            list(loader)
+
+        # stop before the end
+        for i, _ in enumerate(TreeDataLoader(_Dataset(10), batch_size=1, prefetch=2)):
+            if i == 2:
+                break
+
+        with pytest.raises(ValueError):
+            TreeDataLoader(_Dataset(10), prefetch=-1)
+
+    def test_module(self):
+        assert ttorch.utils.data.tree_collate is tree_collate
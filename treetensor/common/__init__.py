@@ -1,5 +1,7 @@
+from .dispatch import *
 from .module import *
 from .object import *
 from .proxy import *
+from .scalars import *
 from .trees import *
 from .wrappers import *
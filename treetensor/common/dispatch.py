@@ -0,0 +1,184 @@
+from functools import wraps
+from typing import Tuple
+
+from treevalue import TreeValue, unflatten
+
+from .scalars import TreeSpec
+from .trees import _tree_leaves
+from ..profiler import profile_leaves
+
+__all__ = [
+    'leafwise_call', 'broadcast_treelize',
+]
+
+
+class _Leaves:
+    """
+    Leaves of a tree argument, broadcast to the spec of the deepest tree argument.
+    """
+    __slots__ = ('spec', 'values')
+
+    def __init__(self, tree):
+        self.spec, self.values = _tree_leaves(tree)
+
+    def aligned(self, spec: TreeSpec):
+        if self.spec is spec:
+            return self.values
+        try:
+            order = spec.broadcast_of(self.spec)  # the indices are cached in the specs
+        except ValueError:
+            raise KeyError('Argument keys not match in strict mode, '
+                           'the structures of the tree arguments are different.')
+        return [self.values[i] for i in order]
+
+
+def _mark(x, found: list, nested: bool = True):
+    """
+    Replace the trees in the argument with :class:`_Leaves`, including the trees in the lists and tuples \
+    when ``nested`` is enabled.
+    """
+    if isinstance(x, TreeValue):
+        found.append(_Leaves(x))
+        return found[-1]
+    elif nested and isinstance(x, (list, tuple)) and any(isinstance(item, TreeValue) for item in x):
+        return type(x)(_mark(item, found) for item in x)
+    else:
+        return x
+
+
+def _column(x, spec: TreeSpec):
+    """
+    Values of the argument ``x`` for each leaf.
+    """
+    if isinstance(x, _Leaves):
+        return x.aligned(spec)
+    elif isinstance(x, (list, tuple)) and any(isinstance(item, _Leaves) for item in x):
+        columns = [_column(item, spec) for item in x]
+        columns = [[item] * len(spec) if column is None else column for item, column in zip(x, columns)]
+        return [type(x)(values) for values in zip(*columns)]
+    else:
+        return None
+
+
+def _leafwise(args, kwargs, nested: bool = True):
+    """
+    Spec of the deepest tree argument, and the iterator of the arguments for each leaf.
+    """
+    found = []
+    args = [_mark(arg, found, nested) for arg in args]
+    kwargs = {key: _mark(value, found, nested) for key, value in kwargs.items()}
+    if not found:
+        raise TypeError('At least 1 tree argument is required.')
+
+    spec = found[0].spec
+    for leaves in found[1:]:  # the deepest structure, which all the others can be broadcast to
+        if leaves.spec is not spec:
+            try:
+                spec.broadcast_of(leaves.spec)
+            except ValueError:
+                try:
+                    leaves.spec.broadcast_of(spec)
+                except ValueError:
+                    raise KeyError('Argument keys not match in strict mode, '
+                                   'the structures of the tree arguments are different.')
+                spec = leaves.spec
+
+    arg_columns = [_column(arg, spec) for arg in args]
+    kwarg_columns = {key: _column(value, spec) for key, value in kwargs.items()}
+
+    def _calls():
+        for i in range(len(spec)):
+            _args = [arg if column is None else column[i] for arg, column in zip(args, arg_columns)]
+            _kwargs = {
+                key: value if kwarg_columns[key] is None else kwarg_columns[key][i]
+                for key, value in kwargs.items()
+            }
+            yield _args, _kwargs
+
+    return spec, _calls()
+
+
+def leafwise_call(func, args, kwargs) -> Tuple[TreeSpec, list]:
+    """
+    Overview:
+        Call ``func`` for each leaf of the tree arguments, which is used by the dispatch protocols \
+        (such as ``__array_ufunc__`` and ``__torch_function__``). The trees can be in the lists and tuples \
+        of the arguments (such as ``torch.stack([t1, t2])``), and they are flattened only once. \
+        The trees are broadcast to the deepest one with the cached indices of :meth:`TreeSpec.broadcast_of`, \
+        so there is no more lookup of the keys for the trees with the same structure, and the leaves \
+        at the prefixes of the deepest tree (such as ``{'obs': 0.5, 'reward': 2.0}``) are used for \
+        the subtrees below them.
+
+    Arguments:
+        - func: Function for each leaf.
+        - args: Positional arguments, should contain at least one tree.
+        - kwargs: Keyword arguments.
+
+    Returns:
+        - spec: Spec of the deepest tree, whose paths are the paths of the results.
+        - results: List of the results of the leaves.
+    """
+    spec, calls = _leafwise(args, kwargs)
+    return spec, [profile_leaves(1, func, *_args, **_kwargs) for _args, _kwargs in calls]
+
+
+def _is_plain(trees) -> bool:
+    if len(trees) < 2:
+        return True
+    spec, _ = _tree_leaves(trees[0])
+    return all(_tree_leaves(tree)[0] is spec for tree in trees[1:])
+
+
+def broadcast_treelize(treelize, return_type):
+    """
+    Overview:
+        Wrap ``func_treelize``, so that the trees with different structures are broadcast by \
+        the prefixes. The leaf at a higher level of a tree (such as ``{'obs': 0.5, 'reward': 2.0}``) \
+        is used for the whole subtree below it in the other trees, and the dicts are used as trees \
+        when there are tree arguments, like :mod:`treetensor.numpy`. The broadcasting is resolved \
+        once for each pair of structures and cached in :class:`TreeSpec`, so the broadcast trees \
+        are never built.
+
+        The trees with the same structure are processed by the original ``func_treelize``, \
+        and the functions with ``subside``, ``rise``, ``inherit=False`` or the other modes are not changed.
+
+    Arguments:
+        - treelize: Original ``func_treelize``.
+        - return_type: Default return type of the ``treelize``.
+    """
+
+    @wraps(treelize)
+    def _treelize(*args, **kwargs):
+        _original = treelize(*args, **kwargs)
+        if args or kwargs.get('subside', None) or kwargs.get('rise', None) or \
+                kwargs.get('mode', 'strict') != 'strict' or not kwargs.get('inherit', True):
+            return _original
+        rtype = kwargs.get('return_type', return_type)
+
+        def _tree_arg(x):
+            return TreeValue(x) if isinstance(x, dict) else x
+
+        def _decorator(func):
+            _plain = _original(func)
+
+            @wraps(_plain)
+            def _new_func(*args_, **kwargs_):
+                values = (*args_, *kwargs_.values())
+                trees = [x for x in values if isinstance(x, TreeValue)]
+                has_dict = any(isinstance(x, dict) for x in values)
+                if not trees or (not has_dict and _is_plain(trees)):
+                    return _plain(*args_, **kwargs_)
+
+                spec, calls = _leafwise(
+                    [_tree_arg(x) for x in args_],
+                    {key: _tree_arg(value) for key, value in kwargs_.items()},
+                    nested=False,
+                )
+                results = [func(*_args, **_kwargs) for _args, _kwargs in calls]
+                return unflatten(zip(spec.paths, results), return_type=rtype)
+
+            return _new_func
+
+        return _decorator
+
+    return _treelize
@@ -8,6 +8,7 @@ from treevalue import func_treelize as original_func_treelize
 
 from .trees import auto_tree
 from .wrappers import return_self
+from ..profiler import profile_treelize, profile_entry, profile_result
 from ..utils import doc_from_base as original_doc_from_base
 from ..utils import replaceable_partial
 
@@ -17,17 +18,18 @@ __all__ = [
 
 
 def module_func_loader(base, cls: Type[TreeValue], cls_mapper=None):
-    func_treelize = replaceable_partial(original_func_treelize, return_type=cls)
+    func_treelize = profile_treelize(replaceable_partial(original_func_treelize, return_type=cls))
     doc_from_base = replaceable_partial(original_doc_from_base, base=base)
     outer_frame = inspect.currentframe().f_back
     outer_module = outer_frame.f_globals.get('__name__', None)
-    auto_tree_cls = replaceable_partial(auto_tree, cls=cls_mapper or cls)
+    auto_tree_cls = profile_result(replaceable_partial(auto_tree, cls=cls_mapper or cls))
 
     def _load_func(name):
         func = getattr(base, name)
         return_self_dec = return_self if func.__name__.endswith("_") else (lambda x: x)
 
         @doc_from_base()
+        @profile_entry(f'{outer_module}.{name}')
         @return_self_dec
         @post_process(auto_tree_cls)
         @func_treelize(return_type=TreeValue, subside=True, rise=True)
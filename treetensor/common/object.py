@@ -1,9 +1,8 @@
 import builtins
 
-from treevalue import method_treelize
+from treevalue import flatten
 
 from .trees import BaseTreeStruct, clsmeta
-from .wrappers import ireduce
 
 __all__ = [
     "Object",
@@ -39,8 +38,6 @@ class Object(BaseTreeStruct, metaclass=clsmeta(_object, allow_dict=True)):
         """
         BaseTreeStruct.__init__(self, data)
 
-    @ireduce(builtins.all, piter=list)
-    @method_treelize()
     def all(self):
         """
         The values in this tree is all true or not.
@@ -56,10 +53,8 @@ class Object(BaseTreeStruct, metaclass=clsmeta(_object, allow_dict=True)):
             True
 
         """
-        return not not self
+        return builtins.all(value for _, value in flatten(self))
 
-    @ireduce(builtins.any, piter=list)
-    @method_treelize()
     def any(self):
         """
         The values in this tree is not all False or yes.
@@ -75,4 +70,26 @@ class Object(BaseTreeStruct, metaclass=clsmeta(_object, allow_dict=True)):
             True
 
         """
-        return not not self
+        return builtins.any(value for _, value in flatten(self))
+
+    def pack(self):
+        """
+        Pack the tree of scalars into a :class:`treetensor.common.ScalarArray`, \
+        so that the operations on it are vectorized with numpy.
+
+        Examples::
+
+            >>> from treetensor.common import Object
+            >>> t = Object({'a': 1, 'b': {'x': 2, 'y': 3}})
+            >>> packed = t.pack()
+            >>> packed
+            <ScalarArray leaves: 3, dtype: int64>
+            >>> (packed * 2 + 1).unpack()
+            <Object 0x7f2b1c3e6f10>
+            ├── 'a' --> 3
+            └── 'b' --> <Object 0x7f2b1c3e6e50>
+                ├── 'x' --> 5
+                └── 'y' --> 7
+        """
+        from .scalars import ScalarArray
+        return ScalarArray.from_tree(self)
@@ -3,10 +3,11 @@ from functools import wraps, lru_cache
 from types import MethodType
 
 from hbutils.reflection import post_process
-from treevalue import method_treelize, TreeValue
+from treevalue import method_treelize as original_method_treelize, TreeValue
 
-from .trees import auto_tree
+from .trees import auto_tree, mark_mutated
 from .wrappers import return_self
+from ..profiler import profile_treelize, profile_entry, profile_result
 from ..utils import doc_from_base as original_doc_from_base
 from ..utils import replaceable_partial
 
@@ -14,8 +15,21 @@ __all__ = [
     'get_tree_proxy',
 ]
 
+method_treelize = profile_treelize(original_method_treelize)
 
-def get_tree_proxy(base, cls_mapper=None):
+
+def _mark_mutated_after(func):
+    @wraps(func)
+    def _new_func(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            mark_mutated()
+
+    return _new_func
+
+
+def get_tree_proxy(base, cls_mapper=None, mutating_names=()):
     doc_from_base = replaceable_partial(original_doc_from_base, base=base)
     outer_frame = inspect.currentframe().f_back
     outer_module = outer_frame.f_globals.get('__name__', None)
@@ -30,9 +44,12 @@ def get_tree_proxy(base, cls_mapper=None):
                     and callable(getattr(base, name)):
                 _origin_func = getattr(base, name)
                 return_self_deco = return_self if name.endswith('_') else (lambda x: x)
-                auto_tree_cls = replaceable_partial(auto_tree, cls=cls_mapper or self.__cls)
+                mutating_deco = _mark_mutated_after if name in mutating_names else (lambda x: x)
+                auto_tree_cls = profile_result(replaceable_partial(auto_tree, cls=cls_mapper or self.__cls))
 
                 @doc_from_base()
+                @profile_entry(f'{outer_module}.{self.__cls.__name__}.{name}')
+                @mutating_deco
                 @return_self_deco
                 @post_process(auto_tree_cls)
                 @method_treelize(return_type=TreeValue, rise=True)
@@ -0,0 +1,275 @@
+import operator
+import weakref
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+from treevalue import TreeValue, flatten, unflatten
+
+__all__ = [
+    'TreeSpec', 'ScalarArray',
+]
+
+
+class TreeSpec:
+    """
+    Overview:
+        Structure of a tree, which is the paths of the leaves. \
+        The recently used specs are cached, so the trees with the same structure share the same spec object. \
+        The orders and the broadcasting indices are cached with the weak references of the other specs, \
+        so they are dropped with the specs which are not used anymore.
+    """
+
+    def __init__(self, paths: Tuple[tuple, ...]):
+        self.paths = paths
+        self.index = {path: i for i, path in enumerate(paths)}
+        self._orders = weakref.WeakKeyDictionary()
+        self._broadcasts = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def of(cls, paths: Tuple[tuple, ...]) -> 'TreeSpec':
+        """
+        Overview:
+            Get the cached spec of the ``paths``.
+        """
+        return _get_spec(tuple(paths))
+
+    def order_of(self, other: 'TreeSpec') -> np.ndarray:
+        """
+        Overview:
+            Get the indices to reorder the values of ``other`` to this spec.
+        """
+        order = self._orders.get(other, None)
+        if order is None:
+            if len(other.paths) != len(self.paths) or any(p not in other.index for p in self.paths):
+                raise ValueError('The structures of the trees are different.')
+            order = np.array([other.index[p] for p in self.paths], dtype=np.intp)
+            self._orders[other] = order
+        return order
+
+    def broadcast_of(self, other: 'TreeSpec') -> np.ndarray:
+        """
+        Overview:
+            Get the indices to broadcast the values of ``other`` to this spec. The leaf of ``other`` \
+            at a prefix of the paths (such as ``('a',)`` for ``('a', 'x')`` and ``('a', 'y')``) \
+            is used for all the paths below it, so the trees with the same structure are supported as well.
+        """
+        order = self._broadcasts.get(other, None)
+        if order is None:
+            indices = []
+            for path in self.paths:
+                for k in range(len(path), -1, -1):
+                    index = other.index.get(path[:k], None)
+                    if index is not None:
+                        indices.append(index)
+                        break
+                else:
+                    raise ValueError(f'No prefix of path {path!r} is found in the other tree.')
+            if len(set(indices)) != len(other.paths):
+                raise ValueError('Some leaves of the other tree are not found in this tree.')
+
+            order = np.array(indices, dtype=np.intp)
+            self._broadcasts[other] = order
+        return order
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} leaves: {len(self.paths)}>'
+
+
+@lru_cache(maxsize=4096)  # bounded, the trees with changing keys (such as the ids of episodes) are common
+def _get_spec(paths: Tuple[tuple, ...]) -> TreeSpec:
+    return TreeSpec(paths)
+
+
+def _binary(op, reverse: bool = False):
+    def _func(self, other):
+        values = self._operand(other)
+        if values is NotImplemented:
+            return NotImplemented
+        return type(self)(self.spec, op(values, self.values) if reverse else op(self.values, values))
+
+    _func.__name__ = f'__{"r" if reverse else ""}{op.__name__.strip("_")}__'
+    return _func
+
+
+def _unary(op):
+    def _func(self):
+        return type(self)(self.spec, op(self.values))
+
+    _func.__name__ = f'__{op.__name__.strip("_")}__'
+    return _func
+
+
+class ScalarArray:
+    """
+    Overview:
+        Packed tree of scalars, the leaves are stored in one numpy array in the order of the :class:`TreeSpec`. \
+        The arithmetic, comparison and reduction operations are vectorized, instead of one Python call \
+        for each leaf, which is useful for the trees with a lot of scalars, such as the metrics.
+
+        It is created by :meth:`treetensor.common.Object.pack`, and can be converted back by :meth:`unpack`.
+
+    Examples::
+
+        >>> from treetensor.common import Object
+        >>> loss = Object({'a': 1.0, 'b': {'x': 2.0, 'y': 3.5}}).pack()
+        >>> count = Object({'a': 2, 'b': {'x': 4, 'y': 7}}).pack()
+        >>> mean = loss / count
+        >>> mean.unpack()
+        <Object 0x7f2b1c3e6f10>
+        ├── 'a' --> 0.5
+        └── 'b' --> <Object 0x7f2b1c3e6e50>
+            ├── 'x' --> 0.5
+            └── 'y' --> 0.5
+        >>> (mean > 0.4).all()
+        True
+    """
+
+    __slots__ = ('spec', 'values')
+    __array_priority__ = 100  # the operators of numpy arrays are not used
+
+    def __init__(self, spec: TreeSpec, values: np.ndarray):
+        if values.shape != (len(spec),):
+            raise ValueError(f'The shape of values should be {(len(spec),)!r}, but {values.shape!r} found.')
+        self.spec = spec
+        self.values = values
+
+    @classmethod
+    def from_tree(cls, tree) -> 'ScalarArray':
+        """
+        Overview:
+            Pack a tree of scalars (bools, integers, floats or complexes), such as the results of \
+            :meth:`treetensor.torch.Tensor.tolist`.
+
+        Arguments:
+            - tree: Tree of the scalars, which can be a dict.
+
+        Returns:
+            - packed: Packed :class:`ScalarArray`.
+        """
+        if isinstance(tree, Mapping):
+            tree = TreeValue(tree)
+        items = flatten(tree)
+        values = np.asarray([value for _, value in items])
+        if values.dtype.kind not in 'biufc' or values.ndim != 1:
+            raise TypeError('Only the trees of scalar numbers can be packed.')
+        return cls(_get_spec(tuple(path for path, _ in items)), values)
+
+    def unpack(self, return_type=None):
+        """
+        Overview:
+            Convert to the tree of Python scalars.
+
+        Arguments:
+            - return_type: Type of the tree, default is ``None`` which means :class:`treetensor.common.Object`.
+        """
+        if return_type is None:
+            from .object import Object
+            return_type = Object
+        return unflatten(zip(self.spec.paths, self.values.tolist()), return_type=return_type)
+
+    def tensor(self):
+        """
+        Overview:
+            Get the values as a 1-dim :class:`torch.Tensor`, in the order of :attr:`spec`.
+        """
+        import torch
+        return torch.as_tensor(self.values)
+
+    def to_tensor(self):
+        """
+        Overview:
+            Convert to the :class:`treetensor.torch.Tensor` of scalar tensors, \
+            which are the views of one tensor.
+        """
+        from ..torch import Tensor
+        return unflatten(zip(self.spec.paths, self.tensor().unbind(0)), return_type=Tensor)
+
+    def __len__(self):
+        return len(self.spec)
+
+    def __getitem__(self, path):
+        if isinstance(path, str):
+            path = tuple(path.split('.'))
+        return self.values[self.spec.index[path]].item()
+
+    def _operand(self, other):
+        if isinstance(other, ScalarArray):
+            if other.spec is self.spec:
+                return other.values
+            return other.values[self.spec.order_of(other.spec)]
+        elif isinstance(other, (TreeValue, Mapping)):
+            return self._operand(ScalarArray.from_tree(other))
+        elif isinstance(other, (bool, int, float, complex, np.generic)):
+            return other
+        else:
+            return NotImplemented
+
+    __add__, __radd__ = _binary(operator.add), _binary(operator.add, True)
+    __sub__, __rsub__ = _binary(operator.sub), _binary(operator.sub, True)
+    __mul__, __rmul__ = _binary(operator.mul), _binary(operator.mul, True)
+    __truediv__, __rtruediv__ = _binary(operator.truediv), _binary(operator.truediv, True)
+    __floordiv__, __rfloordiv__ = _binary(operator.floordiv), _binary(operator.floordiv, True)
+    __mod__, __rmod__ = _binary(operator.mod), _binary(operator.mod, True)
+    __pow__, __rpow__ = _binary(operator.pow), _binary(operator.pow, True)
+    __and__, __rand__ = _binary(operator.and_), _binary(operator.and_, True)
+    __or__, __ror__ = _binary(operator.or_), _binary(operator.or_, True)
+    __xor__, __rxor__ = _binary(operator.xor), _binary(operator.xor, True)
+    __eq__, __ne__ = _binary(operator.eq), _binary(operator.ne)
+    __lt__, __le__ = _binary(operator.lt), _binary(operator.le)
+    __gt__, __ge__ = _binary(operator.gt), _binary(operator.ge)
+    __neg__, __pos__ = _unary(operator.neg), _unary(operator.pos)
+    __abs__, __invert__ = _unary(operator.abs), _unary(operator.invert)
+    __hash__ = None
+
+    def __bool__(self):
+        raise ValueError(f'The truth value of {type(self).__name__} is ambiguous, use all() or any().')
+
+    def all(self) -> bool:
+        """
+        Overview:
+            Whether all the values are true.
+        """
+        return bool(self.values.all())
+
+    def any(self) -> bool:
+        """
+        Overview:
+            Whether any value is true.
+        """
+        return bool(self.values.any())
+
+    def sum(self):
+        """
+        Overview:
+            Sum of all the values.
+        """
+        return self.values.sum().item()
+
+    def mean(self):
+        """
+        Overview:
+            Mean of all the values.
+        """
+        return self.values.mean().item()
+
+    def min(self):
+        """
+        Overview:
+            Min value of all the values.
+        """
+        return self.values.min().item()
+
+    def max(self):
+        """
+        Overview:
+            Max value of all the values.
+        """
+        return self.values.max().item()
+
+    def __repr__(self):
+        return f'<{type(self).__name__} leaves: {len(self)}, dtype: {self.values.dtype}>'
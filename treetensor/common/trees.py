@@ -1,18 +1,193 @@
-from functools import partial
+import operator
+from functools import partial, wraps
 from typing import Type
 
 from hbutils.reflection import post_process
 from treevalue import func_treelize as original_func_treelize
-from treevalue import general_tree_value, TreeValue, typetrans
+from treevalue import general_tree_value, TreeValue, typetrans, flatten, unflatten
 from treevalue.tree.common import TreeStorage
 
+from .scalars import TreeSpec
 from ..utils import replaceable_partial, args_mapping
 
 __all__ = [
     'BaseTreeStruct',
     'clsmeta', 'auto_tree',
+    'tree_cache', 'mark_mutated',
+    'leaf_operator',
 ]
 
+_MUTATION_EPOCH = 0
+
+
+def mark_mutated():
+    """
+    Overview:
+        Mark that some tree has been modified, all the values cached by :func:`tree_cache` will be dropped.
+
+        It is called automatically when the items of a :class:`BaseTreeStruct` object are assigned \
+        or deleted. Call it manually after the metadata of the leaves are changed in-place, \
+        such as the ``squeeze_`` of tensors.
+    """
+    global _MUTATION_EPOCH
+    _MUTATION_EPOCH += 1
+
+
+def tree_cache(func):
+    """
+    Overview:
+        Cache the result of a method without arguments on the tree object. \
+        The cached value is recalculated after :func:`mark_mutated` is called.
+
+        Because the storages can be shared between trees (such as the subtrees), \
+        a modification on any tree will drop the cached values of all the trees.
+
+    Arguments:
+        - func: Method to be cached.
+
+    Returns:
+        - decorated: Decorated method.
+    """
+    _key = f'__tree_cache_{func.__name__}'
+
+    @wraps(func)
+    def _new_func(self):
+        epoch = _MUTATION_EPOCH
+        record = self.__dict__.get(_key, None)
+        if record is not None and record[0] == epoch:
+            return record[1]
+
+        value = func(self)
+        self.__dict__[_key] = (epoch, value)
+        return value
+
+    return _new_func
+
+
+def _mutating(func):
+    @wraps(func)
+    def _new_func(self, *args, **kwargs):
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            mark_mutated()
+
+    return _new_func
+
+
+_LEAVES_KEY = '__tree_leaves'
+
+
+def _tree_leaves(tree):
+    """
+    Spec and values of the leaves, which are cached on the tree object like :func:`tree_cache`.
+    """
+    cache = tree.__dict__ if isinstance(tree, BaseTreeStruct) else None  # the plain trees have no __dict__
+    if cache is not None:
+        record = cache.get(_LEAVES_KEY, None)
+        if record is not None and record[0] == _MUTATION_EPOCH:
+            return record[1], record[2]
+
+    items = flatten(tree)
+    spec = TreeSpec.of(path for path, _ in items)
+    values = [value for _, value in items]
+    if cache is not None:
+        cache[_LEAVES_KEY] = (_MUTATION_EPOCH, spec, values)
+    return spec, values
+
+
+def _from_leaves(cls, spec: TreeSpec, values: list):
+    tree = unflatten(zip(spec.paths, values), return_type=cls)
+    tree.__dict__[_LEAVES_KEY] = (_MUTATION_EPOCH, spec, values)  # so the chained operators need no flatten
+    return tree
+
+
+def _broadcast_leaves(spec: TreeSpec, values: list, ospec: TreeSpec, ovalues: list):
+    """
+    Broadcast the leaves of two trees to the deeper structure of them, \
+    raise :class:`ValueError` when no one is the prefix of the other one.
+    """
+    if ospec is spec:
+        return spec, values, ovalues
+
+    try:
+        order = spec.broadcast_of(ospec)
+    except ValueError:
+        order = ospec.broadcast_of(spec)
+        return ospec, [values[i] for i in order], ovalues
+    else:
+        return spec, values, [ovalues[i] for i in order]
+
+
+_SCALAR_TYPES = (bool, int, float, complex)
+
+
+def leaf_operator(op, reverse: bool = False):
+    """
+    Overview:
+        Decorator of the operators of the trees, with the fast path for the most common cases \
+        (such as ``t * 0.99`` and ``t + t``).
+
+        - When the other operand is a Python scalar, ``op`` is applied to the cached leaf list directly.
+        - When the other operand is a tree or a dict, the leaves of them are zipped directly. \
+            The leaves at the prefixes are broadcast to the subtrees below them \
+            (such as ``t * {'obs': 0.5, 'reward': 2.0}`` for a deep ``t``), with the cached indices \
+            of :meth:`TreeSpec.broadcast_of`, so the broadcast tree is never built.
+        - Otherwise, the decorated operator (such as the one of ``general_tree_value``) is used, \
+            which supports the other leaf values and raises the errors for the different structures.
+
+    Arguments:
+        - op: Operator on the leaves, such as :func:`operator.add`.
+        - reverse: Reversed operator (such as ``__radd__``), default is ``False``.
+
+    Examples::
+
+        >>> class MyTree(BaseTreeStruct):
+        ...     @leaf_operator(operator.gt)
+        ...     @method_treelize()
+        ...     def __gt__(self, other):
+        ...         return self > other
+    """
+
+    def _decorator(func):
+        @wraps(func)
+        def _new_func(self, other):
+            if isinstance(other, _SCALAR_TYPES):
+                spec, values = _tree_leaves(self)
+                if reverse:
+                    return _from_leaves(type(self), spec, [op(other, v) for v in values])
+                else:
+                    return _from_leaves(type(self), spec, [op(v, other) for v in values])
+            elif isinstance(other, (TreeValue, dict)):
+                if isinstance(other, dict):
+                    other = TreeValue(other)
+                try:
+                    spec, values, ovalues = _broadcast_leaves(*_tree_leaves(self), *_tree_leaves(other))
+                except ValueError:
+                    return func(self, other)
+                if reverse:
+                    return _from_leaves(type(self), spec, [op(o, v) for v, o in zip(values, ovalues)])
+                else:
+                    return _from_leaves(type(self), spec, [op(v, o) for v, o in zip(values, ovalues)])
+            else:
+                return func(self, other)
+
+        return _new_func
+
+    return _decorator
+
+
+def _unary_operator(op):
+    def _decorator(func):
+        @wraps(func)
+        def _new_func(self):
+            spec, values = _tree_leaves(self)
+            return _from_leaves(type(self), spec, [op(v) for v in values])
+
+        return _new_func
+
+    return _decorator
+
 
 class BaseTreeStruct(general_tree_value()):
     """
@@ -22,6 +197,27 @@ class BaseTreeStruct(general_tree_value()):
     pass
 
 
+for _name in [
+    '__setattr__', '__delattr__', '__setitem__', '__delitem__',
+    'clear', 'pop', 'popitem', 'setdefault', 'update',
+    '__iadd__', '__isub__', '__imul__', '__imatmul__', '__itruediv__', '__ifloordiv__', '__imod__',
+    '__ipow__', '__iand__', '__ior__', '__ixor__', '__ilshift__', '__irshift__',
+]:
+    setattr(BaseTreeStruct, _name, _mutating(getattr(BaseTreeStruct, _name)))
+
+for _name, _op in [
+    ('add', operator.add), ('sub', operator.sub), ('mul', operator.mul), ('matmul', operator.matmul),
+    ('truediv', operator.truediv), ('floordiv', operator.floordiv), ('mod', operator.mod),
+    ('pow', operator.pow), ('and', operator.and_), ('or', operator.or_), ('xor', operator.xor),
+    ('lshift', operator.lshift), ('rshift', operator.rshift),
+]:
+    setattr(BaseTreeStruct, f'__{_name}__', leaf_operator(_op)(getattr(BaseTreeStruct, f'__{_name}__')))
+    setattr(BaseTreeStruct, f'__r{_name}__', leaf_operator(_op, True)(getattr(BaseTreeStruct, f'__r{_name}__')))
+
+for _name, _op in [('neg', operator.neg), ('pos', operator.pos), ('invert', operator.invert)]:
+    setattr(BaseTreeStruct, f'__{_name}__', _unary_operator(_op)(getattr(BaseTreeStruct, f'__{_name}__')))
+
+
 def clsmeta(func, allow_dict: bool = False) -> Type[type]:
     """
     Overview:
@@ -1,6 +1,9 @@
+from collections.abc import Mapping
 from functools import wraps
 
-from treevalue import TreeValue, flatten_values
+from treevalue import TreeValue, flatten, flatten_values
+
+from ..profiler import profile_call, profile_leaves, is_profiling
 
 __all__ = [
     'ireduce',
@@ -8,18 +11,92 @@ __all__ = [
 ]
 
 
-def ireduce(rfunc, piter=None):
+def _as_tree(x):
+    if isinstance(x, TreeValue):
+        return x
+    elif isinstance(x, Mapping):
+        return TreeValue(x)
+    else:
+        return None
+
+
+def _stream_leaves(func, args, kwargs):
+    """
+    Evaluate ``func`` on the leaves lazily, the trees in the arguments should have the same structure.
+    """
+    trees = [(i, tree) for i, tree in enumerate(map(_as_tree, args)) if tree is not None]
+    ktrees = [(key, tree) for key, tree in ((k, _as_tree(v)) for k, v in kwargs.items()) if tree is not None]
+
+    first_pos, first = (trees or ktrees)[0]
+    paths = [path for path, _ in flatten(first)]
+    items = []
+    for pos, tree in [*trees, *ktrees]:
+        values = dict(flatten(tree))
+        if len(values) != len(paths) or any(p not in values for p in paths):
+            raise KeyError(f'Argument keys not match in strict mode, the structure of argument {pos!r} '
+                           f'is different from argument {first_pos!r}.')
+        items.append((pos, values))
+
+    args = list(args)
+    call = (lambda *a, **kw: profile_leaves(1, func, *a, **kw)) if is_profiling() else func
+    for path in paths:
+        for pos, values in items:
+            if isinstance(pos, int):
+                args[pos] = values[path]
+            else:
+                kwargs[pos] = values[path]
+        yield call(*args, **kwargs)
+
+
+def ireduce(rfunc, piter=None, stream: bool = False):
+    """
+    Overview:
+        Reduce the values of the result tree with ``rfunc``, \
+        the results which are not trees are returned directly.
+
+    Arguments:
+        - rfunc: Reduce function, such as :func:`builtins.all` and :func:`builtins.sum`.
+        - piter: Function to process the iterator of the values before ``rfunc``, such as :class:`list`.
+        - stream (:obj:`bool`): Streaming mode, default is ``False``. In the streaming mode, the decorated \
+            function should be the function of the leaves (instead of the treelized one), which is \
+            evaluated lazily on the leaves in traversal order, and fed to ``rfunc`` without building \
+            the result tree. So :func:`builtins.all` and :func:`builtins.any` can stop at the first \
+            decisive leaf.
+
+    Examples::
+
+        >>> import builtins
+        >>> from treetensor.common import ireduce
+        >>> @ireduce(builtins.all, stream=True)
+        ... def all_positive(x):
+        ...     return x > 0
+        >>> all_positive({'a': 1, 'b': {'x': -1, 'y': 2}})  # y is not evaluated
+        False
+    """
     piter = piter or (lambda x: x)
 
     def _decorator(func):
-        @wraps(func)
-        def _new_func(*args, **kwargs):
-            result = func(*args, **kwargs)
-            if isinstance(result, TreeValue):
-                it = flatten_values(result)
-                return rfunc(piter(it))
-            else:
-                return result
+        if stream:
+            name = f'{func.__module__}.{func.__qualname__}'
+
+            def _reduce(*args, **kwargs):
+                return rfunc(piter(_stream_leaves(func, args, dict(kwargs))))
+
+            @wraps(func)
+            def _new_func(*args, **kwargs):
+                if not any(isinstance(x, (TreeValue, Mapping)) for x in (*args, *kwargs.values())):
+                    return func(*args, **kwargs)
+                return profile_call(name, _reduce, *args, **kwargs)
+
+        else:
+            @wraps(func)
+            def _new_func(*args, **kwargs):
+                result = func(*args, **kwargs)
+                if isinstance(result, TreeValue):
+                    it = flatten_values(result)
+                    return rfunc(piter(it))
+                else:
+                    return result
 
         return _new_func
 
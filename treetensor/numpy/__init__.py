@@ -1,4 +1,5 @@
 import builtins
+from functools import lru_cache
 from types import ModuleType, FunctionType, BuiltinFunctionType
 from typing import Iterable
 
@@ -24,6 +25,11 @@ _basic_types = (
 _np_all = set(np.__all__)
 
 
+def _is_function(item) -> bool:
+    # the ufuncs and the array functions (since numpy 1.25) are not python functions
+    return isinstance(item, (FunctionType, BuiltinFunctionType, np.ufunc)) or hasattr(item, '_implementation')
+
+
 class _Module(ModuleType):
     def __init__(self, module):
         ModuleType.__init__(self, module.__name__)
@@ -34,13 +40,14 @@ class _Module(ModuleType):
         self.__numpy_version__ = np.__version__
         self.__version__ = __VERSION__
 
+    @lru_cache()
     def __getattr__(self, name):
         if (name in self.__all__) or \
                 (hasattr(self.__origin__, name) and isinstance(getattr(self.__origin__, name), ModuleType)):
             return getattr(self.__origin__, name)
         else:
             item = getattr(np, name)
-            if isinstance(item, (FunctionType, BuiltinFunctionType)) and not name.startswith('_'):
+            if _is_function(item) and not name.startswith('_'):
                 return get_func_from_numpy(name)
             elif isinstance(item, _basic_types) and name in _np_all:
                 return item
@@ -1,11 +1,17 @@
+import operator
 from functools import lru_cache
 
 import numpy
 import torch
-from treevalue import method_treelize
+from treevalue import TreeValue
+from treevalue import method_treelize as original_method_treelize
 
 from .base import TreeNumpy
-from ..common import Object, ireduce, clsmeta, get_tree_proxy
+from .dispatch import array_ufunc, array_function
+from .reduction import auto_reduce, reduce_options, reduce_sum, reduce_mean, reduce_var, reduce_std, \
+    reduce_max, reduce_min, reduce_argmax, reduce_argmin
+from ..common import Object, ireduce, clsmeta, get_tree_proxy, leaf_operator
+from ..profiler import profile_treelize, profile_call
 from ..utils import current_names
 
 __all__ = [
@@ -13,6 +19,16 @@ __all__ = [
 ]
 
 _ArrayProxy, _InstanceArrayProxy = get_tree_proxy(numpy.ndarray)
+method_treelize = profile_treelize(original_method_treelize)
+
+
+def _is_foreign(x, name: str) -> bool:
+    """
+    Whether ``x`` is an object of other types implementing the numpy protocol ``name``.
+    """
+    if isinstance(x, (TreeValue, numpy.ndarray)):
+        return False
+    return getattr(type(x), name, None) is not None
 
 
 @lru_cache()
@@ -70,34 +86,162 @@ class ndarray(TreeNumpy, metaclass=_ArrayMeta):
     def np(self):
         return _InstanceArrayProxy(self.__class__.np, self)
 
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """
+        Overview:
+            Numpy ufunc protocol, so the ufuncs (such as ``np.add(t1, t2)`` and ``np.exp(t)``) \
+            and their methods (such as ``np.add.reduce(t, axis=0)``) are applied to each leaf. \
+            The trees in ``out`` are filled in place.
+
+        Examples::
+
+            >>> import numpy as np
+            >>> import treetensor.numpy as tnp
+            >>> t = tnp.ndarray({'a': np.array([1., 2.]), 'b': {'x': np.array([3., 4.])}})
+            >>> np.exp(t, out=t)
+            <ndarray 0x7f0c2ee3c2b0>
+            ├── 'a' --> array([2.71828183, 7.3890561 ])
+            └── 'b' --> <ndarray 0x7f0c2ee3c1f0>
+                └── 'x' --> array([20.08553692, 54.59815003])
+        """
+        for x in (*inputs, *kwargs.get('out', ())):
+            if _is_foreign(x, '__array_ufunc__'):
+                return NotImplemented
+        return profile_call(f'numpy.{ufunc.__name__}', array_ufunc, type(self), ufunc, method, inputs, kwargs)
+
+    def __array_function__(self, func, types, args, kwargs):
+        """
+        Overview:
+            Numpy array function protocol, so the numpy functions (such as ``np.clip(t, 0, 1)``) \
+            are applied to each leaf, while the functions implemented in :mod:`treetensor.numpy` \
+            (such as ``np.stack`` and ``np.sum``) are the same as them.
+        """
+        if not all(issubclass(t, (numpy.ndarray, TreeValue)) for t in types):
+            return NotImplemented
+        return profile_call(f'numpy.{func.__name__}', array_function, type(self), func, args, kwargs)
+
     @method_treelize(return_type=Object)
     def tolist(self: numpy.ndarray):
         return self.tolist()
 
     @property
-    @ireduce(sum)
-    @method_treelize(return_type=Object)
+    @ireduce(sum, stream=True)
     def size(self: numpy.ndarray) -> int:
         return self.size
 
     @property
-    @ireduce(sum)
-    @method_treelize(return_type=Object)
+    @ireduce(sum, stream=True)
     def nbytes(self: numpy.ndarray) -> int:
         return self.nbytes
 
-    @ireduce(sum)
-    @method_treelize(return_type=Object)
-    def sum(self: numpy.ndarray, *args, **kwargs):
+    @method_treelize()
+    def __sum_nr(self: numpy.ndarray, *args, **kwargs):
         return self.sum(*args, **kwargs)
 
-    @ireduce(all)
-    @method_treelize(return_type=Object)
+    # noinspection PyUnusedLocal
+    @auto_reduce(reduce_sum, __sum_nr, reduce_options('dtype'))
+    def sum(self, *args, reduce=None, **kwargs):
+        """
+        See :func:`treetensor.numpy.sum`.
+        """
+        pass  # pragma: no cover
+
+    @method_treelize()
+    def __mean_nr(self: numpy.ndarray, *args, **kwargs):
+        return self.mean(*args, **kwargs)
+
+    # noinspection PyUnusedLocal
+    @auto_reduce(reduce_mean, __mean_nr, reduce_options('dtype'), default=False)
+    def mean(self, *args, reduce=None, **kwargs):
+        """
+        See :func:`treetensor.numpy.mean`, but each leaf is reduced by default (``reduce=False``), \
+        use ``reduce=True`` to reduce all the leaves to one value.
+        """
+        pass  # pragma: no cover
+
+    @method_treelize()
+    def __var_nr(self: numpy.ndarray, *args, **kwargs):
+        return self.var(*args, **kwargs)
+
+    # noinspection PyUnusedLocal
+    @auto_reduce(reduce_var, __var_nr, reduce_options('dtype', 'ddof'), default=False)
+    def var(self, *args, reduce=None, **kwargs):
+        """
+        See :func:`treetensor.numpy.var`, but each leaf is reduced by default (``reduce=False``), \
+        use ``reduce=True`` to reduce all the leaves to one value.
+        """
+        pass  # pragma: no cover
+
+    @method_treelize()
+    def __std_nr(self: numpy.ndarray, *args, **kwargs):
+        return self.std(*args, **kwargs)
+
+    # noinspection PyUnusedLocal
+    @auto_reduce(reduce_std, __std_nr, reduce_options('dtype', 'ddof'), default=False)
+    def std(self, *args, reduce=None, **kwargs):
+        """
+        See :func:`treetensor.numpy.std`, but each leaf is reduced by default (``reduce=False``), \
+        use ``reduce=True`` to reduce all the leaves to one value.
+        """
+        pass  # pragma: no cover
+
+    @method_treelize()
+    def __max_nr(self: numpy.ndarray, *args, **kwargs):
+        return self.max(*args, **kwargs)
+
+    # noinspection PyUnusedLocal
+    @auto_reduce(reduce_max, __max_nr, reduce_options(), default=False)
+    def max(self, *args, reduce=None, **kwargs):
+        """
+        See :func:`treetensor.numpy.max`, but each leaf is reduced by default (``reduce=False``), \
+        use ``reduce=True`` to reduce all the leaves to one value.
+        """
+        pass  # pragma: no cover
+
+    @method_treelize()
+    def __min_nr(self: numpy.ndarray, *args, **kwargs):
+        return self.min(*args, **kwargs)
+
+    # noinspection PyUnusedLocal
+    @auto_reduce(reduce_min, __min_nr, reduce_options(), default=False)
+    def min(self, *args, reduce=None, **kwargs):
+        """
+        See :func:`treetensor.numpy.min`, but each leaf is reduced by default (``reduce=False``), \
+        use ``reduce=True`` to reduce all the leaves to one value.
+        """
+        pass  # pragma: no cover
+
+    @method_treelize()
+    def __argmax_nr(self: numpy.ndarray, *args, **kwargs):
+        return self.argmax(*args, **kwargs)
+
+    # noinspection PyUnusedLocal
+    @auto_reduce(reduce_argmax, __argmax_nr, reduce_options(), default=False)
+    def argmax(self, *args, reduce=None, **kwargs):
+        """
+        See :func:`treetensor.numpy.argmax`, but each leaf is reduced by default (``reduce=False``), \
+        use ``reduce=True`` to reduce all the leaves to one value.
+        """
+        pass  # pragma: no cover
+
+    @method_treelize()
+    def __argmin_nr(self: numpy.ndarray, *args, **kwargs):
+        return self.argmin(*args, **kwargs)
+
+    # noinspection PyUnusedLocal
+    @auto_reduce(reduce_argmin, __argmin_nr, reduce_options(), default=False)
+    def argmin(self, *args, reduce=None, **kwargs):
+        """
+        See :func:`treetensor.numpy.argmin`, but each leaf is reduced by default (``reduce=False``), \
+        use ``reduce=True`` to reduce all the leaves to one value.
+        """
+        pass  # pragma: no cover
+
+    @ireduce(all, stream=True)
     def all(self: numpy.ndarray, *args, **kwargs):
         return self.all(*args, **kwargs)
 
-    @ireduce(any)
-    @method_treelize(return_type=Object)
+    @ireduce(any, stream=True)
     def any(self: numpy.ndarray, *args, **kwargs):
         return self.any(*args, **kwargs)
 
@@ -108,6 +252,7 @@ class ndarray(TreeNumpy, metaclass=_ArrayMeta):
             tensor_ = tensor_.to(*args, **kwargs)
         return tensor_
 
+    @leaf_operator(operator.eq)
     @method_treelize()
     def __eq__(self, other):
         """
@@ -115,6 +260,7 @@ class ndarray(TreeNumpy, metaclass=_ArrayMeta):
         """
         return self == other
 
+    @leaf_operator(operator.ne)
     @method_treelize()
     def __ne__(self, other):
         """
@@ -122,6 +268,7 @@ class ndarray(TreeNumpy, metaclass=_ArrayMeta):
         """
         return self != other
 
+    @leaf_operator(operator.lt)
     @method_treelize()
     def __lt__(self, other):
         """
@@ -129,6 +276,7 @@ class ndarray(TreeNumpy, metaclass=_ArrayMeta):
         """
         return self < other
 
+    @leaf_operator(operator.gt)
     @method_treelize()
     def __gt__(self, other):
         """
@@ -136,6 +284,7 @@ class ndarray(TreeNumpy, metaclass=_ArrayMeta):
         """
         return self > other
 
+    @leaf_operator(operator.le)
     @method_treelize()
     def __le__(self, other):
         """
@@ -143,6 +292,7 @@ class ndarray(TreeNumpy, metaclass=_ArrayMeta):
         """
         return self <= other
 
+    @leaf_operator(operator.ge)
     @method_treelize()
     def __ge__(self, other):
         """
@@ -0,0 +1,80 @@
+import numpy as np
+from treevalue import TreeValue, unflatten
+
+from ..common import Object, leafwise_call
+from ..profiler import profile_result
+
+__all__ = [
+    'array_ufunc', 'array_function',
+]
+
+_unflatten = profile_result(unflatten)
+
+
+def array_ufunc(cls, ufunc, method: str, inputs, kwargs):
+    """
+    Overview:
+        Apply the ``method`` of ``ufunc`` (such as ``__call__`` and ``reduce``) to each leaf, \
+        which is the implementation of :meth:`treetensor.numpy.ndarray.__array_ufunc__`.
+        The trees in ``out`` are filled, and returned as the results.
+    """
+    outs = kwargs.get('out', None)
+    func = ufunc if method == '__call__' else getattr(ufunc, method)
+    spec, results = leafwise_call(func, inputs, kwargs)
+    if method == 'at':  # in-place operation without result
+        return None
+
+    nout = ufunc.nout if method == '__call__' else 1
+    if nout == 1:
+        columns = [results]
+    else:
+        columns = list(zip(*results))
+
+    trees = []
+    for k, column in enumerate(columns):
+        if outs is not None and isinstance(outs[k], TreeValue):
+            trees.append(outs[k])
+        else:
+            trees.append(_unflatten(zip(spec.paths, column), return_type=cls))
+    return trees[0] if nout == 1 else tuple(trees)
+
+
+_OVERRIDES = None
+
+
+def _overrides():
+    """
+    The functions of :mod:`treetensor.numpy` which are used for the numpy functions with the same names, \
+    such as :func:`treetensor.numpy.sum` for :func:`numpy.sum`.
+    """
+    global _OVERRIDES
+    if _OVERRIDES is None:
+        from . import funcs
+        _OVERRIDES = {
+            getattr(np, name): getattr(funcs, name)
+            for name in funcs.__all__ if hasattr(getattr(np, name, None), '_implementation')
+        }
+        _OVERRIDES[np.amax] = funcs.max
+        _OVERRIDES[np.amin] = funcs.min
+    return _OVERRIDES
+
+
+def _is_array(x) -> bool:
+    return isinstance(x, (np.ndarray, np.generic))
+
+
+def array_function(cls, func, args, kwargs):
+    """
+    Overview:
+        Apply the numpy function ``func`` to the trees, which is the implementation of \
+        :meth:`treetensor.numpy.ndarray.__array_function__`. The functions implemented in \
+        :mod:`treetensor.numpy` (such as :func:`treetensor.numpy.stack` and :func:`treetensor.numpy.sum`) \
+        are used directly, and the others are applied to each leaf.
+    """
+    override = _overrides().get(func, None)
+    if override is not None:
+        return override(*args, **kwargs)
+
+    spec, results = leafwise_call(func, args, kwargs)
+    return_type = cls if all(_is_array(result) for result in results) else Object
+    return _unflatten(zip(spec.paths, results), return_type=return_type)
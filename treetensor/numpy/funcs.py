@@ -1,44 +1,263 @@
 import builtins
+from collections.abc import Mapping, Sequence
 
 import numpy as np
 from hbutils.reflection import post_process
-from treevalue import TreeValue
+from treevalue import TreeValue, flatten, unflatten
 from treevalue import func_treelize as original_func_treelize
 from treevalue.tree.common import TreeStorage
 
 from .array import ndarray
-from ..common import ireduce, Object, module_func_loader
+from .reduction import auto_reduce, reduce_options, reduce_sum, reduce_mean, reduce_var, reduce_std, \
+    reduce_max, reduce_min, reduce_argmax, reduce_argmin, reduce_percentile
+from ..common import ireduce, module_func_loader, broadcast_treelize
+from ..profiler import profile_treelize, profile_entry, profile_leaves, profile_result
 from ..utils import replaceable_partial, doc_from, args_mapping
 
 __all__ = [
     'all', 'any', 'array',
+    'sum', 'mean', 'var', 'std', 'max', 'min', 'argmax', 'argmin', 'percentile',
     'equal', 'array_equal',
     'stack', 'concatenate', 'split',
+    'collate', 'unstack',
     'zeros', 'ones',
 ]
 
 func_treelize = post_process(post_process(args_mapping(
     lambda i, x: TreeValue(x) if isinstance(x, (dict, TreeStorage, TreeValue)) else x)))(
-    replaceable_partial(original_func_treelize, return_type=ndarray)
+    profile_treelize(broadcast_treelize(replaceable_partial(original_func_treelize, return_type=ndarray), ndarray))
 )
 get_func_from_numpy = module_func_loader(np, ndarray,
                                          [(np.ndarray, ndarray)])
 
 
 @doc_from(np.all)
-@ireduce(builtins.all)
-@func_treelize(return_type=Object)
+@ireduce(builtins.all, stream=True)
 def all(a, *args, **kwargs):
     return np.all(a, *args, **kwargs)
 
 
 @doc_from(np.any)
-@ireduce(builtins.any)
-@func_treelize()
+@ireduce(builtins.any, stream=True)
 def any(a, *args, **kwargs):
     return np.any(a, *args, **kwargs)
 
 
+@func_treelize()
+def _sum_nr(a, *args, **kwargs):
+    return np.sum(a, *args, **kwargs)
+
+
+# noinspection PyUnusedLocal
+@doc_from(np.sum)
+@auto_reduce(reduce_sum, _sum_nr, reduce_options('dtype'))
+def sum(a, *args, reduce=None, **kwargs):
+    """
+    In ``treetensor``, the leaves are reduced together by default (``reduce=True``), \
+    and each leaf is reduced when ``reduce=False`` or ``axis`` is given. \
+    The sum of all the leaves is the sum of the partial sums, and ``dtype`` is the type of the accumulation.
+
+    Examples::
+
+        >>> import numpy as np
+        >>> import treetensor.numpy as tnp
+        >>> t = tnp.ndarray({'a': np.array([1, 2]), 'b': {'x': np.array([[3, 4]])}})
+        >>> tnp.sum(t)
+        10
+        >>> tnp.sum(t, reduce=False)
+        <ndarray 0x7f0c2ee3c2b0>
+        ├── 'a' --> array(3)
+        └── 'b' --> <ndarray 0x7f0c2ee3c1f0>
+            └── 'x' --> array(7)
+        >>> tnp.sum(t, axis=-1)
+        <ndarray 0x7f0c2ee3c2b0>
+        ├── 'a' --> array(3)
+        └── 'b' --> <ndarray 0x7f0c2ee3c1f0>
+            └── 'x' --> array([7])
+    """
+    pass  # pragma: no cover
+
+
+@func_treelize()
+def _mean_nr(a, *args, **kwargs):
+    return np.mean(a, *args, **kwargs)
+
+
+# noinspection PyUnusedLocal
+@doc_from(np.mean)
+@auto_reduce(reduce_mean, _mean_nr, reduce_options('dtype'))
+def mean(a, *args, reduce=None, **kwargs):
+    """
+    In ``treetensor``, the mean of all the leaves is the sum of the partial sums divided by the total size, \
+    there is no concatenation of the leaves.
+
+    Examples::
+
+        >>> import numpy as np
+        >>> import treetensor.numpy as tnp
+        >>> t = tnp.ndarray({'a': np.array([1, 2]), 'b': {'x': np.array([[3, 4]])}})
+        >>> tnp.mean(t)
+        2.5
+        >>> tnp.mean(t, dtype=np.float32)
+        2.5
+    """
+    pass  # pragma: no cover
+
+
+@func_treelize()
+def _var_nr(a, *args, **kwargs):
+    return np.var(a, *args, **kwargs)
+
+
+# noinspection PyUnusedLocal
+@doc_from(np.var)
+@auto_reduce(reduce_var, _var_nr, reduce_options('dtype', 'ddof'))
+def var(a, *args, reduce=None, **kwargs):
+    """
+    In ``treetensor``, the variance of all the leaves is merged from the size, mean and variance of each leaf, \
+    which is as stable as the two-pass algorithm of :func:`numpy.var`.
+
+    Examples::
+
+        >>> import numpy as np
+        >>> import treetensor.numpy as tnp
+        >>> t = tnp.ndarray({'a': np.array([1, 2]), 'b': {'x': np.array([[3, 4]])}})
+        >>> tnp.var(t)
+        1.25
+        >>> tnp.var(t, ddof=1)
+        1.6666666666666667
+    """
+    pass  # pragma: no cover
+
+
+@func_treelize()
+def _std_nr(a, *args, **kwargs):
+    return np.std(a, *args, **kwargs)
+
+
+# noinspection PyUnusedLocal
+@doc_from(np.std)
+@auto_reduce(reduce_std, _std_nr, reduce_options('dtype', 'ddof'))
+def std(a, *args, reduce=None, **kwargs):
+    """
+    In ``treetensor``, the standard deviation of all the leaves is the square root of :func:`var`.
+    """
+    pass  # pragma: no cover
+
+
+@func_treelize()
+def _max_nr(a, *args, **kwargs):
+    return np.max(a, *args, **kwargs)
+
+
+# noinspection PyUnusedLocal
+@doc_from(np.max)
+@auto_reduce(reduce_max, _max_nr)
+def max(a, *args, reduce=None, **kwargs):
+    """
+    In ``treetensor``, the max value of all the leaves is the max value of the partial max values.
+
+    Examples::
+
+        >>> import numpy as np
+        >>> import treetensor.numpy as tnp
+        >>> t = tnp.ndarray({'a': np.array([1, 2]), 'b': {'x': np.array([[3, 4]])}})
+        >>> tnp.max(t)
+        4
+    """
+    pass  # pragma: no cover
+
+
+@func_treelize()
+def _min_nr(a, *args, **kwargs):
+    return np.min(a, *args, **kwargs)
+
+
+# noinspection PyUnusedLocal
+@doc_from(np.min)
+@auto_reduce(reduce_min, _min_nr)
+def min(a, *args, reduce=None, **kwargs):
+    """
+    In ``treetensor``, the min value of all the leaves is the min value of the partial min values.
+    """
+    pass  # pragma: no cover
+
+
+@func_treelize()
+def _argmax_nr(a, *args, **kwargs):
+    return np.argmax(a, *args, **kwargs)
+
+
+# noinspection PyUnusedLocal
+@doc_from(np.argmax)
+@auto_reduce(reduce_argmax, _argmax_nr)
+def argmax(a, *args, reduce=None, **kwargs):
+    """
+    In ``treetensor``, the index of the max value of all the leaves is the index in the flattened \
+    leaves one after another in the order of their paths (such as ``a``, ``b.x``, ``b.y``), \
+    which is the same as ``np.argmax`` of the concatenated leaves, but there is no concatenation.
+
+    Examples::
+
+        >>> import numpy as np
+        >>> import treetensor.numpy as tnp
+        >>> t = tnp.ndarray({'a': np.array([1, 2]), 'b': {'x': np.array([[3, 4]])}})
+        >>> tnp.argmax(t)
+        3
+    """
+    pass  # pragma: no cover
+
+
+@func_treelize()
+def _argmin_nr(a, *args, **kwargs):
+    return np.argmin(a, *args, **kwargs)
+
+
+# noinspection PyUnusedLocal
+@doc_from(np.argmin)
+@auto_reduce(reduce_argmin, _argmin_nr)
+def argmin(a, *args, reduce=None, **kwargs):
+    """
+    In ``treetensor``, the index of the min value of all the leaves is the index in the flattened \
+    leaves one after another, which is the same as :func:`argmax`.
+    """
+    pass  # pragma: no cover
+
+
+@func_treelize()
+def _percentile_nr(a, q, *args, **kwargs):
+    return np.percentile(a, q, *args, **kwargs)
+
+
+# noinspection PyUnusedLocal
+def _percentile_determine(q, *args, **kwargs):
+    return reduce_options('method', 'interpolation')(*args, **kwargs)
+
+
+# noinspection PyUnusedLocal
+@doc_from(np.percentile)
+@auto_reduce(reduce_percentile, _percentile_nr, _percentile_determine)
+def percentile(a, q, *args, reduce=None, **kwargs):
+    """
+    In ``treetensor``, the percentiles of all the leaves need all the values, so the leaves are copied \
+    into one buffer, which is partitioned in place, so there is no more copy than :func:`numpy.percentile`.
+
+    Examples::
+
+        >>> import numpy as np
+        >>> import treetensor.numpy as tnp
+        >>> t = tnp.ndarray({'a': np.array([1, 2]), 'b': {'x': np.array([[3, 4]])}})
+        >>> tnp.percentile(t, 50)
+        2.5
+        >>> tnp.percentile(t, [25, 75], reduce=False)
+        <ndarray 0x7f0c2ee3c2b0>
+        ├── 'a' --> array([1.25, 1.75])
+        └── 'b' --> <ndarray 0x7f0c2ee3c1f0>
+            └── 'x' --> array([3.25, 3.75])
+    """
+    pass  # pragma: no cover
+
+
 @doc_from(np.equal)
 @func_treelize()
 def equal(x1, x2, *args, **kwargs):
@@ -75,22 +294,242 @@ def array(p_object, *args, **kwargs):
     return np.array(p_object, *args, **kwargs)
 
 
+_unflatten = profile_result(unflatten)
+
+
+def _is_tree(x) -> bool:
+    return isinstance(x, (TreeValue, Mapping))
+
+
+def _flatten_tree(tree):
+    return flatten(TreeValue(tree) if isinstance(tree, Mapping) else tree)
+
+
+def _tree_columns(trees):
+    """
+    Flatten the trees and group the leaves with the same key, the structures are validated only once.
+    """
+    items = [_flatten_tree(tree) for tree in trees]
+    paths = [path for path, _ in items[0]]
+    columns = [[value] for _, value in items[0]]
+    for i, sample in enumerate(items[1:], start=1):
+        if len(sample) != len(paths) or builtins.any(path != p for (path, _), p in zip(sample, paths)):
+            mapping = dict(sample)
+            if len(mapping) != len(paths) or builtins.any(p not in mapping for p in paths):
+                raise ValueError(f'The structure of tree #{i} is different from tree #0.')
+            sample = [(p, mapping[p]) for p in paths]
+        for column, (_, value) in zip(columns, sample):
+            column.append(value)
+    return paths, columns
+
+
+def _normalize_axis(axis: int, ndim: int) -> int:
+    if not -ndim <= axis < ndim:
+        raise np.AxisError(axis, ndim)
+    return axis % ndim
+
+
+def _result_type(values):
+    return np.result_type(*(value.dtype for value in values))  # no value-based casting of the 0-dim arrays
+
+
+def _stack_leaves(values, axis: int = 0, out=None, **kwargs):
+    values = [np.asarray(value) for value in values]
+    if out is None:
+        shape = list(values[0].shape)
+        shape.insert(_normalize_axis(axis, len(shape) + 1), len(values))
+        out = np.empty(shape, dtype=kwargs.pop('dtype', None) or _result_type(values))
+    return np.stack(values, axis=axis, out=out, **kwargs)
+
+
+def _concatenate_leaves(values, axis: int = 0, out=None, **kwargs):
+    values = [np.asarray(value) for value in values]
+    if out is None:
+        if axis is None:
+            shape = [builtins.sum(value.size for value in values)]
+        else:
+            shape = list(values[0].shape)
+            axis = _normalize_axis(axis, len(shape))
+            shape[axis] = builtins.sum(value.shape[axis] for value in values)
+        out = np.empty(shape, dtype=kwargs.pop('dtype', None) or _result_type(values))
+    return np.concatenate(values, axis=axis, out=out, **kwargs)
+
+
+def _collate_trees(leaf_func, trees, out, **kwargs):
+    if not trees:
+        raise ValueError('At least 1 tree is required.')
+    paths, columns = _tree_columns(trees)
+    outs = dict(_flatten_tree(out)) if out is not None else {}
+    return _unflatten([
+        (path, profile_leaves(1, leaf_func, column, out=outs.get(path, None), **kwargs))
+        for path, column in zip(paths, columns)
+    ], return_type=ndarray)
+
+
 @doc_from(np.stack)
-@func_treelize(subside=True)
-def stack(arrays, *args, **kwargs):
-    return np.stack(arrays, *args, **kwargs)
+@profile_entry(f'{__name__}.stack')
+def stack(arrays, axis=0, out=None, **kwargs):
+    """
+    In ``treetensor``, the trees in ``arrays`` are flattened once, and the leaves are written \
+    into the preallocated arrays (or the leaves of the tree ``out``) with ``np.stack(..., out=...)``.
+
+    Examples::
+
+        >>> import numpy as np
+        >>> import treetensor.numpy as tnp
+        >>> tnp.stack([
+        ...     {'obs': np.zeros(3), 'reward': 1.0},
+        ...     {'obs': np.ones(3), 'reward': 0.5},
+        ... ])
+        <ndarray 0x7f0c2ee3c2b0>
+        ├── 'obs' --> array([[0., 0., 0.],
+        │                    [1., 1., 1.]])
+        └── 'reward' --> array([1. , 0.5])
+    """
+    arrays = list(arrays)
+    if arrays and _is_tree(arrays[0]):
+        return _collate_trees(_stack_leaves, arrays, out, axis=axis, **kwargs)
+    else:
+        return np.stack(arrays, axis, out, **kwargs)
 
 
 @doc_from(np.concatenate)
-@func_treelize(subside=True)
-def concatenate(arrays, *args, **kwargs):
-    return np.concatenate(arrays, *args, **kwargs)
+@profile_entry(f'{__name__}.concatenate')
+def concatenate(arrays, axis=0, out=None, **kwargs):
+    """
+    In ``treetensor``, the trees in ``arrays`` are flattened once, and the leaves are written \
+    into the preallocated arrays (or the leaves of the tree ``out``) with ``np.concatenate(..., out=...)``.
+    """
+    arrays = list(arrays)
+    if arrays and _is_tree(arrays[0]):
+        return _collate_trees(_concatenate_leaves, arrays, out, axis=axis, **kwargs)
+    else:
+        return np.concatenate(arrays, axis, out, **kwargs)
 
 
 @doc_from(np.split)
-@func_treelize(rise=True)
-def split(ary, *args, **kwargs):
-    return np.split(ary, *args, **kwargs)
+@profile_entry(f'{__name__}.split')
+def split(ary, indices_or_sections, axis=0):
+    """
+    In ``treetensor``, the result is a list of trees, whose leaves are the views of the leaves of ``ary``.
+    """
+    if not _is_tree(ary):
+        return np.split(ary, indices_or_sections, axis)
+
+    paths, pieces = [], []
+    for path, value in _flatten_tree(ary):
+        paths.append(path)
+        pieces.append(profile_leaves(1, np.split, value, indices_or_sections, axis))
+    return [_unflatten(zip(paths, piece), return_type=ndarray) for piece in zip(*pieces)]
+
+
+def collate(batch, out=None):
+    """
+    Overview:
+        Collate the samples of trees (or tuples of trees) into a batch of :class:`treetensor.numpy.ndarray`, \
+        which is the numpy version of :func:`treetensor.torch.utils.data.tree_collate`. \
+        The arrays, bools and numbers are stacked along a new first dimension, \
+        and ``torch`` is not used, so it is suitable for the environment workers.
+
+    Arguments:
+        - batch: List of the samples, which can be dicts, :class:`treetensor.numpy.ndarray` or tuples of them.
+        - out: Preallocated tree to store the result, such as the result of the previous call.
+
+    Returns:
+        - collated: Collated :class:`treetensor.numpy.ndarray`.
+
+    Examples::
+
+        >>> import numpy as np
+        >>> import treetensor.numpy as tnp
+        >>> batch = tnp.collate([
+        ...     {'obs': np.zeros((2, 2)), 'done': False},
+        ...     {'obs': np.ones((2, 2)), 'done': True},
+        ... ])
+        >>> batch.obs.shape
+        (2, 2, 2)
+        >>> batch.done
+        array([False,  True])
+        >>> _ = tnp.collate(next_samples, out=batch)  # reuse the arrays of batch
+    """
+    batch = list(batch)
+    if not batch:
+        raise ValueError('Empty batch is not supported.')
+
+    first = batch[0]
+    if isinstance(first, tuple):
+        outs = out if out is not None else [None] * len(first)
+        items = [collate(column, o) for column, o in zip(zip(*batch), outs)]
+        if hasattr(first, '_fields'):  # namedtuple
+            return type(first)(*items)
+        else:
+            return type(first)(items)
+    else:
+        return stack(batch, out=out)
+
+
+class _Unstacked(Sequence):
+    def __init__(self, tree, axis: int):
+        self._is_tree = _is_tree(tree)
+        self._paths, self._leaves, self._prefixes = [], [], []
+        lengths = set()
+        for path, value in (_flatten_tree(tree) if self._is_tree else [((), tree)]):
+            value = np.asarray(value)
+            _axis = _normalize_axis(axis, value.ndim)
+            self._paths.append(path)
+            self._leaves.append(value)
+            self._prefixes.append((slice(None),) * _axis)
+            lengths.add(value.shape[_axis])
+        if len(lengths) > 1:
+            raise ValueError(f'The leaves should have the same length on axis {axis!r}, '
+                             f'but {sorted(lengths)!r} found.')
+        self._length = lengths.pop() if lengths else 0
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(f'Index {index!r} out of range for {self._length} samples.')
+        pairs = [
+            (path, leaf[(*prefix, index, Ellipsis)])  # the ellipsis keeps the 0-dim leaves as views
+            for path, leaf, prefix in zip(self._paths, self._leaves, self._prefixes)
+        ]
+        return unflatten(pairs, return_type=ndarray) if self._is_tree else pairs[0][1]
+
+
+def unstack(x, axis: int = 0) -> Sequence:
+    """
+    Overview:
+        Split the tree into the samples along ``axis``, which is the inverse of :func:`collate`. \
+        The samples are created lazily when they are accessed, and the leaves of them are views of \
+        the leaves of ``x``.
+
+    Arguments:
+        - x: Tree of arrays, which can be a dict or a single array. The leaves should have the same length on ``axis``.
+        - axis (:obj:`int`): Axis to be split, default is ``0``.
+
+    Returns:
+        - samples: Sequence of the samples, which supports ``len``, indexing and iteration.
+
+    Examples::
+
+        >>> import numpy as np
+        >>> import treetensor.numpy as tnp
+        >>> batch = tnp.ndarray({'obs': np.arange(6).reshape(3, 2), 'done': np.array([False, False, True])})
+        >>> samples = tnp.unstack(batch)
+        >>> len(samples)
+        3
+        >>> samples[-1]
+        <ndarray 0x7f0c2ee3c2b0>
+        ├── 'done' --> array(True)
+        └── 'obs' --> array([4, 5])
+    """
+    return _Unstacked(x, axis)
 
 
 @doc_from(np.zeros)
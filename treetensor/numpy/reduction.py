@@ -0,0 +1,249 @@
+import builtins
+import warnings
+from collections.abc import Mapping
+from functools import wraps
+from typing import Optional
+
+import numpy as np
+from treevalue import TreeValue, flatten
+
+from ..profiler import profile_entry, profile_leaves
+
+__all__ = [
+    'auto_reduce', 'reduce_options',
+    'reduce_sum', 'reduce_mean', 'reduce_var', 'reduce_std',
+    'reduce_max', 'reduce_min', 'reduce_argmax', 'reduce_argmin',
+    'reduce_percentile',
+]
+
+
+def _leaves(a, ordered: bool = False):
+    if isinstance(a, Mapping):
+        a = TreeValue(a)
+    if isinstance(a, TreeValue):
+        items = flatten(a)
+        if ordered:  # the order of flatten is not guaranteed, so the paths are sorted
+            items = sorted(items, key=lambda x: x[0])
+        return [np.asarray(value) for _, value in items]
+    else:
+        return [np.asarray(a)]
+
+
+def _result_type(leaves):
+    return np.result_type(*(leaf.dtype for leaf in leaves)) if leaves else np.dtype(np.float64)
+
+
+def _mean_types(leaves, dtype):
+    """
+    Types of the accumulation and the result of the means, which are the same as :func:`numpy.mean`.
+    """
+    if dtype is not None:
+        return np.dtype(dtype), np.dtype(dtype)
+
+    rtype = _result_type(leaves)
+    if rtype.kind in 'biu':
+        return np.dtype(np.float64), np.dtype(np.float64)
+    elif rtype == np.float16:
+        return np.dtype(np.float32), rtype
+    else:
+        return rtype, rtype
+
+
+def _real_type(dtype: np.dtype) -> np.dtype:
+    return np.empty(0, dtype=dtype).real.dtype
+
+
+def reduce_sum(a, dtype=None):
+    """
+    Sum of all the leaves, which is the sum of the partial sums of the leaves.
+    """
+    partials = [profile_leaves(1, np.sum, leaf, dtype=dtype) for leaf in _leaves(a)]
+    return np.sum(partials, dtype=dtype)
+
+
+def reduce_mean(a, dtype=None):
+    """
+    Mean of all the leaves, which is the sum of the partial sums divided by the total size.
+    """
+    leaves = _leaves(a)
+    atype, rtype = _mean_types(leaves, dtype)
+    count = builtins.sum(leaf.size for leaf in leaves)
+    if not count:
+        warnings.warn('Mean of empty slice.', RuntimeWarning)
+        return rtype.type(np.nan)
+
+    total = np.sum([profile_leaves(1, np.sum, leaf, dtype=atype) for leaf in leaves], dtype=atype)
+    return rtype.type(total / count)
+
+
+def _moments(leaves, atype):
+    """
+    Size, mean and the sum of the squared deviations of all the leaves, which are merged from \
+    the partial moments of the leaves with the parallel algorithm of Chan et al., so it is \
+    as stable as the two-pass algorithm of :func:`numpy.var`.
+    """
+    n, mean, m2 = 0, atype.type(0), _real_type(atype).type(0)
+    for leaf in leaves:
+        if not leaf.size:
+            continue
+        n_ = leaf.size
+        mean_ = profile_leaves(1, np.mean, leaf, dtype=atype)
+        # numpy.var keeps the complex dtype, but the squared deviations are always real
+        m2_ = np.real(profile_leaves(1, np.var, leaf, dtype=atype)) * n_
+        if not n:
+            n, mean, m2 = n_, mean_, m2_
+        else:
+            total = n + n_
+            delta = mean_ - mean
+            mean = mean + delta * (n_ / total)
+            m2 = m2 + m2_ + np.abs(delta) ** 2 * (n * n_ / total)
+            n = total
+    return n, mean, m2
+
+
+def reduce_var(a, dtype=None, ddof=0):
+    """
+    Variance of all the leaves, which is merged from the partial moments of the leaves.
+    """
+    leaves = _leaves(a)
+    atype, rtype = _mean_types(leaves, dtype)
+    n, _, m2 = _moments(leaves, atype)
+    rtype = _real_type(rtype)
+    if n - ddof <= 0:
+        warnings.warn('Degrees of freedom <= 0 for slice.', RuntimeWarning)
+        return rtype.type(np.nan)
+    return rtype.type(m2 / (n - ddof))
+
+
+def reduce_std(a, dtype=None, ddof=0):
+    """
+    Standard deviation of all the leaves, which is the square root of :func:`reduce_var`.
+    """
+    var = reduce_var(a, dtype, ddof)
+    return type(var)(np.sqrt(var))
+
+
+def _extreme(func, name: str):
+    def _reduce(a):
+        partials = [profile_leaves(1, func, leaf) for leaf in _leaves(a) if leaf.size]
+        if not partials:
+            raise ValueError(f'zero-size array to reduction operation {name} which has no identity')
+        return func(partials)
+
+    return _reduce
+
+
+reduce_max = _extreme(np.max, 'maximum')
+reduce_max.__doc__ = 'Max value of all the leaves, which is the max value of the partial max values.'
+reduce_min = _extreme(np.min, 'minimum')
+reduce_min.__doc__ = 'Min value of all the leaves, which is the min value of the partial min values.'
+
+
+def _isnan(value) -> bool:
+    return np.issubdtype(np.asarray(value).dtype, np.inexact) and bool(np.isnan(value))
+
+
+def _arg_extreme(func, better, name: str):
+    def _reduce(a):
+        offset, index, best = 0, None, None
+        for leaf in _leaves(a, ordered=True):
+            if leaf.size:
+                i = profile_leaves(1, func, leaf)
+                value = leaf.flat[i]
+                if _isnan(value):  # the first nan is the result, which is the same as numpy
+                    return np.intp(offset + i)
+                elif index is None or better(value, best):
+                    index, best = offset + i, value
+            offset += leaf.size
+
+        if index is None:
+            raise ValueError(f'attempt to get {name} of an empty sequence')
+        return np.intp(index)
+
+    return _reduce
+
+
+reduce_argmax = _arg_extreme(np.argmax, np.greater, 'argmax')
+reduce_argmax.__doc__ = 'Index of the max value of all the leaves, which are flattened one after another in the order of the paths.'
+reduce_argmin = _arg_extreme(np.argmin, np.less, 'argmin')
+reduce_argmin.__doc__ = 'Index of the min value of all the leaves, which are flattened one after another in the order of the paths.'
+
+
+def reduce_percentile(a, q, **kwargs):
+    """
+    Percentiles of all the leaves. The order statistics need all the values, so the leaves are \
+    concatenated into one buffer, which is partitioned in place by :func:`numpy.percentile` \
+    (``overwrite_input=True``), so there is only one copy, the same as :func:`numpy.percentile` on one array.
+    """
+    leaves = _leaves(a)
+    if len(leaves) == 1:
+        return profile_leaves(1, np.percentile, leaves[0], q, **kwargs)
+    merged = np.concatenate([leaf.reshape(-1) for leaf in leaves])
+    return profile_leaves(len(leaves), np.percentile, merged, q, overwrite_input=True, **kwargs)
+
+
+def reduce_options(*names: str):
+    """
+    Create the ``determine`` function of :func:`auto_reduce`, the reduction of all the leaves \
+    is forbidden when the positional arguments (such as ``axis``) or the keyword arguments \
+    except ``names`` are given.
+    """
+
+    # noinspection PyUnusedLocal
+    def _determine(*args, **kwargs):
+        if args or builtins.any(name not in names for name in kwargs):
+            return False
+        else:
+            return None
+
+    return _determine
+
+
+def auto_reduce(rfunc, nrfunc, determine=None, default: bool = True):
+    """
+    Overview:
+        Decorator of the reduction functions of :mod:`treetensor.numpy` with the ``reduce`` option, \
+        which is the same as :func:`treetensor.torch.base.auto_reduce`.
+
+        - ``reduce=True`` reduces all the leaves to one value with ``rfunc``, \
+            which is computed from the partial statistics of the leaves.
+        - ``reduce=False`` reduces each leaf with ``nrfunc``.
+        - ``reduce=None`` (default) reduces all the leaves when it is not forbidden by ``determine`` \
+            and ``default`` is ``True``, otherwise reduces each leaf.
+
+    Arguments:
+        - rfunc: Function to reduce all the leaves to one value.
+        - nrfunc: Function to reduce each leaf.
+        - determine: Function to determine whether the reduction is necessary (``True``), \
+            forbidden (``False``) or optional (``None``) with the arguments, \
+            default is ``reduce_options()``.
+        - default: Reduce all the leaves when ``reduce`` is not given, default is ``True``. \
+            The methods of :class:`treetensor.numpy.ndarray` except ``sum`` use ``False``, \
+            so they still reduce each leaf by default as before.
+    """
+    determine = determine or reduce_options()
+
+    def _decorator(func):
+        # noinspection PyShadowingBuiltins
+        @profile_entry(f'{func.__module__}.{func.__qualname__}')
+        @wraps(func)
+        def _new_func(a, *args, reduce: Optional[bool] = None, **kwargs):
+            _determine = determine(*args, **kwargs)
+            if _determine is not None:
+                if reduce is not None:
+                    if not _determine and reduce:
+                        warnings.warn(UserWarning(
+                            f'Reduce forbidden for this case of function {func.__name__}, '
+                            f'enablement of reduce option will be ignored.'), stacklevel=2)
+                    elif _determine and not reduce:
+                        warnings.warn(UserWarning(
+                            f'Reduce must be processed for this case of function {func.__name__}, '
+                            f'disablement of reduce option will be ignored.'), stacklevel=2)
+                reduce = not not _determine
+
+            _reduce = default if reduce is None else not not reduce
+            return (rfunc if _reduce else nrfunc)(a, *args, **kwargs)
+
+        return _new_func
+
+    return _decorator
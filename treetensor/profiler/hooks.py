@@ -0,0 +1,170 @@
+"""
+Overview:
+    Hooks of the tree functions for :mod:`treetensor.profiler`, which cost almost nothing \
+    when there is no active profile.
+"""
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+__all__ = [
+    'profile_treelize', 'profile_entry', 'profile_result', 'profile_leaves', 'profile_call',
+]
+
+_PROFILES = []  # the active recorders, such as the profiles
+
+
+class _Frame:
+    """
+    One call of a profiled entry, the times are in seconds.
+    """
+    __slots__ = ('name', 'parent', 'treelized', 'in_leaf', 'leaves',
+                 'leaf_time', 'result_time', 'child_time')
+
+    def __init__(self, name: str, parent):
+        self.name = name
+        self.parent = parent
+        self.treelized = False
+        self.in_leaf = False
+        self.leaves = 0
+        self.leaf_time = 0.0
+        self.result_time = 0.0
+        self.child_time = 0.0
+
+
+_CURRENT_FRAME: ContextVar = ContextVar('treetensor_profile_frame', default=None)
+
+
+def _run_frame(name: str, func, args, kwargs, treelized: bool):
+    parent = _CURRENT_FRAME.get()
+    frame = _Frame(name, parent)
+    frame.treelized = treelized
+    for recorder in tuple(_PROFILES):
+        recorder._enter(frame, args, kwargs)
+
+    token = _CURRENT_FRAME.set(frame)
+    start = perf_counter()
+    result = None
+    try:
+        result = func(*args, **kwargs)
+        return result
+    finally:
+        total = perf_counter() - start
+        _CURRENT_FRAME.reset(token)
+        if parent is not None and not parent.in_leaf:
+            # the nested calls outside the leaves are not the bookkeeping of the parent
+            parent.child_time += total
+        for recorder in tuple(_PROFILES):
+            recorder._add(frame, start, total, result)
+
+
+def profile_entry(name: str):
+    """
+    Overview:
+        Mark an entry function, the calls of it are recorded as ``name`` when profiling. \
+        It should be the outermost decorator, so that the construction of the result trees \
+        (see :func:`profile_result`) is included.
+    """
+
+    def _decorator(func):
+        @wraps(func)
+        def _new_func(*args, **kwargs):
+            if not _PROFILES:
+                return func(*args, **kwargs)
+            return _run_frame(name, func, args, kwargs, False)
+
+        return _new_func
+
+    return _decorator
+
+
+def profile_treelize(treelize):
+    """
+    Overview:
+        Wrap ``func_treelize`` or ``method_treelize``, so that the calls of the tree functions, \
+        the number of the leaves and the time inside the leaf functions are recorded when profiling.
+    """
+
+    @wraps(treelize)
+    def _treelize(*args, **kwargs):
+        def _decorator(func):
+            _plain = treelize(*args, **kwargs)(func)
+
+            @wraps(func)
+            def _leaf(*args_, **kwargs_):
+                return profile_leaves(1, func, *args_, **kwargs_)
+
+            _timed = treelize(*args, **kwargs)(_leaf)
+            name = f'{func.__module__}.{func.__qualname__}'
+
+            @wraps(_plain)
+            def _new_func(*args_, **kwargs_):
+                if not _PROFILES:
+                    return _plain(*args_, **kwargs_)
+                return profile_call(name, _timed, *args_, **kwargs_)
+
+            return _new_func
+
+        return _decorator
+
+    return _treelize
+
+
+def profile_call(name: str, func, *args, **kwargs):
+    """
+    Overview:
+        Call the tree function ``func`` which processes the leaves, it is recorded in the frame \
+        opened by the entry of this call (see :func:`profile_entry`), or as ``name`` when there is no such entry.
+    """
+    if not _PROFILES:
+        return func(*args, **kwargs)
+
+    frame = _CURRENT_FRAME.get()
+    if frame is not None and not frame.treelized and not frame.in_leaf:
+        # the frame is opened by the entry of this call
+        frame.treelized = True
+        return func(*args, **kwargs)
+    else:
+        return _run_frame(name, func, args, kwargs, True)
+
+
+def profile_result(func):
+    """
+    Overview:
+        Wrap the function constructing the result trees, such as :func:`treetensor.common.auto_tree`, \
+        the time of it is recorded when profiling.
+    """
+
+    @wraps(func)
+    def _new_func(*args, **kwargs):
+        frame = _CURRENT_FRAME.get() if _PROFILES else None
+        if frame is None:
+            return func(*args, **kwargs)
+
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            frame.result_time += perf_counter() - start
+
+    return _new_func
+
+
+def profile_leaves(count: int, func, *args, **kwargs):
+    """
+    Overview:
+        Call ``func`` which processes ``count`` leaves at once (such as a ``torch._foreach_*`` kernel), \
+        the time of it is recorded as the time inside the leaf functions when profiling.
+    """
+    frame = _CURRENT_FRAME.get() if _PROFILES else None
+    if frame is None:
+        return func(*args, **kwargs)
+
+    frame.in_leaf = True
+    start = perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        frame.leaf_time += perf_counter() - start
+        frame.leaves += count
+        frame.in_leaf = False
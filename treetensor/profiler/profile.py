@@ -0,0 +1,260 @@
+import atexit
+import json
+import os
+import sys
+import threading
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from .hooks import _PROFILES
+
+__all__ = [
+    'FunctionStats', 'Profile', 'profile', 'is_profiling',
+]
+
+
+class FunctionStats:
+    """
+    Overview:
+        Statistics of one tree function, the times are in seconds.
+
+        - ``total_time``: Wall time of the calls.
+        - ``leaf_time``: Time inside the torch / numpy functions of the leaves.
+        - ``result_time``: Time of the construction of the result trees.
+        - ``child_time``: Time of the other tree functions called outside the leaves.
+        - ``bookkeeping_time``: The rest of ``total_time``, such as the flattening of the arguments.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.leaves = 0
+        self.total_time = 0.0
+        self.leaf_time = 0.0
+        self.result_time = 0.0
+        self.child_time = 0.0
+
+    @property
+    def bookkeeping_time(self) -> float:
+        return max(self.total_time - self.leaf_time - self.result_time - self.child_time, 0.0)
+
+    @property
+    def overhead(self) -> float:
+        """
+        Ratio of the treetensor overhead (bookkeeping and result construction) in the time of this function.
+        """
+        own = self.total_time - self.child_time
+        return (self.bookkeeping_time + self.result_time) / own if own > 0 else 0.0
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.name!r}, calls: {self.calls}, leaves: {self.leaves}, ' \
+               f'total: {self.total_time:.6f}s, leaf: {self.leaf_time:.6f}s>'
+
+
+_SORT_KEYS = {
+    'calls': lambda s: s.calls,
+    'leaves': lambda s: s.leaves,
+    'total': lambda s: s.total_time,
+    'leaf': lambda s: s.leaf_time,
+    'result': lambda s: s.result_time,
+    'bookkeeping': lambda s: s.bookkeeping_time,
+    'overhead': lambda s: s.overhead,
+    'name': lambda s: s.name,
+}
+
+
+class Profile:
+    """
+    Overview:
+        Profile of the tree functions (the ``func_treelize`` and ``method_treelize`` wrapped ones, \
+        such as :func:`treetensor.torch.add` and :meth:`treetensor.torch.Tensor.sum`). \
+        The operators (such as ``t + 1``) are not recorded.
+
+        For each function, the number of the calls and the leaves are recorded, with the time spent \
+        in the tree bookkeeping, inside the leaf functions and in the construction of the result trees. \
+        The statistics can be printed as a ``pstats``-style table, and the calls can be exported as \
+        the Chrome trace.
+
+    Arguments:
+        - record_events (:obj:`bool`): Record each call for :meth:`export_chrome_trace`, default is ``True``.
+
+    Examples::
+
+        >>> import treetensor.torch as ttorch
+        >>> from treetensor import profiler
+        >>> t = ttorch.randn({'a': (2, 3), 'b': {'x': (3, 4)}})
+        >>> with profiler.profile() as prof:
+        ...     _ = ttorch.cos(ttorch.sin(t))
+        >>> prof.print_stats()
+        2 function calls (4 leaves) in 0.000361 seconds
+
+           ncalls  nleaves    tottime   leaftime  resulttime  bookkeeping  overhead  function
+                1        2   0.000259   0.000118    0.000062     0.000078    54.32%  treetensor.torch.funcs.base.sin
+                1        2   0.000102   0.000046    0.000025     0.000032    54.99%  treetensor.torch.funcs.base.cos
+        >>> prof.export_chrome_trace('trace.json')  # open it in chrome://tracing or https://ui.perfetto.dev
+
+    .. note::
+        Profiling can also be enabled for the whole process with the environment variable \
+        ``TREETENSOR_PROFILE=1``, then the table is printed to ``stderr`` at exit, and the Chrome trace \
+        is saved to ``TREETENSOR_PROFILE_TRACE`` when it is set.
+    """
+
+    def __init__(self, record_events: bool = True):
+        self.record_events = record_events
+        self._stats: Dict[str, FunctionStats] = {}
+        self._events: List[tuple] = []
+        self._lock = threading.Lock()
+        self._origin = perf_counter()
+
+    def start(self) -> 'Profile':
+        """
+        Overview:
+            Start profiling.
+        """
+        if self not in _PROFILES:
+            _PROFILES.append(self)
+        return self
+
+    def stop(self) -> 'Profile':
+        """
+        Overview:
+            Stop profiling, the recorded statistics are kept.
+        """
+        if self in _PROFILES:
+            _PROFILES.remove(self)
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def clear(self):
+        """
+        Overview:
+            Drop the recorded statistics and events.
+        """
+        with self._lock:
+            self._stats.clear()
+            self._events.clear()
+
+    def _enter(self, frame, args, kwargs):
+        pass
+
+    def _add(self, frame, start: float, total: float, result):
+        with self._lock:
+            stats = self._stats.get(frame.name, None)
+            if stats is None:
+                stats = FunctionStats(frame.name)
+                self._stats[frame.name] = stats
+            stats.calls += 1
+            stats.leaves += frame.leaves
+            stats.total_time += total
+            stats.leaf_time += frame.leaf_time
+            stats.result_time += frame.result_time
+            stats.child_time += frame.child_time
+            if self.record_events:
+                self._events.append((frame.name, threading.get_ident(), start, total,
+                                     frame.leaves, frame.leaf_time, frame.result_time))
+
+    @property
+    def stats(self) -> Dict[str, FunctionStats]:
+        """
+        Statistics of the functions, the keys are the full names of them.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def print_stats(self, sort: str = 'total', limit: Optional[int] = None, file=None):
+        """
+        Overview:
+            Print the statistics as a ``pstats``-style table.
+
+        Arguments:
+            - sort (:obj:`str`): Sort key in descending order, which can be ``calls``, ``leaves``, \
+                ``total``, ``leaf``, ``result``, ``bookkeeping``, ``overhead`` or ``name``, default is ``total``.
+            - limit (:obj:`Optional[int]`): Max number of the rows, default is ``None`` which means no limit.
+            - file: Output file, default is ``None`` which means ``sys.stdout``.
+        """
+        if sort not in _SORT_KEYS:
+            raise ValueError(f'Unknown sort key {sort!r}, {", ".join(_SORT_KEYS)} expected.')
+        file = file if file is not None else sys.stdout
+
+        items = sorted(self.stats.values(), key=_SORT_KEYS[sort], reverse=sort != 'name')
+        calls = sum(s.calls for s in items)
+        leaves = sum(s.leaves for s in items)
+        total = sum(s.total_time - s.child_time for s in items)
+        print(f'{calls} function calls ({leaves} leaves) in {total:.6f} seconds', file=file)
+        print(file=file)
+        print(f'{"ncalls":>9}{"nleaves":>9}{"tottime":>11}{"leaftime":>11}{"resulttime":>12}'
+              f'{"bookkeeping":>13}{"overhead":>10}  function', file=file)
+        for s in items[:limit] if limit is not None else items:
+            print(f'{s.calls:>9}{s.leaves:>9}{s.total_time:>11.6f}{s.leaf_time:>11.6f}{s.result_time:>12.6f}'
+                  f'{s.bookkeeping_time:>13.6f}{s.overhead:>10.2%}  {s.name}', file=file)
+
+    def chrome_trace(self) -> dict:
+        """
+        Overview:
+            Get the calls in the format of the Chrome trace (``chrome://tracing``).
+        """
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+        return {
+            'traceEvents': [
+                {
+                    'name': name, 'cat': 'treetensor', 'ph': 'X', 'pid': pid, 'tid': tid,
+                    'ts': (start - self._origin) * 1e6, 'dur': total * 1e6,
+                    'args': {
+                        'leaves': leaves,
+                        'leaf_us': leaf_time * 1e6,
+                        'result_us': result_time * 1e6,
+                    },
+                } for name, tid, start, total, leaves, leaf_time, result_time in events
+            ],
+            'displayTimeUnit': 'ms',
+        }
+
+    def export_chrome_trace(self, path: str):
+        """
+        Overview:
+            Save the Chrome trace JSON to ``path``.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+def profile(record_events: bool = True) -> Profile:
+    """
+    Overview:
+        Create a :class:`Profile` to be used in the ``with`` statement.
+    """
+    return Profile(record_events)
+
+
+def is_profiling() -> bool:
+    """
+    Overview:
+        Whether there is any active profile.
+    """
+    return bool(_PROFILES)
+
+
+def _profile_from_env():
+    if os.environ.get('TREETENSOR_PROFILE', '').strip().lower() in ('', '0', 'false', 'no', 'off'):
+        return
+
+    trace = os.environ.get('TREETENSOR_PROFILE_TRACE', None)
+    prof = Profile(record_events=bool(trace)).start()
+
+    def _report():
+        prof.stop()
+        prof.print_stats(file=sys.stderr)
+        if trace:
+            prof.export_chrome_trace(trace)
+
+    atexit.register(_report)
+
+
+_profile_from_env()
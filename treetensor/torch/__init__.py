@@ -5,15 +5,30 @@ from typing import Iterable
 
 import torch
 
+from .buffer import *
+from .buffer import __all__ as _buffer_all
 from .funcs import *
 from .funcs import __all__ as _funcs_all
 from .funcs.base import get_func_from_torch
+from .memoize import *
+from .memoize import __all__ as _memoize_all
+from .memory import *
+from .memory import __all__ as _memory_all
+from .ragged import *
+from .ragged import __all__ as _ragged_all
+from .segment import *
+from .segment import __all__ as _segment_all
+from .shard import *
+from .shard import __all__ as _shard_all
 from .size import *
 from .size import __all__ as _size_all
 from .stream import *
 from .stream import __all__ as _stream_all
 from .tensor import *
 from .tensor import __all__ as _tensor_all
+from .transfer import *
+from .transfer import __all__ as _transfer_all
+from . import utils
 from ..config.meta import __VERSION__
 
 __all__ = [
@@ -21,6 +36,13 @@ __all__ = [
     *_size_all,
     *_tensor_all,
     *_stream_all,
+    *_memoize_all,
+    *_shard_all,
+    *_transfer_all,
+    *_buffer_all,
+    *_ragged_all,
+    *_segment_all,
+    *_memory_all,
 ]
 
 _basic_types = (
@@ -1,9 +1,12 @@
+from .foreach import *
+from .foreach import __all__ as _foreach_all
 from .reduce import *
 from .reduce import __all__ as _reduce_all
 from .torch import *
 from .torch import __all__ as _torch_all
 
 __all__ = [
+    *_foreach_all,
     *_reduce_all,
     *_torch_all,
 ]
@@ -0,0 +1,228 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+import torch
+from treevalue import TreeValue, flatten, unflatten
+
+from .torch import Torch
+from ..stream import streams_enabled, wait_tensors
+from ...common import TreeSpec
+from ...profiler import profile_entry, profile_leaves, profile_result
+
+__all__ = [
+    'foreach_dispatch', 'foreach_unary', 'foreach_binary', 'foreach_clamp',
+    'no_foreach',
+]
+
+_FOREACH_ENABLED = ContextVar('treetensor_foreach_enabled', default=True)
+_SCALAR_TYPES = (bool, int, float)
+_unflatten = profile_result(unflatten)
+
+
+class _NotApplicable(Exception):
+    pass
+
+
+@contextmanager
+def no_foreach():
+    """
+    Overview:
+        Disable the ``torch._foreach_*`` backend in the current context, \
+        all the functions are processed leaf by leaf.
+
+    Examples::
+
+        >>> from treetensor.torch.base import no_foreach
+        >>> with no_foreach():
+        ...     ttorch.add(t1, t2)  # call torch.add for each leaf
+    """
+    token = _FOREACH_ENABLED.set(False)
+    try:
+        yield
+    finally:
+        _FOREACH_ENABLED.reset(token)
+
+
+def _tensor_leaves(tree):
+    paths, leaves = [], []
+    for path, value in flatten(tree):
+        if not torch.is_tensor(value):
+            return None, None
+        paths.append(path)
+        leaves.append(value)
+    return paths, leaves
+
+
+def _aligned_leaves(tree, spec: TreeSpec):
+    """
+    Leaves of ``tree`` broadcast to ``spec``, the leaf at a prefix of the paths is used for the subtree \
+    below it (see :meth:`treetensor.common.TreeSpec.broadcast_of`). The leaves should be all tensors \
+    or all scalars, which are supported by the ``torch._foreach_*`` functions.
+    """
+    items = flatten(tree)
+    try:
+        order = spec.broadcast_of(TreeSpec.of(path for path, _ in items))
+    except ValueError:
+        return None
+
+    values = [items[i][1] for i in order]
+    if all(torch.is_tensor(value) for value in values) or all(isinstance(value, _SCALAR_TYPES) for value in values):
+        return values
+    else:
+        return None
+
+
+def _is_operand(x):
+    return x is None or isinstance(x, _SCALAR_TYPES)
+
+
+def foreach_unary(name, inplace=False):
+    """
+    Overview:
+        Kernel of unary function ``torch._foreach_<name>``.
+    """
+    op = getattr(torch, f'_foreach_{name}{"_" if inplace else ""}', None)
+    if op is None:
+        return None  # pragma: no cover
+
+    def _kernel(leaves):
+        return op(leaves)
+
+    return _kernel
+
+
+def foreach_binary(name, inplace=False, alpha=False):
+    """
+    Overview:
+        Kernel of binary function ``torch._foreach_<name>``, \
+        the other operand can be a scalar, a list of tensors or a list of scalars.
+        When ``alpha`` is enabled, keyword argument ``alpha`` is supported like :func:`torch.add`.
+    """
+    op = getattr(torch, f'_foreach_{name}{"_" if inplace else ""}', None)
+    if op is None:
+        return None  # pragma: no cover
+
+    if alpha:
+        def _kernel(leaves, other, alpha=None):
+            if other is None:
+                return None
+            elif alpha is None:
+                return op(leaves, other)
+            elif isinstance(other, list) and torch.is_tensor(other[0]):
+                return op(leaves, other, alpha=alpha)
+            elif isinstance(other, list):
+                return op(leaves, [value * alpha for value in other])
+            else:
+                return op(leaves, other * alpha)
+    else:
+        def _kernel(leaves, other):
+            if other is None:
+                return None
+            return op(leaves, other)
+
+    return _kernel
+
+
+def foreach_clamp(inplace=False):
+    """
+    Overview:
+        Kernel of :func:`torch.clamp` with ``torch._foreach_clamp_min`` and ``torch._foreach_clamp_max``, \
+        only scalar bounds are supported.
+    """
+    _suffix = "_" if inplace else ""
+    op_min = getattr(torch, f'_foreach_clamp_min{_suffix}', None)
+    op_max = getattr(torch, f'_foreach_clamp_max{_suffix}', None)
+    if op_min is None or op_max is None:
+        return None  # pragma: no cover
+
+    # noinspection PyShadowingBuiltins
+    def _kernel(leaves, min=None, max=None):
+        if isinstance(min, list) or isinstance(max, list) or (min is None and max is None):
+            return None
+
+        if inplace:
+            if min is not None:
+                op_min(leaves, min)
+            if max is not None:
+                op_max(leaves, max)
+            return leaves
+        else:
+            result = leaves
+            if min is not None:
+                result = op_min(result, min)
+            if max is not None:
+                result = op_max(result, max)
+            return result
+
+    return _kernel
+
+
+def foreach_dispatch(kernel, inplace=False):
+    """
+    Overview:
+        Dispatch the tree function to ``kernel`` on the flattened leaves when all the leaves are tensors, \
+        otherwise (or when ``kernel`` returns ``None``) fallback to the original leaf-by-leaf function.
+
+        The trees (or dicts) in the arguments should have the same structure with the first argument, \
+        or be the prefixes of it (such as ``{'obs': 0.5, 'reward': 2.0}``), and the other arguments should be scalars.
+        When the tensors require gradient or multiple streams are used (see :func:`treetensor.torch.stream`), \
+        the original function is always used.
+
+    Arguments:
+        - kernel: Function processing the list of tensors, such as the result of :func:`foreach_binary`.
+        - inplace (:obj:`bool`): The function is in-place, so the first argument is returned.
+
+    Returns:
+        - decorator: Decorator for the tree function.
+    """
+
+    def _decorator(func):
+        if kernel is None:
+            return func  # pragma: no cover
+
+        @profile_entry(f'{func.__module__}.{func.__qualname__}')
+        @wraps(func)
+        def _new_func(input, *args, **kwargs):
+            # the multi-stream scheduling is leaf by leaf
+            if not _FOREACH_ENABLED.get() or not isinstance(input, Torch) or streams_enabled():
+                return func(input, *args, **kwargs)
+
+            paths, leaves = _tensor_leaves(input)
+            if not leaves or (torch.is_grad_enabled() and any(t.requires_grad for t in leaves)):
+                return func(input, *args, **kwargs)
+            spec = TreeSpec.of(paths)
+
+            def _operand(x):
+                if isinstance(x, (TreeValue, dict)):
+                    values = _aligned_leaves(TreeValue(x) if isinstance(x, dict) else x, spec)
+                    if values is None or (torch.is_grad_enabled() and
+                                          any(torch.is_tensor(t) and t.requires_grad for t in values)):
+                        raise _NotApplicable
+                    return values
+                elif _is_operand(x):
+                    return x
+                else:
+                    raise _NotApplicable
+
+            try:
+                _args = [_operand(x) for x in args]
+                _kwargs = {key: _operand(value) for key, value in kwargs.items()}
+                wait_tensors(leaves)
+                for x in (*_args, *_kwargs.values()):
+                    if isinstance(x, list) and torch.is_tensor(x[0]):
+                        wait_tensors(x)
+                result = profile_leaves(len(leaves), kernel, leaves, *_args, **_kwargs)
+            except (_NotApplicable, TypeError):
+                result = None
+            if result is None:
+                return func(input, *args, **kwargs)
+
+            if inplace:
+                return input
+            else:
+                return _unflatten(zip(paths, result), return_type=type(input))
+
+        return _new_func
+
+    return _decorator
@@ -1,12 +1,15 @@
+import operator
 import warnings
-from functools import wraps
+from functools import wraps, reduce
 from typing import Optional
 
 import torch
+from treevalue import TreeValue, flatten, unflatten
 
 from ...common import ireduce
+from ...profiler import profile_entry
 
-__all__ = ['rmreduce', 'post_reduce', 'auto_reduce']
+__all__ = ['rmreduce', 'post_reduce', 'auto_reduce', 'scope_amax', 'scope_amin']
 
 
 def _reduce_func(rfunc):
@@ -18,15 +21,15 @@ def _reduce_func(rfunc):
     return _new_func
 
 
-def rmreduce(rfunc=None):
-    return ireduce(_reduce_func(rfunc))
+def rmreduce(rfunc=None, stream: bool = False):
+    return ireduce(_reduce_func(rfunc), stream=stream)
 
 
-def post_reduce(rfunc=None, prefunc=None):
+def post_reduce(rfunc=None, prefunc=None, stream: bool = False):
     rfunc = rfunc or (lambda x, *args, **kwargs: x)
 
     def _decorator(func):
-        func = rmreduce(prefunc)(func)
+        func = rmreduce(prefunc, stream=stream)(func)
 
         # noinspection PyUnusedLocal,PyShadowingBuiltins
         @wraps(func)
@@ -49,14 +52,173 @@ def _default_auto_condition(*args, out=None, **kwargs):
     return not args and not kwargs
 
 
-def auto_reduce(rfunc, nrfunc, determine=None, condition=None):
+def _leaf_dims(dim, ndim: int):
+    if ndim == 0:
+        return ()
+    elif dim is None:
+        return tuple(range(ndim))
+    else:
+        dims = (dim,) if isinstance(dim, int) else tuple(dim)
+        for d in dims:
+            if not -ndim <= d < ndim:
+                raise IndexError(f'Dimension out of range (expected to be in range of [{-ndim}, {ndim - 1}], '
+                                 f'but got {d}).')
+        return tuple(sorted({d % ndim for d in dims}))
+
+
+def _extreme(name: str):
+    """
+    Function of ``torch.amax`` or ``torch.amin`` for the scoped reductions, \
+    which is replaced with :func:`torch.max` or :func:`torch.min` on each dimension before torch 1.7.
+    """
+    func = getattr(torch, f'a{name}', None)
+    if func is not None:
+        return func
+
+    efunc = getattr(torch, name)
+
+    def _func(input, dim, keepdim: bool = False):
+        dims = (dim,) if isinstance(dim, int) else tuple(dim)
+        dims = sorted({d % input.dim() for d in dims}, reverse=True)
+        for d in dims:
+            input = efunc(input, dim=d, keepdim=keepdim)[0]
+        return input
+
+    return _func
+
+
+scope_amax = _extreme('max')
+scope_amin = _extreme('min')
+
+
+def _rest_shape(leaf: torch.Tensor, dims):
+    return tuple(n for i, n in enumerate(leaf.shape) if i not in dims)
+
+
+def _flatten_reduced(leaf: torch.Tensor, dims):
+    # move the reduced dimensions to the end, and merge them into one
+    rest = [i for i in range(leaf.dim()) if i not in dims]
+    size = reduce(operator.mul, (leaf.shape[i] for i in dims), 1)
+    return leaf.permute(*rest, *dims).reshape(*_rest_shape(leaf, dims), size)
+
+
+def _group_reduce(sfunc, leaves, dim, keepdim: bool, kwargs):
+    """
+    Reduce the dimensions ``dim`` of all the ``leaves`` together, with only one kernel of ``sfunc``.
+    """
+    leaves = [torch.as_tensor(leaf) for leaf in leaves]
+    dims = [_leaf_dims(dim, leaf.dim()) for leaf in leaves]
+    rests = {_rest_shape(leaf, d) for leaf, d in zip(leaves, dims)}
+    if len(rests) != 1:
+        raise ValueError(f'The shapes of the dimensions not reduced should be the same, '
+                         f'but {sorted(rests)!r} found.')
+
+    ndims = {leaf.dim() for leaf in leaves}
+    if len(ndims) == 1 and len(dims[0]) == 1:
+        # the leaves only differ on the reduced dimension, so they can be concatenated on it directly
+        d = dims[0][0]
+        merged = torch.cat(leaves, dim=d) if len(leaves) > 1 else leaves[0]
+        return sfunc(merged, dim=d, keepdim=keepdim, **kwargs)
+
+    merged = torch.cat([_flatten_reduced(leaf, d) for leaf, d in zip(leaves, dims)], dim=-1)
+    result = sfunc(merged, dim=-1, **kwargs)
+    if keepdim:
+        if len(ndims) != 1:
+            raise ValueError(f'Keepdim is not supported for the leaves with different dimensions, '
+                             f'but {sorted(ndims)!r} found.')
+        shape = [1 if i in dims[0] else n for i, n in enumerate(leaves[0].shape)]
+        result = result.reshape(shape)
+    return result
+
+
+def _scope_args(args, kwargs):
+    kwargs = dict(kwargs)
+    if args:
+        if len(args) > 1:
+            raise TypeError('Only the dim can be positional for the reduction with scope, '
+                            f'but {len(args)} positional arguments found.')
+        if 'dim' in kwargs:
+            raise TypeError('Argument dim is given twice.')
+        dim = args[0]
+    else:
+        dim = kwargs.pop('dim', None)
+    keepdim = kwargs.pop('keepdim', False)
+    return dim, keepdim, kwargs
+
+
+def _scope_path(scope: str) -> tuple:
+    return tuple(filter(bool, scope[len('subtree:'):].split('.')))
+
+
+def _scope_reduce(sfunc, scope: str, input, args, kwargs):
+    dim, keepdim, kwargs = _scope_args(args, kwargs)
+    if not isinstance(input, TreeValue):
+        return _group_reduce(sfunc, [input], dim, keepdim, kwargs)
+    elif scope == 'tree':
+        return _group_reduce(sfunc, [value for _, value in flatten(input)], dim, keepdim, kwargs)
+
+    path = _scope_path(scope)
+    prefix, group, pairs = len(path), [], []
+    for p, value in flatten(input):
+        if p[:prefix] == path:
+            group.append(value)
+        else:
+            pairs.append((p, _group_reduce(sfunc, [value], dim, keepdim, kwargs)))
+    if not group:
+        raise KeyError(f'Subtree {".".join(path)!r} not found.')
+    pairs.append((path, _group_reduce(sfunc, group, dim, keepdim, kwargs)))
+    return unflatten(pairs, return_type=type(input))
+
+
+def _check_scope(scope: str, sfunc, name: str):
+    if scope not in ('leaf', 'tree') and not scope.startswith('subtree:'):
+        raise ValueError(f'Scope should be \'leaf\', \'tree\' or \'subtree:<path>\', but {scope!r} found.')
+    elif scope.startswith('subtree:') and not _scope_path(scope):
+        raise ValueError(f'Path of the subtree should not be empty, use scope=\'tree\' instead of {scope!r}.')
+    elif scope != 'leaf' and sfunc is None:
+        raise ValueError(f'Scope {scope!r} is not supported by function {name}.')
+
+
+def auto_reduce(rfunc, nrfunc, determine=None, condition=None, sfunc=None):
+    """
+    Overview:
+        Decorator of the reduction functions with the ``reduce`` and ``scope`` options.
+
+        - ``reduce=True`` reduces all the leaves to one value with ``rfunc``, \
+            while ``reduce=False`` reduces each leaf with ``nrfunc``.
+        - ``scope='leaf'`` is the same as ``reduce=False``.
+        - ``scope='tree'`` reduces the dimensions ``dim`` of all the leaves together with ``sfunc``, \
+            the result is one tensor whose shape is the shape of the dimensions not reduced, \
+            which should be the same for all the leaves. ``keepdim`` is supported as well.
+        - ``scope='subtree:<path>'`` reduces the leaves of the subtree at ``path`` (such as ``a.b``) \
+            together, and the other leaves separately, the result is still a tree.
+
+    Arguments:
+        - rfunc: Function to reduce all the leaves to one value.
+        - nrfunc: Function to reduce each leaf.
+        - determine: Function to determine whether the reduction is necessary (``True``), \
+            forbidden (``False``) or optional (``None``) with the arguments.
+        - condition: Function to determine the default reduction with the arguments.
+        - sfunc: Torch function with ``dim`` and ``keepdim`` for the scoped reductions, such as \
+            :func:`torch.sum`, default is ``None`` which means only ``scope='leaf'`` is supported.
+    """
     determine = determine or _default_auto_determine
     condition = condition or _default_auto_condition
 
     def _decorator(func):
         # noinspection PyUnusedLocal,PyShadowingBuiltins
+        @profile_entry(f'{func.__module__}.{func.__qualname__}')
         @wraps(func)
-        def _new_func(input, *args, reduce: Optional[bool] = None, **kwargs):
+        def _new_func(input, *args, reduce: Optional[bool] = None, scope: Optional[str] = None, **kwargs):
+            if scope is not None:
+                if reduce is not None:
+                    raise ValueError('Options reduce and scope should not be used together.')
+                _check_scope(scope, sfunc, func.__name__)
+                if scope == 'leaf':
+                    return nrfunc(input, *args, **kwargs)
+                else:
+                    return _scope_reduce(sfunc, scope, input, args, kwargs)
+
             _determine = determine(*args, **kwargs)
             if _determine is not None:
                 if reduce is not None:
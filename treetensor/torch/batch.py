@@ -0,0 +1,167 @@
+import torch
+from treevalue import TreeValue, flatten, unflatten
+
+__all__ = [
+    'BatchIndexer',
+]
+
+
+def _as_slice(indices: torch.Tensor):
+    """
+    Convert the 1-dim indices with a constant positive step to a slice, so the leaves are indexed as views.
+    """
+    n = indices.numel()
+    if n == 0:
+        return slice(0, 0)
+
+    start = int(indices[0])
+    if start < 0:
+        return None
+    elif n == 1:
+        return slice(start, start + 1)
+
+    steps = indices[1:] - indices[:-1]
+    step = int(steps[0])
+    if step <= 0 or not bool((steps == step).all()):
+        return None
+    return slice(start, start + step * (n - 1) + 1, step)
+
+
+class _BatchIndex:
+    """
+    Index of the first dimension shared by all the leaves, it is normalized only once.
+    When ``view`` is enabled, the index tensors are converted to slices, so the leaves are indexed as views.
+    """
+
+    def __init__(self, index, view: bool = False):
+        if isinstance(index, (list, range)):
+            index = torch.as_tensor(index)
+            if not index.numel():
+                index = index.long()
+
+        self.basic = None  # int, slice or the other basic index applied directly
+        self.tensor = None  # 1-dim long indices, copied to the devices on demand
+        self.mask_size = None  # size of the boolean mask, which should be the size of the first dimension
+        self.bound = None  # max index of the slice converted from the index tensor
+        self.negative = False
+        self._devices = {}
+
+        if isinstance(index, torch.Tensor):
+            if index.dtype == torch.bool:
+                if index.dim() != 1:
+                    raise IndexError(f'1-dim boolean mask expected, but {index.dim()}-dim found.')
+                self.mask_size = index.shape[0]
+                index = index.nonzero().reshape(-1)
+            elif index.dtype.is_floating_point or index.dtype.is_complex:
+                raise IndexError(f'Tensors used as indices must be long or bool, but {index.dtype} found.')
+            elif index.dim() == 0:
+                self.basic = int(index)
+                return
+            else:
+                index = index.long()
+
+            if view:
+                self.basic = _as_slice(index.cpu()) if index.dim() == 1 else None
+                if self.basic is None:
+                    raise IndexError('Only the indices with a constant positive step can be indexed as views.')
+                self.bound = self.basic.stop - 1
+            else:
+                self.tensor = index
+                self.negative = bool((index < 0).any())  # not supported by index_select
+                self._devices[index.device] = index
+        else:
+            self.basic = index
+
+    def _on(self, device):
+        if device not in self._devices:
+            self._devices[device] = self.tensor.to(device)
+        return self._devices[device]
+
+    def _check(self, leaf: torch.Tensor):
+        if self.mask_size is not None and (leaf.dim() == 0 or self.mask_size != leaf.shape[0]):
+            raise IndexError(f'The shape of the mask [{self.mask_size}] at index 0 does not match '
+                             f'the shape of the indexed tensor {list(leaf.shape)!r} at index 0.')
+        if self.bound is not None and (leaf.dim() == 0 or self.bound >= leaf.shape[0]):
+            size = leaf.shape[0] if leaf.dim() else 0
+            raise IndexError(f'Index {self.bound} is out of bounds for dimension 0 with size {size}.')
+
+    def get(self, leaf: torch.Tensor) -> torch.Tensor:
+        self._check(leaf)
+        if self.tensor is None:
+            return leaf[self.basic]
+        elif self.tensor.dim() == 1 and not self.negative:
+            return leaf.index_select(0, self._on(leaf.device))
+        else:
+            return leaf[self._on(leaf.device)]
+
+    def set(self, leaf: torch.Tensor, value):
+        self._check(leaf)
+        if self.tensor is None:
+            leaf[self.basic] = value
+        else:
+            if isinstance(value, torch.Tensor):  # index_put needs the same dtype, unlike the basic indexing
+                value = value.to(leaf)
+            leaf[self._on(leaf.device)] = value
+
+
+class BatchIndexer:
+    """
+    Overview:
+        Indexer of the first dimension of all the leaves, which is :attr:`treetensor.torch.Tensor.batch`.
+
+        - Integers and slices are applied to the leaves as views.
+        - Boolean masks are converted to indices once, and the index tensors are applied with \
+            one :func:`torch.index_select` for each leaf, the indices are copied only once for each device. \
+            The results are copies, the same as the advanced indexing of torch.
+        - With :attr:`view`, the index tensors (and masks) with a constant positive step are converted \
+            to slices, so the results are views of the leaves.
+        - Trees (or dicts) with the same structure are assigned leaf by leaf, the other values are \
+            assigned to all the leaves.
+    """
+
+    def __init__(self, tree, view: bool = False):
+        self._tree = tree
+        self._view = view
+
+    @property
+    def view(self) -> 'BatchIndexer':
+        """
+        Overview:
+            Indexer which converts the index tensors with a constant positive step to slices, \
+            so the results are views of the leaves, the modification on them are applied to this tree. \
+            :class:`IndexError` is raised for the other indices.
+
+        Examples::
+
+            >>> t.batch.view[torch.tensor([0, 2, 4])]  # the same as t.batch[0:5:2]
+        """
+        return BatchIndexer(self._tree, view=True)
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            return unflatten([
+                (path, value[index]) for path, value in flatten(self._tree)
+            ], return_type=type(self._tree))
+
+        _index = _BatchIndex(index, view=self._view)
+        return unflatten([
+            (path, _index.get(value)) for path, value in flatten(self._tree)
+        ], return_type=type(self._tree))
+
+    def __setitem__(self, index, value):
+        _index = _BatchIndex(index) if not isinstance(index, tuple) else None
+        if isinstance(value, dict):
+            value = TreeValue(value)
+        values = dict(flatten(value)) if isinstance(value, TreeValue) else None
+        for path, leaf in flatten(self._tree):
+            if values is not None:
+                if path not in values:
+                    raise KeyError(f'Key {".".join(map(str, path))!r} not found in the value.')
+                v = values[path]
+            else:
+                v = value
+
+            if _index is None:
+                leaf[index] = v
+            else:
+                _index.set(leaf, v)
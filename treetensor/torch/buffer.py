@@ -0,0 +1,192 @@
+from collections.abc import Mapping
+from typing import Optional, Union
+
+import torch
+from treevalue import TreeValue, flatten, unflatten
+
+from .tensor import Tensor
+
+__all__ = [
+    'RingBuffer',
+]
+
+
+def _flatten_tree(tree):
+    if isinstance(tree, Mapping):
+        tree = TreeValue(tree)
+    return flatten(tree)
+
+
+def _copy(dst, src):
+    if hasattr(torch, '_foreach_copy_'):
+        torch._foreach_copy_(dst, src)
+    else:  # pragma: no cover
+        for d, s in zip(dst, src):
+            d.copy_(s)
+
+
+class RingBuffer:
+    """
+    Overview:
+        Ring buffer of tree tensors, such as the replay buffer of reinforcement learning. \
+        One ``[capacity, ...]`` tensor is preallocated for each leaf of the ``spec``, \
+        the oldest items are overwritten when the buffer is full.
+
+    Arguments:
+        - spec: Sample of the items, which can be a dict or :class:`treetensor.torch.Tensor`. \
+            Only the shapes and dtypes of the leaves are used.
+        - capacity (:obj:`int`): Max number of the items.
+        - device: Device of the storage, default is ``None`` which means the devices of ``spec``.
+        - shared (:obj:`bool`): Move the storage to shared memory, so the buffer can be \
+            used by the other processes of :mod:`torch.multiprocessing`, default is ``False``.
+
+    Examples::
+
+        >>> import torch
+        >>> import treetensor.torch as ttorch
+        >>> buffer = ttorch.RingBuffer({'obs': torch.zeros(4), 'reward': 0.0, 'done': False}, capacity=1000)
+        >>> buffer.push({'obs': torch.randn(4), 'reward': 1.0, 'done': False})
+        >>> buffer.push_batch(ttorch.Tensor({
+        ...     'obs': torch.randn(16, 4), 'reward': torch.randn(16), 'done': torch.zeros(16, dtype=torch.bool),
+        ... }))
+        >>> len(buffer)
+        17
+        >>> buffer.sample([0, 5, 16])  # the 1st, 6th and 17th oldest items
+        <Tensor 0x7f0c2ee3c2b0>
+        ├── 'done' --> tensor([False, False, False])
+        ├── 'obs' --> tensor([[ 0.3212, ...]])
+        └── 'reward' --> tensor([ 1.0000, -0.5329,  0.9011])
+    """
+
+    def __init__(self, spec, capacity: int, device: Union[str, torch.device, None] = None, shared: bool = False):
+        if capacity < 1:
+            raise ValueError(f'Capacity should be positive, but {capacity!r} found.')
+        self.capacity = capacity
+
+        self._paths, self._leaves = [], []
+        for path, value in _flatten_tree(spec):
+            value = torch.as_tensor(value)
+            leaf = torch.empty((capacity, *value.shape), dtype=value.dtype,
+                               device=device if device is not None else value.device)
+            if shared:
+                leaf.share_memory_()
+            self._paths.append(path)
+            self._leaves.append(leaf)
+        self._indices = {path: i for i, path in enumerate(self._paths)}
+        self._storage = unflatten(zip(self._paths, self._leaves), return_type=Tensor)
+
+        self._pos = 0  # position of the next item
+        self._size = 0
+
+    @property
+    def storage(self) -> Tensor:
+        """
+        Preallocated storage of the buffer, the items are not in order.
+        """
+        return self._storage
+
+    def __len__(self):
+        return self._size
+
+    def _aligned(self, tree):
+        items = _flatten_tree(tree)
+        if len(items) != len(self._paths):
+            raise ValueError(f'{len(self._paths)} leaves expected, but {len(items)} found.')
+
+        values = [None] * len(self._paths)
+        for path, value in items:
+            index = self._indices.get(path, None)
+            if index is None:
+                raise ValueError(f'Unknown key {".".join(map(str, path))!r} for the buffer.')
+            values[index] = torch.as_tensor(value)
+        return values
+
+    def push(self, item):
+        """
+        Overview:
+            Push one item into the buffer.
+
+        Arguments:
+            - item: Item with the same structure as ``spec``.
+        """
+        values = self._aligned(item)
+        _copy([leaf[self._pos] for leaf in self._leaves], values)
+        self._pos = (self._pos + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def push_batch(self, batch):
+        """
+        Overview:
+            Push a batch of items into the buffer with slice assignments, \
+            the first dimension of the leaves is the batch.
+
+        Arguments:
+            - batch: Batch of items, such as the result of :func:`treetensor.torch.stack`.
+        """
+        values = self._aligned(batch)
+        sizes = {value.shape[0] for value in values}
+        if len(sizes) != 1:
+            raise ValueError(f'The batch sizes of the leaves should be the same, but {sorted(sizes)!r} found.')
+        n = sizes.pop()
+        if n > self.capacity:  # only the last items are kept
+            values = [value[n - self.capacity:] for value in values]
+            n = self.capacity
+
+        first = min(n, self.capacity - self._pos)
+        _copy([leaf[self._pos:self._pos + first] for leaf in self._leaves], [value[:first] for value in values])
+        if first < n:
+            _copy([leaf[:n - first] for leaf in self._leaves], [value[first:] for value in values])
+
+        self._pos = (self._pos + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def _physical(self, indices) -> torch.Tensor:
+        indices = torch.as_tensor(indices, dtype=torch.long)
+        if indices.numel() and (indices.min() < -self._size or indices.max() >= self._size):
+            raise IndexError(f'Index out of range for the buffer with {self._size} items.')
+        elif not self._size:
+            return indices
+        start = (self._pos - self._size) % self.capacity
+        return (indices % self._size + start) % self.capacity
+
+    def sample(self, indices) -> Tensor:
+        """
+        Overview:
+            Get the items with one :func:`torch.index_select` for each leaf.
+
+        Arguments:
+            - indices: Indices of the items, ``0`` is the oldest one and ``-1`` is the newest one.
+
+        Returns:
+            - items: Tree tensor of the items, the first dimension is the indices.
+        """
+        indices = torch.as_tensor(indices, dtype=torch.long)
+        physical = self._physical(indices.reshape(-1))
+        values = []
+        for leaf in self._leaves:
+            value = leaf.index_select(0, physical.to(leaf.device))
+            values.append(value.reshape((*indices.shape, *leaf.shape[1:])))
+        return unflatten(zip(self._paths, values), return_type=Tensor)
+
+    def sample_random(self, batch_size: int, generator: Optional[torch.Generator] = None) -> Tensor:
+        """
+        Overview:
+            Sample ``batch_size`` items uniformly with replacement.
+
+        Arguments:
+            - batch_size (:obj:`int`): Number of the items.
+            - generator (:obj:`Optional[torch.Generator]`): Random generator, default is ``None``.
+
+        Returns:
+            - items: Tree tensor of the items.
+        """
+        if not self._size:
+            raise IndexError('Sample from an empty buffer.')
+        return self.sample(torch.randint(0, self._size, (batch_size,), generator=generator))
+
+    def clear(self):
+        """
+        Overview:
+            Remove all the items, the storage is kept.
+        """
+        self._pos, self._size = 0, 0
@@ -0,0 +1,98 @@
+import torch
+from treevalue import unflatten
+
+from ..common import Object, leafwise_call
+from ..profiler import profile_result
+
+__all__ = [
+    'torch_function',
+]
+
+_unflatten = profile_result(unflatten)
+
+_TENSOR, _SEQUENCE, _OBJECT = 'tensor', 'sequence', 'object'
+_KINDS = {}  # kinds of the results of the functions, which are checked first in the next calls
+
+
+def _is_tensors(results) -> bool:
+    return all(isinstance(r, torch.Tensor) for r in results)
+
+
+def _is_sequence(results) -> bool:
+    first = results[0]
+    if not isinstance(first, (tuple, list)):
+        return False
+    return all(type(r) is type(first) and len(r) == len(first) for r in results)
+
+
+_CHECKS = {_TENSOR: _is_tensors, _SEQUENCE: _is_sequence}
+
+
+def _kind_of(func, results) -> str:
+    hint = _KINDS.get(func, _TENSOR)
+    for kind in ((hint, *(k for k in _CHECKS if k != hint)) if hint in _CHECKS else _CHECKS):
+        if _CHECKS[kind](results):
+            break
+    else:
+        kind = _OBJECT
+    _KINDS[func] = kind
+    return kind
+
+
+def _tree(cls, paths, values):
+    return_type = cls if all(isinstance(v, torch.Tensor) for v in values) else Object
+    return _unflatten(zip(paths, values), return_type=return_type)
+
+
+_OVERRIDES = None
+
+
+def _overrides():
+    """
+    The functions of :mod:`treetensor.torch` which are used for the torch functions with the same names, \
+    such as :func:`treetensor.torch.add` (with the ``torch._foreach_*`` backend) for :func:`torch.add`.
+    """
+    global _OVERRIDES
+    if _OVERRIDES is None:
+        from . import funcs
+        _OVERRIDES = {
+            getattr(torch, name): getattr(funcs, name)
+            for name in funcs.__all__ if callable(getattr(torch, name, None))
+        }
+    return _OVERRIDES
+
+
+def torch_function(cls, func, args, kwargs):
+    """
+    Overview:
+        Apply the torch function ``func`` to the trees, which is the implementation of \
+        :meth:`treetensor.torch.Tensor.__torch_function__`.
+
+        - The functions implemented in :mod:`treetensor.torch` (such as :func:`treetensor.torch.add` and \
+            :func:`treetensor.torch.stack`) are used directly, so the ``foreach`` and packed backends \
+            of them are used as well.
+        - The other functions are applied to each leaf with :func:`treetensor.common.leafwise_call`. \
+            The kind of the results of each function (tensors, tuples of them or the other objects) \
+            is cached, so it is checked first in the next calls. The tuples (such as the results of \
+            :func:`torch.sort`) are converted to the tuples of trees.
+    """
+    override = _overrides().get(func, None)
+    if override is not None:
+        return override(*args, **kwargs)
+
+    spec, results = leafwise_call(func, args, kwargs)
+    if not results:
+        return _unflatten([], return_type=cls)
+
+    kind = _kind_of(func, results)
+    if kind == _TENSOR:
+        return _unflatten(zip(spec.paths, results), return_type=cls)
+    elif kind == _SEQUENCE:
+        first = results[0]
+        trees = [_tree(cls, spec.paths, values) for values in zip(*results)]
+        if hasattr(type(first), '_fields'):  # namedtuple
+            return type(first)(*trees)
+        else:
+            return type(first)(trees)
+    else:
+        return _unflatten(zip(spec.paths, results), return_type=Object)
@@ -1,10 +1,12 @@
 import torch
+from treevalue import flatten
 
 from .base import doc_from_base, func_treelize
 from ...common import return_self
 
 __all__ = [
-    'detach', 'detach_'
+    'detach', 'detach_',
+    'grad_norm', 'clip_grad_norm_', 'zero_grad_', 'accumulate_grad_',
 ]
 
 
@@ -81,3 +83,204 @@ def detach_(input):
                               [ 0.6465, -0.2212,  1.5499, -1.2156]])
     """
     return torch.detach_(input)
+
+
+def _grads(tensors):
+    return [t.grad for _, t in flatten(tensors) if t.grad is not None]
+
+
+def _total_norm(grads, p):
+    if not grads:
+        return torch.tensor(0.0)
+
+    if hasattr(torch, '_foreach_norm'):
+        norms = torch._foreach_norm(grads, p)
+    else:
+        norms = [torch.norm(g, p) for g in grads]  # pragma: no cover
+    device = norms[0].device
+    return torch.norm(torch.stack([n.to(device) for n in norms]), p)
+
+
+# noinspection PyShadowingBuiltins
+def grad_norm(input, p=2.0):
+    """
+    Get the total norm of the gradients in the tree, \
+    the same as the norm of the concatenation of all the gradients.
+    The tensors without gradients are ignored.
+
+    :param input: Tree of the tensors (usually the parameters).
+    :param p: Order of the norm, ``float('inf')`` is supported, default is ``2.0``.
+
+    Examples::
+
+        >>> import torch
+        >>> import treetensor.torch as ttorch
+        >>> tt = ttorch.tensor({
+        ...     'a': [1.0, 2.0],
+        ...     'b': {'x': [[3.0, 4.0]]},
+        ... }, requires_grad=True)
+        >>> (tt ** 2).sum().backward()
+        >>> ttorch.grad_norm(tt)
+        tensor(10.9545)
+        >>> ttorch.grad_norm(tt, float('inf'))
+        tensor(8.)
+
+    .. note::
+        The norms of the gradients are calculated with ``torch._foreach_norm`` \
+        in one call when it is supported by the installed torch.
+    """
+    return _total_norm(_grads(input), p)
+
+
+# noinspection PyShadowingBuiltins
+def clip_grad_norm_(input, max_norm, norm_type=2.0, error_if_nonfinite=False):
+    """
+    Clip the gradients in the tree in-place by their total norm, \
+    just like :func:`torch.nn.utils.clip_grad_norm_`.
+
+    :param input: Tree of the tensors (usually the parameters).
+    :param max_norm: Max norm of the gradients.
+    :param norm_type: Order of the norm, default is ``2.0``.
+    :param error_if_nonfinite: Raise :class:`RuntimeError` when the total norm is ``nan`` or ``inf``, \
+        default is ``False``.
+    :return: Total norm of the original gradients.
+
+    Examples::
+
+        >>> import torch
+        >>> import treetensor.torch as ttorch
+        >>> tt = ttorch.tensor({
+        ...     'a': [1.0, 2.0],
+        ...     'b': {'x': [[3.0, 4.0]]},
+        ... }, requires_grad=True)
+        >>> (tt ** 2).sum().backward()
+        >>> ttorch.clip_grad_norm_(tt, 1.0)
+        tensor(10.9545)
+        >>> tt.grad
+        <Tensor 0x7f2d4f1d7e50>
+        ├── 'a' --> tensor([0.1826, 0.3651])
+        └── 'b' --> <Tensor 0x7f2d4f1d7df0>
+            └── 'x' --> tensor([[0.5477, 0.7303]])
+    """
+    grads = _grads(input)
+    total_norm = _total_norm(grads, norm_type)
+    if error_if_nonfinite and not torch.isfinite(total_norm):
+        raise RuntimeError(f'The total norm of order {norm_type!r} for gradients is non-finite, '
+                           f'so it cannot be clipped.')
+
+    clip_coef = torch.clamp(max_norm / (total_norm + 1e-6), max=1.0)
+    by_device = {}
+    for g in grads:
+        by_device.setdefault(g.device, []).append(g)
+    for device, device_grads in by_device.items():
+        coef = clip_coef.to(device)
+        if hasattr(torch, '_foreach_mul_'):
+            torch._foreach_mul_(device_grads, coef)
+        else:
+            for g in device_grads:  # pragma: no cover
+                g.mul_(coef)
+
+    return total_norm
+
+
+# noinspection PyShadowingBuiltins
+def zero_grad_(input, set_to_none=True):
+    """
+    Reset the gradients of the tensors in the tree, \
+    just like :meth:`torch.optim.Optimizer.zero_grad`.
+
+    :param input: Tree of the tensors (usually the parameters).
+    :param set_to_none: Set the gradients to ``None`` instead of filling zeros, default is ``True``.
+    :return: The original tree.
+
+    Examples::
+
+        >>> import torch
+        >>> import treetensor.torch as ttorch
+        >>> tt = ttorch.tensor({
+        ...     'a': [1.0, 2.0],
+        ...     'b': {'x': [[3.0, 4.0]]},
+        ... }, requires_grad=True)
+        >>> (tt ** 2).sum().backward()
+        >>> ttorch.zero_grad_(tt, set_to_none=False)  # the original tree is returned
+        <Tensor 0x7f2d4f1d7a30>
+        ├── 'a' --> tensor([1., 2.], requires_grad=True)
+        └── 'b' --> <Tensor 0x7f2d4f1d7af0>
+            └── 'x' --> tensor([[3., 4.]], requires_grad=True)
+        >>> tt.grad
+        <Tensor 0x7f2d4f1d7a60>
+        ├── 'a' --> tensor([0., 0.])
+        └── 'b' --> <Tensor 0x7f2d4f1d7b80>
+            └── 'x' --> tensor([[0., 0.]])
+    """
+    if set_to_none:
+        for _, t in flatten(input):
+            t.grad = None
+    else:
+        grads = []
+        for _, t in flatten(input):
+            if t.grad is not None:
+                if t.grad.grad_fn is not None:
+                    t.grad.detach_()
+                else:
+                    t.grad.requires_grad_(False)
+                grads.append(t.grad)
+        if grads:
+            if hasattr(torch, '_foreach_zero_'):
+                torch._foreach_zero_(grads)
+            else:
+                for g in grads:  # pragma: no cover
+                    g.zero_()
+
+    return input
+
+
+def accumulate_grad_(dst, src):
+    """
+    Accumulate the tree of gradients ``src`` into the gradients of the tensors in ``dst``.
+    The gradients which are ``None`` are initialized with the copies of ``src``.
+
+    :param dst: Tree of the tensors (usually the parameters).
+    :param src: Tree of the gradients, its structure should be the same as ``dst``.
+    :return: The tree ``dst``.
+
+    Examples::
+
+        >>> import torch
+        >>> import treetensor.torch as ttorch
+        >>> tt = ttorch.tensor({
+        ...     'a': [1.0, 2.0],
+        ...     'b': {'x': [[3.0, 4.0]]},
+        ... }, requires_grad=True)
+        >>> g = ttorch.ones_like(tt)
+        >>> _ = ttorch.accumulate_grad_(tt, g)
+        >>> _ = ttorch.accumulate_grad_(tt, g)
+        >>> tt.grad
+        <Tensor 0x7f2d4f1d7a00>
+        ├── 'a' --> tensor([2., 2.])
+        └── 'b' --> <Tensor 0x7f2d4f1d7d30>
+            └── 'x' --> tensor([[2., 2.]])
+    """
+    src_grads = dict(flatten(src))
+    dst_items = flatten(dst)
+    if len(src_grads) != len(dst_items) or any(path not in src_grads for path, _ in dst_items):
+        raise KeyError(f'Tree structure not match, {sorted(p for p, _ in dst_items)!r} expected '
+                       f'but {sorted(src_grads.keys())!r} found.')
+
+    grads, increments = [], []
+    for path, t in dst_items:
+        g = src_grads[path]
+        if t.grad is None:
+            t.grad = g.detach().clone()
+        else:
+            grads.append(t.grad)
+            increments.append(g.to(t.grad.device))
+
+    if grads:
+        if hasattr(torch, '_foreach_add_'):
+            torch._foreach_add_(grads, increments)
+        else:
+            for g, inc in zip(grads, increments):  # pragma: no cover
+                g.add_(inc)
+
+    return dst
@@ -4,12 +4,16 @@ import torch
 from hbutils.testing import vpip
 from treevalue import func_treelize as original_func_treelize
 
+from ..stream import executor_treelize
 from ..tensor import Tensor
-from ...common import auto_tree, module_func_loader
+from ...common import auto_tree, module_func_loader, broadcast_treelize
+from ...profiler import profile_treelize
 from ...utils import doc_from_base as original_doc_from_base
 from ...utils import replaceable_partial
 
-func_treelize = replaceable_partial(original_func_treelize, return_type=Tensor)
+func_treelize = profile_treelize(executor_treelize(
+    broadcast_treelize(replaceable_partial(original_func_treelize, return_type=Tensor), Tensor)
+))
 doc_from_base = replaceable_partial(original_doc_from_base, base=torch)
 auto_tensor = replaceable_partial(auto_tree, cls=[(torch.is_tensor, Tensor)])
 get_func_from_torch = module_func_loader(torch, Tensor,
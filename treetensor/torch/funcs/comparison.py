@@ -15,8 +15,7 @@ __all__ = [
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
-@ireduce(builtins.all)
-@func_treelize()
+@ireduce(builtins.all, stream=True)
 def equal(input, other):
     """
     In ``treetensor``, you can get the equality of the two tree tensors.
@@ -1,6 +1,7 @@
 import torch
 
 from .base import doc_from_base, func_treelize
+from ..base import foreach_dispatch, foreach_unary, foreach_binary, foreach_clamp
 from ..stream import stream_call
 from ...common import return_self
 
@@ -16,6 +17,7 @@ __all__ = [
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_unary('abs'))
 @func_treelize()
 def abs(input, *args, **kwargs):
     """
@@ -43,6 +45,7 @@ def abs(input, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_unary('abs', inplace=True), inplace=True)
 @return_self
 @func_treelize()
 def abs_(input):
@@ -75,6 +78,7 @@ def abs_(input):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_clamp())
 @func_treelize()
 def clamp(input, *args, **kwargs):
     """
@@ -102,6 +106,7 @@ def clamp(input, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins,PyUnresolvedReferences
 @doc_from_base()
+@foreach_dispatch(foreach_clamp(inplace=True), inplace=True)
 @return_self
 @func_treelize()
 def clamp_(input, *args, **kwargs):
@@ -353,6 +358,7 @@ def ceil_(input):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_unary('sigmoid'))
 @func_treelize()
 def sigmoid(input, *args, **kwargs):
     """
@@ -380,6 +386,7 @@ def sigmoid(input, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_unary('sigmoid', inplace=True), inplace=True)
 @return_self
 @func_treelize()
 def sigmoid_(input):
@@ -412,6 +419,7 @@ def sigmoid_(input):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_binary('add', alpha=True))
 @func_treelize()
 def add(input, other, *args, **kwargs):
     """
@@ -449,6 +457,7 @@ def add(input, other, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_binary('sub', alpha=True))
 @func_treelize()
 def sub(input, other, *args, **kwargs):
     """
@@ -485,6 +494,7 @@ def sub(input, other, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_binary('mul'))
 @func_treelize()
 def mul(input, other, *args, **kwargs):
     """
@@ -522,6 +532,7 @@ def mul(input, other, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_binary('div'))
 @func_treelize()
 def div(input, other, *args, **kwargs):
     """
@@ -577,6 +588,7 @@ def div(input, other, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_binary('pow'))
 @func_treelize()
 def pow(input, exponent, *args, **kwargs):
     """
@@ -633,6 +645,7 @@ def pow(input, exponent, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_unary('neg'))
 @func_treelize()
 def neg(input, *args, **kwargs):
     """
@@ -672,6 +685,7 @@ def neg(input, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_unary('neg', inplace=True), inplace=True)
 @return_self
 @func_treelize()
 def neg_(input):
@@ -716,6 +730,7 @@ def neg_(input):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_unary('exp'))
 @func_treelize()
 def exp(input, *args, **kwargs):
     """
@@ -744,6 +759,7 @@ def exp(input, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_unary('exp', inplace=True), inplace=True)
 @return_self
 @func_treelize()
 def exp_(input):
@@ -838,6 +854,7 @@ def exp2_(input):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_unary('sqrt'))
 @func_treelize()
 def sqrt(input, *args, **kwargs):
     """
@@ -866,6 +883,7 @@ def sqrt(input, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins
 @doc_from_base()
+@foreach_dispatch(foreach_unary('sqrt', inplace=True), inplace=True)
 @return_self
 @func_treelize()
 def sqrt_(input):
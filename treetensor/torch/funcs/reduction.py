@@ -3,8 +3,7 @@ from hbutils.reflection import post_process
 from treevalue import TreeValue
 
 from .base import doc_from_base, func_treelize, auto_tensor
-from ..base import rmreduce, post_reduce, auto_reduce
-from ...common import Object
+from ..base import rmreduce, post_reduce, auto_reduce, scope_amax, scope_amin
 
 __all__ = [
     'all', 'any',
@@ -14,8 +13,7 @@ __all__ = [
 
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
-@post_reduce(torch.all)
-@func_treelize(return_type=Object)
+@post_reduce(torch.all, stream=True)
 def _all_r(input, *args, **kwargs):
     return input
 
@@ -28,7 +26,7 @@ def _all_nr(input, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
 @doc_from_base()
-@auto_reduce(_all_r, _all_nr)
+@auto_reduce(_all_r, _all_nr, sfunc=torch.all)
 def all(input, *args, reduce=None, **kwargs):
     """
     In ``treetensor``, you can get the ``all`` result of a whole tree with this function.
@@ -63,8 +61,7 @@ def all(input, *args, reduce=None, **kwargs):
 
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
-@post_reduce(torch.any)
-@func_treelize(return_type=Object)
+@post_reduce(torch.any, stream=True)
 def _any_r(input, *args, **kwargs):
     return input
 
@@ -77,7 +74,7 @@ def _any_nr(input, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
 @doc_from_base()
-@auto_reduce(_any_r, _any_nr)
+@auto_reduce(_any_r, _any_nr, sfunc=torch.any)
 def any(input, *args, reduce=None, **kwargs):
     """
     In ``treetensor``, you can get the ``any`` result of a whole tree with this function.
@@ -111,8 +108,7 @@ def any(input, *args, reduce=None, **kwargs):
 
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
-@post_reduce(torch.min)
-@func_treelize(return_type=Object)
+@post_reduce(torch.min, stream=True)
 def _min_r(input, *args, **kwargs):
     return input
 
@@ -126,7 +122,7 @@ def _min_nr(input, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
 @doc_from_base()
-@auto_reduce(_min_r, _min_nr)
+@auto_reduce(_min_r, _min_nr, sfunc=scope_amin)
 def min(input, *args, reduce=None, **kwargs):
     """
     In ``treetensor``, you can get the ``min`` result of a whole tree with this function.
@@ -173,8 +169,7 @@ def min(input, *args, reduce=None, **kwargs):
 
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
-@post_reduce(torch.max)
-@func_treelize(return_type=Object)
+@post_reduce(torch.max, stream=True)
 def _max_r(input, *args, **kwargs):
     return input
 
@@ -188,7 +183,7 @@ def _max_nr(input, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
 @doc_from_base()
-@auto_reduce(_max_r, _max_nr)
+@auto_reduce(_max_r, _max_nr, sfunc=scope_amax)
 def max(input, *args, reduce=None, **kwargs):
     """
     In ``treetensor``, you can get the ``max`` result of a whole tree with this function.
@@ -235,8 +230,7 @@ def max(input, *args, reduce=None, **kwargs):
 
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
-@post_reduce(torch.sum)
-@func_treelize(return_type=Object)
+@post_reduce(torch.sum, stream=True)
 def _sum_r(input, *args, **kwargs):
     return input
 
@@ -249,7 +243,7 @@ def _sum_nr(input, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
 @doc_from_base()
-@auto_reduce(_sum_r, _sum_nr)
+@auto_reduce(_sum_r, _sum_nr, sfunc=torch.sum)
 def sum(input, *args, reduce=None, **kwargs):
     """
     In ``treetensor``, you can get the ``sum`` result of a whole tree with this function.
@@ -289,8 +283,7 @@ def sum(input, *args, reduce=None, **kwargs):
 
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
-@post_reduce(torch.mean)
-@func_treelize(return_type=Object)
+@post_reduce(torch.mean, stream=True)
 def _mean_r(input, *args, **kwargs):
     return input
 
@@ -303,7 +296,7 @@ def _mean_nr(input, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
 @doc_from_base()
-@auto_reduce(_mean_r, _mean_nr)
+@auto_reduce(_mean_r, _mean_nr, sfunc=torch.mean)
 def mean(input, *args, reduce=None, **kwargs):
     """
     Returns the mean value of all elements in the ``input`` tensor.
@@ -349,8 +342,7 @@ def mean(input, *args, reduce=None, **kwargs):
 
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
-@post_reduce(torch.std)
-@func_treelize(return_type=Object)
+@post_reduce(torch.std, stream=True)
 def _std_r(input, *args, **kwargs):
     return input
 
@@ -363,7 +355,7 @@ def _std_nr(input, *args, **kwargs):
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
 @doc_from_base()
-@auto_reduce(_std_r, _std_nr)
+@auto_reduce(_std_r, _std_nr, sfunc=torch.std)
 def std(input, *args, reduce=None, **kwargs):
     """
     Returns the standard-deviation of all elements in the ``input`` tensor.
@@ -409,8 +401,7 @@ def std(input, *args, reduce=None, **kwargs):
 
 
 # noinspection PyShadowingBuiltins,PyUnusedLocal
-@rmreduce()
-@func_treelize(return_type=Object)
+@rmreduce(stream=True)
 def _masked_select_r(input, mask, *args, **kwargs):
     return torch.masked_select(input, mask, *args, **kwargs)
 
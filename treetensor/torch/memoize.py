@@ -0,0 +1,265 @@
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict, namedtuple
+from functools import wraps
+from typing import Optional
+
+import torch
+from treevalue import TreeValue, flatten
+
+from .memory import _storage_key
+
+__all__ = [
+    'memoize',
+]
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize', 'nbytes'])
+
+_KEY_MODES = ('identity', 'structure', 'content')
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+def _content_digest(t: torch.Tensor) -> bytes:
+    data = t.detach().cpu().contiguous().reshape(-1).view(torch.uint8)
+    return hashlib.blake2b(data.numpy().tobytes(), digest_size=16).digest()
+
+
+def _leaf_key(x, mode, leaves):
+    if torch.is_tensor(x):
+        leaves.append(x)
+        if mode == 'identity':
+            return 'id', id(x)
+        elif mode == 'structure':
+            return 'meta', tuple(x.shape), x.dtype, x.device
+        else:
+            return 'content', tuple(x.shape), x.dtype, x.device, _content_digest(x)
+    else:
+        try:
+            hash(x)
+        except TypeError:
+            raise _Uncacheable
+        return 'value', type(x), x
+
+
+def _arg_key(x, mode, leaves):
+    if isinstance(x, TreeValue):
+        return type(x), tuple((path, _leaf_key(value, mode, leaves)) for path, value in flatten(x))
+    elif isinstance(x, (tuple, list)):
+        return type(x), tuple(_arg_key(item, mode, leaves) for item in x)
+    elif isinstance(x, dict):
+        try:
+            items = sorted(x.items(), key=lambda item: item[0])
+        except TypeError:  # keys can not be ordered, such as mixed ints and strings
+            raise _Uncacheable
+        return type(x), tuple((k, _arg_key(v, mode, leaves)) for k, v in items)
+    else:
+        return _leaf_key(x, mode, leaves)
+
+
+def _result_tensors(x):
+    if torch.is_tensor(x):
+        yield x
+    elif isinstance(x, TreeValue):
+        for _, value in flatten(x):
+            yield from _result_tensors(value)
+    elif isinstance(x, (tuple, list)):
+        for item in x:
+            yield from _result_tensors(item)
+    elif isinstance(x, dict):
+        for item in x.values():
+            yield from _result_tensors(item)
+
+
+def _is_alias(value, leaves) -> bool:
+    storages = {_storage_key(None, leaf)[0] for leaf in leaves}
+    return any(_storage_key(None, t)[0] in storages for t in _result_tensors(value))
+
+
+def _result_nbytes(x) -> int:
+    if torch.is_tensor(x):
+        return x.numel() * x.element_size()
+    elif isinstance(x, TreeValue):
+        return sum(_result_nbytes(value) for _, value in flatten(x))
+    elif isinstance(x, (tuple, list)):
+        return sum(_result_nbytes(item) for item in x)
+    elif isinstance(x, dict):
+        return sum(_result_nbytes(item) for item in x.values())
+    else:
+        return 0
+
+
+class _CacheEntry:
+    __slots__ = ('value', 'weak', 'nbytes', 'versions', 'refs')
+
+    def __init__(self, value, weak, nbytes, versions):
+        self.value = value
+        self.weak = weak
+        self.nbytes = nbytes
+        self.versions = versions
+        self.refs = ()
+
+    def get(self):
+        return self.value() if self.weak else self.value
+
+
+class _MemoizeCache:
+    def __init__(self, maxsize: Optional[int], maxbytes: Optional[int], mode: str):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry.nbytes
+
+    def _evict_by_ref(self, key, entry):
+        def _callback(_):
+            with self._lock:
+                if self._entries.get(key, None) is entry:
+                    self._drop(key)
+
+        return _callback
+
+    def lookup(self, key, leaves):
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            elif self.mode == 'identity' and entry.versions != tuple(leaf._version for leaf in leaves):
+                # one of the inputs has been modified in-place since the result was cached
+                self._drop(key)
+                self.misses += 1
+                return False, None
+
+            value = entry.get()
+            if entry.weak and value is None:
+                self._drop(key)
+                self.misses += 1
+                return False, None
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+
+    def store(self, key, leaves, value):
+        nbytes = _result_nbytes(value)
+        if self.maxbytes is not None and nbytes > self.maxbytes:
+            return
+
+        if self.mode == 'identity':
+            # a result sharing memory with the inputs keeps them alive, so it is only referenced weakly,
+            # otherwise the entry would never be dropped when the inputs are released
+            weak = _is_alias(value, leaves)
+            entry = _CacheEntry(value, weak, nbytes, tuple(leaf._version for leaf in leaves))
+            if weak:
+                try:
+                    entry.value = weakref.ref(value, self._evict_by_ref(key, entry))
+                except TypeError:  # such as tuples and lists
+                    return
+            entry.refs = tuple(weakref.ref(leaf, self._evict_by_ref(key, entry)) for leaf in leaves)
+        else:
+            entry = _CacheEntry(value, False, nbytes, ())
+
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            self.nbytes += nbytes
+            while self._entries and (
+                    (self.maxsize is not None and len(self._entries) > self.maxsize) or
+                    (self.maxbytes is not None and self.nbytes > self.maxbytes)
+            ):
+                self._drop(next(iter(self._entries)))
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries), self.nbytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits, self.misses, self.nbytes = 0, 0, 0
+
+
+def memoize(maxsize: Optional[int] = 128, key: str = 'identity', maxbytes: Optional[int] = None):
+    """
+    Overview:
+        Cache the outputs of a function whose arguments are tree tensors, \
+        least recently used results are evicted first.
+
+    Arguments:
+        - maxsize (:obj:`Optional[int]`): Max number of cached results, ``None`` means unlimited, \
+            default is ``128``.
+        - key (:obj:`str`): How the tensors in the arguments are keyed, default is ``identity``.
+
+            - ``identity``: Same tensor objects. Entries are dropped when the tensors are released, \
+                and are invalidated when the tensors are modified in-place. Results sharing memory \
+                with the tensors (such as views) are only kept while they are referenced elsewhere.
+            - ``structure``: Same tree structures, shapes, dtypes and devices. The values of the tensors \
+                are ignored, suitable for functions like mask builders.
+            - ``content``: Same tree structures, shapes, dtypes, devices and values.
+
+        - maxbytes (:obj:`Optional[int]`): Max total bytes of the tensors in the cached results, \
+            based on ``numel() * element_size()``, ``None`` means unlimited, default is ``None``.
+
+    Returns:
+        - decorator: Decorator for the function. The decorated function has ``cache_info()`` \
+            and ``cache_clear()`` just like :func:`functools.lru_cache`.
+
+    Examples::
+
+        >>> import treetensor.torch as ttorch
+        >>> @ttorch.memoize(maxsize=16, key='content')
+        ... def feature(obs):
+        ...     return (obs ** 2).sum(dim=-1)
+        >>> obs = ttorch.randn({'a': (4, 3), 'b': {'x': (4, 5)}})
+        >>> feature(obs) is feature(ttorch.clone(obs))
+        True
+        >>> feature.cache_info()
+        CacheInfo(hits=1, misses=1, maxsize=16, currsize=1, nbytes=32)
+
+    .. note::
+        The cached result is returned as is, do not modify it in-place.
+        Arguments which are not hashable (except dicts, lists and tuples) or dicts whose keys can not be \
+        sorted make the call bypass the cache.
+    """
+    if callable(maxsize) and not isinstance(maxsize, int):  # used as @memoize
+        return memoize()(maxsize)
+    if key not in _KEY_MODES:
+        raise ValueError(f'Unknown key mode for memoize - {key!r}, {"/".join(_KEY_MODES)} expected.')
+
+    def _decorator(func):
+        cache = _MemoizeCache(maxsize, maxbytes, key)
+
+        @wraps(func)
+        def _new_func(*args, **kwargs):
+            leaves = []
+            try:
+                _key = (
+                    tuple(_arg_key(arg, key, leaves) for arg in args),
+                    tuple((k, _arg_key(v, key, leaves)) for k, v in sorted(kwargs.items())),
+                )
+            except _Uncacheable:
+                return func(*args, **kwargs)
+
+            found, value = cache.lookup(_key, leaves)
+            if not found:
+                value = func(*args, **kwargs)
+                cache.store(_key, leaves, value)
+            return value
+
+        _new_func.cache_info = cache.info
+        _new_func.cache_clear = cache.clear
+        return _new_func
+
+    return _decorator
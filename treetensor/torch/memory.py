@@ -0,0 +1,404 @@
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from treevalue import TreeValue, flatten
+
+from ..profiler.hooks import _PROFILES
+
+__all__ = [
+    'MemoryReport', 'memory_summary',
+    'MemoryTracker',
+]
+
+
+def _format_bytes(n: int) -> str:
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(n) < 1024 or unit == 'GiB':
+            return f'{n} {unit}' if unit == 'B' else f'{n:.2f} {unit}'
+        n /= 1024
+
+
+def _path_name(path) -> str:
+    return '.'.join(map(str, path))
+
+
+def _tensor_leaves(tree):
+    if isinstance(tree, TreeValue):
+        return [(path, value) for path, value in flatten(tree) if torch.is_tensor(value)]
+    elif torch.is_tensor(tree):
+        return [((), tree)]
+    else:
+        return []
+
+
+_HAS_UNTYPED_STORAGE = hasattr(torch.Tensor, 'untyped_storage')  # torch>=2.0
+
+
+def _storage_key(path, tensor: torch.Tensor):
+    if _HAS_UNTYPED_STORAGE:
+        storage = tensor.untyped_storage()
+        ptr, nbytes = storage.data_ptr(), storage.nbytes()
+    else:
+        storage = tensor.storage()
+        ptr, nbytes = storage.data_ptr(), storage.size() * storage.element_size()
+
+    if ptr == 0:  # no data, such as the meta tensors, so the storages can not be identified
+        return ('leaf', path), nbytes
+    return (tensor.device, ptr), nbytes
+
+
+def _view_range(tensor: torch.Tensor) -> Optional[Tuple[int, int]]:
+    if tensor.numel() == 0:
+        return None
+    size = tensor.element_size()
+    span = 1 + sum((n - 1) * abs(s) for n, s in zip(tensor.shape, tensor.stride()))
+    start = tensor.storage_offset() * size
+    return start, start + span * size
+
+
+def _union_size(ranges) -> int:
+    total, end = 0, None
+    for start, stop in sorted(ranges):
+        if end is None or start >= end:
+            total += stop - start
+            end = stop
+        elif stop > end:
+            total += stop - end
+            end = stop
+    return total
+
+
+class StorageMemory:
+    """
+    Overview:
+        One storage referenced by the leaves.
+
+        - ``nbytes``: Size of the storage, which is kept alive by the leaves.
+        - ``used_bytes``: Bytes viewed by the leaves.
+        - ``paths``: Paths of the leaves on this storage.
+    """
+
+    def __init__(self, device: torch.device, nbytes: int, used_bytes: int, paths: List[str]):
+        self.device = device
+        self.nbytes = nbytes
+        self.used_bytes = used_bytes
+        self.paths = paths
+
+    @property
+    def unused_bytes(self) -> int:
+        """
+        Bytes of the storage not viewed by any leaf, such as the rest of a large tensor sliced by a view.
+        """
+        return self.nbytes - self.used_bytes
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.device}, nbytes: {self.nbytes}, used: {self.used_bytes}, ' \
+               f'paths: {self.paths!r}>'
+
+
+class SubtreeMemory:
+    """
+    Overview:
+        Memory of a subtree, ``logical_bytes`` is the total size of the leaves, \
+        while ``storage_bytes`` is the total size of the storages kept alive by the leaves, \
+        the storages shared by the leaves are counted only once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.leaves = 0
+        self.logical_bytes = 0
+        self.storage_bytes = 0
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.path!r}, leaves: {self.leaves}, ' \
+               f'logical: {self.logical_bytes}, storage: {self.storage_bytes}>'
+
+
+class MemoryReport:
+    """
+    Overview:
+        Memory report of a tree, see :func:`memory_summary`.
+    """
+
+    def __init__(self, subtrees: Dict[str, SubtreeMemory], storages: List[StorageMemory]):
+        self.subtrees = subtrees
+        self.storages = storages
+
+    @property
+    def logical_bytes(self) -> int:
+        """
+        Total size of the leaves, which is the same as :attr:`treetensor.torch.Tensor.nbytes`.
+        """
+        return self.subtrees[''].logical_bytes
+
+    @property
+    def storage_bytes(self) -> int:
+        """
+        Total size of the storages kept alive by the tree.
+        """
+        return sum(s.nbytes for s in self.storages)
+
+    @property
+    def devices(self) -> Dict[str, int]:
+        """
+        Storage bytes on each device.
+        """
+        result = {}
+        for s in self.storages:
+            result[str(s.device)] = result.get(str(s.device), 0) + s.nbytes
+        return result
+
+    @property
+    def shared(self) -> List[StorageMemory]:
+        """
+        Storages shared by multiple leaves, such as the duplicated references and the views of the same tensor.
+        """
+        return [s for s in self.storages if len(s.paths) > 1]
+
+    @property
+    def views(self) -> List[StorageMemory]:
+        """
+        Storages which are not fully used by the leaves, sorted by the unused bytes.
+        """
+        return sorted([s for s in self.storages if s.unused_bytes > 0], key=lambda s: -s.unused_bytes)
+
+    def __str__(self):
+        lines = [
+            f'Logical bytes: {_format_bytes(self.logical_bytes)}, '
+            f'storage bytes: {_format_bytes(self.storage_bytes)}, storages: {len(self.storages)}',
+            'Devices:',
+            *(f'  {device}: {_format_bytes(n)}' for device, n in sorted(self.devices.items())),
+            'Subtrees:',
+        ]
+        width = max(len(path or '<root>') for path in self.subtrees) + 2
+        for path, s in sorted(self.subtrees.items()):
+            lines.append(f'  {path or "<root>":<{width}}{s.leaves:>6} leaves  '
+                         f'logical {_format_bytes(s.logical_bytes):>12}  storage {_format_bytes(s.storage_bytes):>12}')
+        if self.views:
+            lines.append('Storages kept alive by views:')
+            for s in self.views:
+                lines.append(f'  {_format_bytes(s.unused_bytes)} unused of {_format_bytes(s.nbytes)} '
+                             f'on {s.device}: {", ".join(s.paths)}')
+        if self.shared:
+            lines.append('Shared storages:')
+            for s in self.shared:
+                lines.append(f'  {_format_bytes(s.nbytes)} on {s.device}: {", ".join(s.paths)}')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} logical: {self.logical_bytes}, storage: {self.storage_bytes}, ' \
+               f'storages: {len(self.storages)}>'
+
+
+def memory_summary(input) -> MemoryReport:
+    """
+    Overview:
+        Report the memory of a tree, the storages of the leaves are identified, so the bytes kept alive \
+        by the views (such as a small slice of a large tensor) and the storages shared by multiple leaves \
+        can be found.
+
+    Arguments:
+        - input: Tree of tensors, the leaves which are not tensors are ignored.
+
+    Returns:
+        - report: :class:`MemoryReport` of the tree, with the bytes of each subtree, the storages \
+            and the devices.
+
+    Examples::
+
+        >>> import torch
+        >>> import treetensor.torch as ttorch
+        >>> big = torch.zeros(1024, 1024)
+        >>> t = ttorch.Tensor({'a': big[:2], 'b': {'x': torch.zeros(3), 'y': big[2:4]}})
+        >>> print(ttorch.memory_summary(t))
+        Logical bytes: 16.01 KiB, storage bytes: 4.00 MiB, storages: 2
+        Devices:
+          cpu: 4.00 MiB
+        Subtrees:
+          <root>       3 leaves  logical    16.01 KiB  storage     4.00 MiB
+          a            1 leaves  logical     8.00 KiB  storage     4.00 MiB
+          b            2 leaves  logical     8.01 KiB  storage     4.00 MiB
+          b.x          1 leaves  logical         12 B  storage         12 B
+          b.y          1 leaves  logical     8.00 KiB  storage     4.00 MiB
+        Storages kept alive by views:
+          3.98 MiB unused of 4.00 MiB on cpu: a, b.y
+        Shared storages:
+          4.00 MiB on cpu: a, b.y
+    """
+    storages, ranges, leaf_keys = {}, {}, []
+    subtrees = {'': SubtreeMemory('')}
+    for path, tensor in _tensor_leaves(input):
+        key, storage_nbytes = _storage_key(path, tensor)
+        if key not in storages:
+            storages[key] = StorageMemory(tensor.device, storage_nbytes, 0, [])
+            ranges[key] = []
+        storages[key].paths.append(_path_name(path))
+        r = _view_range(tensor)
+        if r is not None:
+            ranges[key].append(r)
+
+        nbytes = tensor.numel() * tensor.element_size()
+        for i in range(len(path) + 1):
+            name = _path_name(path[:i])
+            if name not in subtrees:
+                subtrees[name] = SubtreeMemory(name)
+            subtrees[name].leaves += 1
+            subtrees[name].logical_bytes += nbytes
+        leaf_keys.append((path, key))
+
+    for key, s in storages.items():
+        s.used_bytes = min(_union_size(ranges[key]), s.nbytes)
+        s.paths.sort()
+
+    counted = {name: set() for name in subtrees}
+    for path, key in leaf_keys:
+        for i in range(len(path) + 1):
+            name = _path_name(path[:i])
+            if key not in counted[name]:
+                counted[name].add(key)
+                subtrees[name].storage_bytes += storages[key].nbytes
+
+    return MemoryReport(subtrees, list(storages.values()))
+
+
+class AllocationStats:
+    """
+    Overview:
+        Allocation statistics of one tree function recorded by :class:`MemoryTracker`.
+
+        - ``new_bytes``: Bytes of the storages in the results which are not in the arguments.
+        - ``peak_bytes``: Max increase of the peak of the cuda allocator in one call, \
+            relative to the allocated bytes before the call.
+        - ``peak_raises``: Number of the calls which raised the peak of the cuda allocator.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.new_bytes = 0
+        self.peak_bytes = 0
+        self.peak_raises = 0
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.name!r}, calls: {self.calls}, ' \
+               f'new: {self.new_bytes}, peak: {self.peak_bytes}>'
+
+
+def _storage_keys(items) -> set:
+    keys = set()
+    for item in items:
+        for path, tensor in _tensor_leaves(item):
+            key, _ = _storage_key(path, tensor)
+            keys.add(key)
+    return keys
+
+
+class MemoryTracker:
+    """
+    Overview:
+        Opt-in tracker attributing the allocations to the tree functions, \
+        based on the hooks of :mod:`treetensor.profiler`.
+
+        For each call of the tree functions, the storages in the result which are not in the arguments \
+        are counted as new bytes. When cuda is available, the increase of \
+        :func:`torch.cuda.max_memory_allocated` in the call is recorded as well, so the functions \
+        raising the peak memory can be found.
+
+    Examples::
+
+        >>> import treetensor.torch as ttorch
+        >>> with ttorch.MemoryTracker() as tracker:
+        ...     loss = learner.train(batch)
+        >>> tracker.print_stats(limit=10)
+
+    .. note::
+        The arguments and the results of each call are scanned, so it is much slower than \
+        :class:`treetensor.profiler.Profile`, and should only be used for debugging.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, AllocationStats] = {}
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._cuda = torch.cuda.is_available()
+
+    def start(self) -> 'MemoryTracker':
+        if self not in _PROFILES:
+            _PROFILES.append(self)
+        return self
+
+    def stop(self) -> 'MemoryTracker':
+        if self in _PROFILES:
+            _PROFILES.remove(self)
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _enter(self, frame, args, kwargs):
+        if self._cuda:
+            cuda = torch.cuda.memory_allocated(), torch.cuda.max_memory_allocated()
+        else:
+            cuda = None
+        self._snapshots[id(frame)] = (_storage_keys((*args, *kwargs.values())), cuda)
+
+    def _add(self, frame, start: float, total: float, result):
+        snapshot = self._snapshots.pop(id(frame), None)
+        if snapshot is None:  # started inside the call
+            return
+        inputs, cuda = snapshot
+
+        new_bytes = 0
+        for path, tensor in _tensor_leaves(result):
+            key, nbytes = _storage_key(path, tensor)
+            if key not in inputs:
+                inputs.add(key)
+                new_bytes += nbytes
+
+        peak = 0
+        if cuda is not None:
+            allocated, max_allocated = cuda
+            current_max = torch.cuda.max_memory_allocated()
+            if current_max > max_allocated:
+                peak = current_max - allocated
+
+        with self._lock:
+            stats = self._stats.get(frame.name, None)
+            if stats is None:
+                stats = AllocationStats(frame.name)
+                self._stats[frame.name] = stats
+            stats.calls += 1
+            stats.new_bytes += new_bytes
+            if peak:
+                stats.peak_raises += 1
+                stats.peak_bytes = max(stats.peak_bytes, peak)
+
+    @property
+    def stats(self) -> Dict[str, AllocationStats]:
+        """
+        Allocation statistics of the functions, the keys are the full names of them.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def print_stats(self, limit: Optional[int] = None, file=None):
+        """
+        Overview:
+            Print the statistics sorted by the peak bytes and the new bytes.
+
+        Arguments:
+            - limit (:obj:`Optional[int]`): Max number of the rows, default is ``None`` which means no limit.
+            - file: Output file, default is ``None`` which means ``sys.stdout``.
+        """
+        file = file if file is not None else sys.stdout
+        items = sorted(self.stats.values(), key=lambda s: (-s.peak_bytes, -s.new_bytes, s.name))
+        print(f'{"ncalls":>9}{"new":>14}{"peak":>14}{"raises":>8}  function', file=file)
+        for s in items[:limit] if limit is not None else items:
+            print(f'{s.calls:>9}{_format_bytes(s.new_bytes):>14}{_format_bytes(s.peak_bytes):>14}'
+                  f'{s.peak_raises:>8}  {s.name}', file=file)
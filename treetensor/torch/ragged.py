@@ -0,0 +1,323 @@
+from collections.abc import Mapping
+from typing import List, Sequence
+
+import torch
+from torch.nn.utils.rnn import pad_sequence
+from treevalue import TreeValue, flatten, unflatten
+
+from .tensor import Tensor
+from ..common import Object
+
+__all__ = [
+    'pad_stack', 'masked_sum', 'masked_mean',
+    'RaggedTensor', 'ragged_stack',
+]
+
+
+def _flatten_samples(trees):
+    if not trees:
+        raise ValueError('At least 1 tree is required.')
+
+    samples = [flatten(TreeValue(tree) if isinstance(tree, Mapping) else tree) for tree in trees]
+    paths = [path for path, _ in samples[0]]
+    columns = [[] for _ in paths]
+    for i, sample in enumerate(samples):
+        mapping = dict(sample)
+        if len(mapping) != len(paths) or any(p not in mapping for p in paths):
+            raise ValueError(f'The structure of tree #{i} is different from tree #0.')
+        for column, p in zip(columns, paths):
+            column.append(torch.as_tensor(mapping[p]))
+    return paths, columns
+
+
+def _pad_leaves(values: List[torch.Tensor], pad_value):
+    ndims = {value.dim() for value in values}
+    if len(ndims) != 1:
+        raise ValueError(f'The leaves should have the same number of dimensions, but {sorted(ndims)!r} found.')
+
+    shapes = torch.tensor([tuple(value.shape) for value in values], dtype=torch.long).reshape(len(values), -1)
+    max_shape = shapes.max(dim=0).values if shapes.numel() else torch.zeros(0, dtype=torch.long)
+    ragged = (shapes != max_shape).any(dim=0).nonzero().reshape(-1).tolist()
+    mask_ndim = ragged[-1] + 1 if ragged else 0  # the dims after the last ragged one are not masked
+    max_shape = max_shape.tolist()
+
+    if not ragged:
+        padded = torch.stack(values)
+    elif ragged == [0]:
+        padded = pad_sequence(values, batch_first=True, padding_value=pad_value)
+    else:
+        padded = values[0].new_full((len(values), *max_shape), pad_value)
+        for i, value in enumerate(values):
+            padded[(i, *(slice(0, n) for n in value.shape))] = value
+
+    if not mask_ndim:
+        mask = torch.ones(len(values), dtype=torch.bool, device=padded.device)
+    else:
+        # mask[i, j0, j1, ...] = all(j_k < shape[i][k])
+        mask = torch.ones((len(values), *max_shape[:mask_ndim]), dtype=torch.bool, device=padded.device)
+        for k in range(mask_ndim):
+            pos = torch.arange(max_shape[k], device=padded.device)
+            valid = pos.unsqueeze(0) < shapes[:, k].to(padded.device).unsqueeze(1)
+            mask &= valid.reshape(len(values), *([1] * k), max_shape[k], *([1] * (mask_ndim - k - 1)))
+    return padded, mask
+
+
+def pad_stack(trees: Sequence, pad_value=0, return_mask: bool = True):
+    """
+    Overview:
+        Stack the trees whose leaves have different shapes, the leaves are padded with \
+        ``pad_value`` to the max shape of each key.
+
+    Arguments:
+        - trees: Sequence of the trees, which can be dicts or :class:`treetensor.torch.Tensor`.
+        - pad_value: Value of the padding, default is ``0``.
+        - return_mask (:obj:`bool`): Return the masks of the valid items, default is ``True``. \
+            The shape of a mask is ``(batch, *shape)`` cut after the last dimension with different sizes, \
+            so it is ``(batch, max_length)`` for sequences of features, and ``(batch,)`` when \
+            there is no padding.
+
+    Returns:
+        - padded: Stacked tree tensor, or a tuple of it and the tree of masks when ``return_mask`` is ``True``.
+
+    Examples::
+
+        >>> import torch
+        >>> import treetensor.torch as ttorch
+        >>> padded, mask = ttorch.pad_stack([
+        ...     {'tokens': torch.tensor([1, 2, 3]), 'label': 0},
+        ...     {'tokens': torch.tensor([4]), 'label': 1},
+        ... ])
+        >>> padded.tokens
+        tensor([[1, 2, 3],
+                [4, 0, 0]])
+        >>> mask.tokens
+        tensor([[ True,  True,  True],
+                [ True, False, False]])
+        >>> mask.label
+        tensor([True, True])
+        >>> ttorch.masked_mean(padded, mask)
+        <Tensor 0x7f0c2ee3c2b0>
+        ├── 'label' --> tensor(0.5000)
+        └── 'tokens' --> tensor(2.5000)
+    """
+    paths, columns = _flatten_samples(trees)
+    padded, masks = [], []
+    for column in columns:
+        p, m = _pad_leaves(column, pad_value)
+        padded.append(p)
+        masks.append(m)
+
+    padded = unflatten(zip(paths, padded), return_type=Tensor)
+    if return_mask:
+        return padded, unflatten(zip(paths, masks), return_type=Tensor)
+    else:
+        return padded
+
+
+def _expand_mask(value: torch.Tensor, mask: torch.Tensor) -> torch.Tensor:
+    return mask.reshape(*mask.shape, *([1] * (value.dim() - mask.dim())))
+
+
+def _items(tree):
+    return flatten(tree) if isinstance(tree, TreeValue) else [((), tree)]
+
+
+def _aligned_masks(input, mask):
+    masks = dict(_items(mask))
+    result = []
+    for path, _ in _items(input):
+        if path not in masks:
+            raise KeyError(f'Mask of key {".".join(map(str, path))!r} not found.')
+        result.append(masks[path])
+    return result
+
+
+def _build(input, pairs):
+    if isinstance(input, TreeValue):
+        return unflatten(pairs, return_type=type(input))
+    else:
+        (_, value), = pairs
+        return value
+
+
+def _masked_leaf_sum(value, mask, dim, keepdim):
+    mask = _expand_mask(value, mask)
+    masked = value.masked_fill(~mask, 0)
+    if dim is None:
+        return masked.sum()
+    else:
+        return masked.sum(dim=dim, keepdim=keepdim)
+
+
+def masked_sum(input, mask, dim=None, keepdim: bool = False):
+    """
+    Overview:
+        Sum of the leaves where the masks are ``True``, such as the results of :func:`pad_stack`. \
+        The masks are broadcast on their trailing dimensions.
+
+    Arguments:
+        - input: Tree tensor, or a single tensor.
+        - mask: Tree of boolean masks with the same structure, or a single mask.
+        - dim: Dimensions to be reduced, ``None`` means all the dimensions.
+        - keepdim (:obj:`bool`): Keep the reduced dimensions, default is ``False``.
+
+    Returns:
+        - sum: Tree of sums.
+    """
+    return _build(input, [
+        (path, _masked_leaf_sum(value, m, dim, keepdim))
+        for (path, value), m in zip(_items(input), _aligned_masks(input, mask))
+    ])
+
+
+def masked_mean(input, mask, dim=None, keepdim: bool = False):
+    """
+    Overview:
+        Mean of the leaves where the masks are ``True``, the positions with no valid items are ``nan``.
+
+    Arguments:
+        - input: Tree tensor, or a single tensor.
+        - mask: Tree of boolean masks with the same structure, or a single mask.
+        - dim: Dimensions to be reduced, ``None`` means all the dimensions.
+        - keepdim (:obj:`bool`): Keep the reduced dimensions, default is ``False``.
+
+    Returns:
+        - mean: Tree of means.
+    """
+    results = []
+    for (path, value), m in zip(_items(input), _aligned_masks(input, mask)):
+        if not value.is_floating_point():
+            value = value.float()
+        total = _masked_leaf_sum(value, m, dim, keepdim)
+        count = _masked_leaf_sum(torch.ones_like(value), m, dim, keepdim)
+        results.append((path, total / count))
+    return _build(input, results)
+
+
+class RaggedTensor:
+    """
+    Overview:
+        Ragged leaf which concatenates the items with different lengths of the first dimension \
+        in ``values``, while the item ``i`` is ``values[offsets[i]:offsets[i + 1]]``.
+
+    Arguments:
+        - values (:obj:`torch.Tensor`): Concatenated items.
+        - offsets (:obj:`torch.Tensor`): Offsets of the items, whose length is the number of items plus 1.
+    """
+
+    def __init__(self, values: torch.Tensor, offsets: torch.Tensor):
+        self.values = values
+        self.offsets = torch.as_tensor(offsets, dtype=torch.long)
+
+    @classmethod
+    def from_tensors(cls, tensors: Sequence[torch.Tensor]) -> 'RaggedTensor':
+        """
+        Overview:
+            Create ragged tensor from the items.
+        """
+        tensors = [torch.as_tensor(t) for t in tensors]
+        lengths = torch.tensor([t.shape[0] for t in tensors], dtype=torch.long)
+        offsets = torch.zeros(len(tensors) + 1, dtype=torch.long)
+        torch.cumsum(lengths, dim=0, out=offsets[1:])
+        return cls(torch.cat(tensors), offsets)
+
+    def __len__(self):
+        return self.offsets.shape[0] - 1
+
+    def __getitem__(self, index: int) -> torch.Tensor:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f'Index {index!r} out of range for {len(self)} items.')
+        start, end = self.offsets[index:index + 2].tolist()
+        return self.values[start:end]
+
+    def __repr__(self):
+        return f'<{type(self).__name__} items: {len(self)}, values: {tuple(self.values.shape)}, ' \
+               f'dtype: {self.values.dtype}>'
+
+    @property
+    def lengths(self) -> torch.Tensor:
+        """
+        Lengths of the items.
+        """
+        return self.offsets[1:] - self.offsets[:-1]
+
+    def segment_ids(self) -> torch.Tensor:
+        """
+        Index of the item of each row in ``values``.
+        """
+        return torch.repeat_interleave(
+            torch.arange(len(self), device=self.values.device),
+            self.lengths.to(self.values.device),
+        )
+
+    def to(self, *args, **kwargs) -> 'RaggedTensor':
+        return type(self)(self.values.to(*args, **kwargs), self.offsets)
+
+    def to_padded(self, pad_value=0, return_mask: bool = True):
+        """
+        Overview:
+            Convert to the padded tensor of ``(items, max_length, ...)``.
+        """
+        lengths = self.lengths
+        max_length = int(lengths.max()) if len(self) else 0
+        padded = self.values.new_full((len(self), max_length, *self.values.shape[1:]), pad_value)
+        ids = self.segment_ids()
+        pos = torch.arange(self.values.shape[0], device=self.values.device) - \
+            self.offsets[:-1].to(self.values.device)[ids]
+        padded[ids, pos] = self.values
+        if return_mask:
+            mask = torch.arange(max_length, device=lengths.device).unsqueeze(0) < lengths.unsqueeze(1)
+            return padded, mask.to(self.values.device)
+        else:
+            return padded
+
+    def sum(self) -> torch.Tensor:
+        """
+        Overview:
+            Sum of each item, whose shape is ``(items, ...)``.
+        """
+        result = self.values.new_zeros((len(self), *self.values.shape[1:]))
+        return result.index_add_(0, self.segment_ids(), self.values)
+
+    def mean(self) -> torch.Tensor:
+        """
+        Overview:
+            Mean of each item, the empty items are ``nan``.
+        """
+        lengths = self.lengths.to(self.values.device)
+        total = self.sum()
+        total = total if total.is_floating_point() else total.float()
+        return total / lengths.reshape(-1, *([1] * (total.dim() - 1)))
+
+
+def ragged_stack(trees: Sequence) -> Object:
+    """
+    Overview:
+        Stack the trees to a tree of :class:`RaggedTensor`, the leaves can have \
+        different lengths of the first dimension, and there is no padding.
+
+    Arguments:
+        - trees: Sequence of the trees, which can be dicts or :class:`treetensor.torch.Tensor`.
+
+    Returns:
+        - ragged: :class:`treetensor.common.Object` tree of :class:`RaggedTensor`.
+
+    Examples::
+
+        >>> import torch
+        >>> import treetensor.torch as ttorch
+        >>> r = ttorch.ragged_stack([
+        ...     {'entities': torch.randn(3, 8)},
+        ...     {'entities': torch.randn(5, 8)},
+        ... ])
+        >>> r.entities.lengths
+        tensor([3, 5])
+        >>> r.entities.mean().shape
+        torch.Size([2, 8])
+    """
+    paths, columns = _flatten_samples(trees)
+    return unflatten([
+        (path, RaggedTensor.from_tensors(column)) for path, column in zip(paths, columns)
+    ], return_type=Object)
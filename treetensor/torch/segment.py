@@ -0,0 +1,185 @@
+from typing import Optional
+
+import torch
+from treevalue import TreeValue, flatten, unflatten
+
+__all__ = [
+    'segment_sum', 'segment_mean', 'segment_max',
+]
+
+
+class _SegmentIndex:
+    """
+    Segment ids shared by all the leaves, they are validated and converted only once.
+    """
+
+    def __init__(self, segment_ids, num_segments: Optional[int]):
+        segment_ids = torch.as_tensor(segment_ids)
+        if segment_ids.dim() != 1:
+            raise ValueError(f'1-dim segment ids expected, but {segment_ids.dim()}-dim found.')
+        elif segment_ids.dtype.is_floating_point or segment_ids.dtype.is_complex or segment_ids.dtype == torch.bool:
+            raise ValueError(f'Segment ids should be integers, but {segment_ids.dtype} found.')
+        segment_ids = segment_ids.long()
+
+        if segment_ids.numel() and segment_ids.min() < 0:
+            raise IndexError(f'Segment ids should be non-negative, but {int(segment_ids.min())} found.')
+        if num_segments is None:
+            num_segments = int(segment_ids.max()) + 1 if segment_ids.numel() else 0
+        elif segment_ids.numel() and segment_ids.max() >= num_segments:
+            raise IndexError(f'Segment ids should be in [0, {num_segments}).')
+
+        self.ids = segment_ids
+        self.num_segments = num_segments
+        self._devices = {segment_ids.device: segment_ids}
+        self._counts = {}
+        self._segments = None
+
+    def on(self, device) -> torch.Tensor:
+        if device not in self._devices:
+            self._devices[device] = self.ids.to(device)
+        return self._devices[device]
+
+    def counts(self, device) -> torch.Tensor:
+        if device not in self._counts:
+            self._counts[device] = torch.bincount(self.on(device), minlength=self.num_segments)
+        return self._counts[device]
+
+    def segments(self):
+        """
+        Non-empty segments and their masks, which are used by the reductions without ``scatter_reduce_``.
+        """
+        if self._segments is None:
+            self._segments = [(int(s), self.ids == s) for s in torch.unique(self.ids)]
+        return self._segments
+
+    def check(self, path, leaf: torch.Tensor):
+        if leaf.dim() == 0 or leaf.shape[0] != self.ids.shape[0]:
+            raise ValueError(f'The first dimension of leaf {".".join(map(str, path))!r} should be '
+                             f'{self.ids.shape[0]}, but {tuple(leaf.shape)!r} found.')
+
+
+def _segment_reduce(reduce, tree, segment_ids, num_segments):
+    index = _SegmentIndex(segment_ids, num_segments)
+    items = flatten(tree) if isinstance(tree, TreeValue) else [((), tree)]
+    results = []
+    for path, leaf in items:
+        index.check(path, leaf)
+        results.append((path, reduce(index, leaf)))
+
+    if isinstance(tree, TreeValue):
+        return unflatten(results, return_type=type(tree))
+    else:
+        (_, value), = results
+        return value
+
+
+def _leaf_sum(index: _SegmentIndex, leaf: torch.Tensor) -> torch.Tensor:
+    result = leaf.new_zeros((index.num_segments, *leaf.shape[1:]))
+    return result.index_add_(0, index.on(leaf.device), leaf)
+
+
+def _leaf_mean(index: _SegmentIndex, leaf: torch.Tensor) -> torch.Tensor:
+    if not leaf.is_floating_point():
+        leaf = leaf.float()
+    counts = index.counts(leaf.device)
+    return _leaf_sum(index, leaf) / counts.reshape(-1, *([1] * (leaf.dim() - 1))).to(leaf.dtype)
+
+
+_HAS_SCATTER_REDUCE = hasattr(torch.Tensor, 'scatter_reduce_')  # torch>=1.12
+
+
+def _leaf_max(index: _SegmentIndex, leaf: torch.Tensor) -> torch.Tensor:
+    result = leaf.new_zeros((index.num_segments, *leaf.shape[1:]))
+    if _HAS_SCATTER_REDUCE:
+        ids = index.on(leaf.device).reshape(-1, *([1] * (leaf.dim() - 1))).expand_as(leaf)
+        return result.scatter_reduce_(0, ids, leaf, reduce='amax', include_self=False)
+    else:
+        for segment, mask in index.segments():
+            result[segment] = leaf[mask.to(leaf.device)].max(dim=0)[0]
+        return result
+
+
+def segment_sum(input, segment_ids, num_segments: Optional[int] = None):
+    """
+    Overview:
+        Sum of the first dimension of each leaf by segment, which is ``index_add_`` on the leaves. \
+        The segment ids are converted only once for all the leaves.
+
+    Arguments:
+        - input: Tree tensor (or a single tensor), the first dimension of the leaves is the batch.
+        - segment_ids: 1-dim integer segment ids of the batch.
+        - num_segments (:obj:`Optional[int]`): Number of the segments, default is ``None`` which \
+            means ``max(segment_ids) + 1``.
+
+    Returns:
+        - sum: Tree of the sums, the first dimension of the leaves is ``num_segments``.
+
+    Examples::
+
+        >>> import torch
+        >>> import treetensor.torch as ttorch
+        >>> t = ttorch.Tensor({
+        ...     'reward': torch.tensor([1., 2., 3., 4.]),
+        ...     'obs': torch.tensor([[1, 1], [2, 2], [3, 3], [4, 4]]),
+        ... })
+        >>> ttorch.segment_sum(t, torch.tensor([0, 0, 1, 2]))
+        <Tensor 0x7f0c2ee3c2b0>
+        ├── 'obs' --> tensor([[3, 3],
+        │                     [3, 3],
+        │                     [4, 4]])
+        └── 'reward' --> tensor([3., 3., 4.])
+    """
+    return _segment_reduce(_leaf_sum, input, segment_ids, num_segments)
+
+
+def segment_mean(input, segment_ids, num_segments: Optional[int] = None):
+    """
+    Overview:
+        Mean of the first dimension of each leaf by segment, the empty segments are ``nan``.
+
+    Arguments:
+        - input: Tree tensor (or a single tensor), the first dimension of the leaves is the batch.
+        - segment_ids: 1-dim integer segment ids of the batch.
+        - num_segments (:obj:`Optional[int]`): Number of the segments, default is ``None`` which \
+            means ``max(segment_ids) + 1``.
+
+    Returns:
+        - mean: Tree of the means, the integer leaves are converted to float.
+
+    Examples::
+
+        >>> import torch
+        >>> import treetensor.torch as ttorch
+        >>> t = ttorch.Tensor({'reward': torch.tensor([1., 2., 3., 4.])})
+        >>> ttorch.segment_mean(t, torch.tensor([0, 0, 2, 2]))
+        <Tensor 0x7f0c2ee3c2b0>
+        └── 'reward' --> tensor([1.5000,    nan, 3.5000])
+    """
+    return _segment_reduce(_leaf_mean, input, segment_ids, num_segments)
+
+
+def segment_max(input, segment_ids, num_segments: Optional[int] = None):
+    """
+    Overview:
+        Max of the first dimension of each leaf by segment, which is ``scatter_reduce_`` with ``amax``. \
+        The empty segments are ``0``.
+
+    Arguments:
+        - input: Tree tensor (or a single tensor), the first dimension of the leaves is the batch.
+        - segment_ids: 1-dim integer segment ids of the batch.
+        - num_segments (:obj:`Optional[int]`): Number of the segments, default is ``None`` which \
+            means ``max(segment_ids) + 1``.
+
+    Returns:
+        - max: Tree of the max values.
+
+    Examples::
+
+        >>> import torch
+        >>> import treetensor.torch as ttorch
+        >>> t = ttorch.Tensor({'reward': torch.tensor([1., -2., 3., 4.])})
+        >>> ttorch.segment_max(t, torch.tensor([0, 0, 1, 1]))
+        <Tensor 0x7f0c2ee3c2b0>
+        └── 'reward' --> tensor([1., 4.])
+    """
+    return _segment_reduce(_leaf_max, input, segment_ids, num_segments)
@@ -0,0 +1,167 @@
+import heapq
+import zlib
+from typing import List, Union
+
+import torch
+from treevalue import TreeValue, flatten, unflatten
+
+from ..common import Object
+
+__all__ = [
+    'shard_plan', 'shard', 'shard_like', 'gather_shards',
+]
+
+_POLICIES = ('balance_bytes', 'by_key')
+
+
+def _leaf_nbytes(value) -> int:
+    return value.numel() * value.element_size() if torch.is_tensor(value) else 0
+
+
+def _plan_pairs(items, devices: List[torch.device], policy: str):
+    if policy == 'by_key':
+        return [
+            (path, devices[zlib.crc32('.'.join(map(str, path)).encode()) % len(devices)])
+            for path, _ in items
+        ]
+    else:  # balance_bytes, the largest leaves are placed first on the least loaded device
+        order = sorted(range(len(items)), key=lambda i: (-_leaf_nbytes(items[i][1]), items[i][0]))
+        loads = [(0, index) for index in range(len(devices))]
+        assigned = [None] * len(items)
+        for i in order:
+            load, index = heapq.heappop(loads)
+            assigned[i] = devices[index]
+            heapq.heappush(loads, (load + _leaf_nbytes(items[i][1]), index))
+        return [(path, device) for (path, _), device in zip(items, assigned)]
+
+
+def shard_plan(input, devices: List[Union[str, torch.device]], policy: str = 'balance_bytes') -> Object:
+    """
+    Overview:
+        Get the device of each leaf which is used by :func:`shard`.
+
+    Arguments:
+        - input: Tree of tensors.
+        - devices: Devices to be placed on.
+        - policy (:obj:`str`): Placement policy, default is ``balance_bytes``.
+
+            - ``balance_bytes``: Balance the total bytes of the leaves on each device, \
+                the largest leaves are placed first.
+            - ``by_key``: Assign the devices by the keys of the leaves, so a leaf with the same key \
+                is always placed on the same device.
+
+    Returns:
+        - plan: Tree of :class:`torch.device`.
+
+    Examples::
+
+        >>> import torch
+        >>> import treetensor.torch as ttorch
+        >>> t = ttorch.Tensor({
+        ...     'a': torch.zeros(100),
+        ...     'b': {'x': torch.zeros(60), 'y': torch.zeros(50)},
+        ... })
+        >>> ttorch.shard_plan(t, ['cpu', 'meta'])
+        <Object 0x7f0c2ee3c2b0>
+        ├── 'a' --> device(type='cpu')
+        └── 'b' --> <Object 0x7f0c2ee3c220>
+            ├── 'x' --> device(type='meta')
+            └── 'y' --> device(type='meta')
+    """
+    if policy not in _POLICIES:
+        raise ValueError(f'Unknown shard policy - {policy!r}, {"/".join(_POLICIES)} expected.')
+    devices = [torch.device(device) for device in devices]
+    if not devices:
+        raise ValueError('At least 1 device is required for sharding.')
+
+    return unflatten(_plan_pairs(flatten(input), devices, policy), return_type=Object)
+
+
+def _place(input, plan_pairs, non_blocking):
+    devices = dict(plan_pairs)
+    return unflatten([
+        (path, value.to(devices[path], non_blocking=non_blocking) if torch.is_tensor(value) else value)
+        for path, value in flatten(input)
+    ], return_type=type(input))
+
+
+def shard(input, devices: List[Union[str, torch.device]], policy: str = 'balance_bytes',
+          non_blocking: bool = False):
+    """
+    Overview:
+        Place the leaves of the tree on different devices, such as multiple gpus, while \
+        the tree is still a single tree tensor. The following operations are executed \
+        on the devices of the leaves.
+
+    Arguments:
+        - input: Tree of tensors.
+        - devices: Devices to be placed on.
+        - policy (:obj:`str`): Placement policy, see :func:`shard_plan`, default is ``balance_bytes``.
+        - non_blocking (:obj:`bool`): Copy the leaves asynchronously, default is ``False``.
+
+    Returns:
+        - sharded: Sharded tree tensor.
+
+    Examples::
+
+        >>> import treetensor.torch as ttorch
+        >>> t = ttorch.randn({'obs': (4096, 512), 'feat': (4096, 256), 'reward': (4096,)})
+        >>> st = ttorch.shard(t, ['cuda:0', 'cuda:1'])
+        >>> st.device
+        <Object 0x7f0c2ee3c2b0>
+        ├── 'feat' --> device(type='cuda', index=1)
+        ├── 'obs' --> device(type='cuda', index=0)
+        └── 'reward' --> device(type='cuda', index=1)
+        >>> ttorch.gather_shards(st * 2, 'cuda:0')  # all the leaves are on cuda:0
+
+    .. note::
+        The operands of the binary operations should be placed on the same devices, \
+        which can be done with :func:`shard_like`.
+    """
+    plan = flatten(shard_plan(input, devices, policy))
+    return _place(input, plan, non_blocking)
+
+
+def shard_like(input, other, non_blocking: bool = False):
+    """
+    Overview:
+        Place the leaves of ``input`` on the devices of the leaves with the same keys in ``other``.
+
+    Arguments:
+        - input: Tree of tensors.
+        - other: Tree of tensors with the same structure, such as the result of :func:`shard`.
+        - non_blocking (:obj:`bool`): Copy the leaves asynchronously, default is ``False``.
+
+    Returns:
+        - sharded: Sharded tree tensor.
+    """
+    devices = {path: value.device for path, value in flatten(other) if torch.is_tensor(value)}
+    plan = []
+    for path, _ in flatten(input):
+        if path not in devices:
+            raise KeyError(f'Key {".".join(map(str, path))!r} not found in the reference tree.')
+        plan.append((path, devices[path]))
+    return _place(input, plan, non_blocking)
+
+
+def gather_shards(input, device: Union[str, torch.device] = 'cpu', non_blocking: bool = False):
+    """
+    Overview:
+        Bring all the leaves of a sharded tree back to one device.
+
+    Arguments:
+        - input: Tree of tensors.
+        - device: Target device, default is ``cpu``.
+        - non_blocking (:obj:`bool`): Copy the leaves asynchronously, default is ``False``.
+
+    Returns:
+        - gathered: Tree tensor on ``device``.
+
+    .. note::
+        It is not named ``gather`` because :func:`treetensor.torch.gather` is :func:`torch.gather` \
+        on the leaves.
+    """
+    device = torch.device(device)
+    if not isinstance(input, TreeValue):
+        return input.to(device, non_blocking=non_blocking)
+    return _place(input, [(path, device) for path, _ in flatten(input)], non_blocking)
@@ -1,13 +1,17 @@
+import itertools
 from functools import wraps
+from numbers import Integral
+from typing import List, Tuple
 
+import numpy as np
 import torch
 from hbutils.reflection import post_process
-from treevalue import TreeValue
+from treevalue import TreeValue, flatten, unflatten
 from treevalue import func_treelize as original_func_treelize
 from treevalue.tree.common import TreeStorage
 
 from .base import Torch
-from ..common import Object, clsmeta, ireduce
+from ..common import Object, clsmeta, ireduce, tree_cache
 from ..utils import doc_from_base as original_doc_from_base
 from ..utils import replaceable_partial, current_names, args_mapping
 
@@ -44,6 +48,51 @@ def _post_index(func):
     return _new_func
 
 
+class _SizeTable:
+    """
+    Compact table of the sizes in a tree.
+
+    Each row is a leaf, ``ndims`` is the dimension count of the sizes, ``dims`` is the
+    left-aligned int64 matrix of the sizes padded with ``1``.
+    """
+
+    def __init__(self, paths: List[Tuple[str, ...]], sizes: List[torch.Size]):
+        self.paths = paths
+        self.ndims = np.fromiter(map(len, sizes), dtype=np.int64, count=len(sizes))
+        width = int(self.ndims.max()) if len(sizes) else 0
+        self.valid = np.arange(width, dtype=np.int64) < self.ndims[:, None]
+        self.dims = np.ones((len(sizes), width), dtype=np.int64)
+        self.dims[self.valid] = np.fromiter(itertools.chain.from_iterable(sizes),
+                                            dtype=np.int64, count=int(self.ndims.sum()))
+
+    @classmethod
+    def from_tree(cls, tree) -> '_SizeTable':
+        paths, sizes = [], []
+        for path, value in sorted(flatten(tree), key=lambda x: x[0]):
+            paths.append(path)
+            sizes.append(value)
+        return cls(paths, sizes)
+
+    def right_aligned(self, width: int) -> np.ndarray:
+        cols = np.arange(width, dtype=np.int64) - (width - self.ndims[:, None])
+        rows = np.broadcast_to(np.arange(len(self.paths))[:, None], cols.shape)
+        return np.where(cols >= 0, self.dims[rows, np.clip(cols, 0, None)], 1) \
+            if self.dims.shape[1] else np.ones((len(self.paths), width), dtype=np.int64)
+
+    def tree(self, values, return_type):
+        return unflatten(zip(self.paths, values), return_type=return_type)
+
+
+def _to_size_table(other, table: _SizeTable) -> _SizeTable:
+    if isinstance(other, Size):
+        return other._Size__table()  # not mangled out of the class
+    elif isinstance(other, (TreeValue, dict)):
+        return _SizeTable.from_tree(Size(other))
+    else:  # one size for all the leaves
+        size = torch.Size(other)
+        return _SizeTable(table.paths, [size] * len(table.paths))
+
+
 # noinspection PyTypeChecker
 @current_names()
 class Size(Torch, metaclass=clsmeta(torch.Size, allow_dict=True)):
@@ -71,10 +120,12 @@ class Size(Torch, metaclass=clsmeta(torch.Size, allow_dict=True)):
         """
         super(Torch, self).__init__(data)
 
+    @tree_cache
+    def __table(self) -> _SizeTable:
+        return _SizeTable.from_tree(self)
+
     @doc_from_base()
-    @ireduce(sum)
-    @func_treelize(return_type=Object)
-    def numel(self: torch.Size) -> Object:
+    def numel(self) -> int:
         """
         Get the numel sum of the sizes in this tree.
 
@@ -88,12 +139,18 @@ class Size(Torch, metaclass=clsmeta(torch.Size, allow_dict=True)):
             ... }).numel()
             26
         """
-        return self.numel()
+        return int(self.__table().dims.prod(axis=1).sum())
 
-    @doc_from_base()
     @_post_index
     @func_treelize(return_type=Object)
-    def index(self: torch.Size, value, *args, **kwargs) -> Object:
+    def __index(self: torch.Size, value, *args, **kwargs):
+        try:
+            return self.index(value, *args, **kwargs)
+        except ValueError:
+            return None
+
+    @doc_from_base()
+    def index(self, value, *args, **kwargs) -> Object:
         """
 
         Example::
@@ -117,15 +174,23 @@ class Size(Torch, metaclass=clsmeta(torch.Size, allow_dict=True)):
             No :class:`ValueError` will be raised unless the value can not be found
             in any of the sizes, instead there will be nones returned in the tree.
         """
-        try:
-            return self.index(value, *args, **kwargs)
-        except ValueError:
-            return None
+        if args or kwargs or not isinstance(value, Integral):
+            return self.__index(value, *args, **kwargs)
+
+        table = self.__table()
+        matched = (table.dims == value) & table.valid
+        found = matched.any(axis=1)
+        if not found.any():
+            raise ValueError(f'Can not find {repr(value)} in all the sizes.')
+        positions = matched.argmax(axis=1).tolist()
+        return table.tree([p if f else None for p, f in zip(positions, found.tolist())], Object)
+
+    @ireduce(sum, stream=True)
+    def __count(self: torch.Size, *args, **kwargs):
+        return self.count(*args, **kwargs)
 
     @doc_from_base()
-    @ireduce(sum)
-    @func_treelize(return_type=Object)
-    def count(self: torch.Size, *args, **kwargs) -> Object:
+    def count(self, value, *args, **kwargs) -> int:
         """
         Get the occurrence count of the sizes in this tree.
 
@@ -139,4 +204,69 @@ class Size(Torch, metaclass=clsmeta(torch.Size, allow_dict=True)):
             ... }).count(2)
             2
         """
-        return self.count(*args, **kwargs)
+        if args or kwargs or not isinstance(value, Integral):
+            return self.__count(value, *args, **kwargs)
+
+        table = self.__table()
+        return int(((table.dims == value) & table.valid).sum())
+
+    def broadcast_shapes(self, other) -> 'Size':
+        """
+        Get the broadcast result of the sizes in this tree with ``other``, \
+        just like :func:`torch.broadcast_shapes`.
+
+        :param other: Another tree of sizes with the same structure, or one size for all the leaves.
+
+        Example::
+
+            >>> import torch
+            >>> import treetensor.torch as ttorch
+            >>> ttorch.Size({
+            ...     'a': [1, 2],
+            ...     'b': {'x': [3, 1, 4]},
+            ... }).broadcast_shapes([3, 1, 1])
+            <Size 0x7f0f5c3c8a90>
+            ├── 'a' --> torch.Size([3, 1, 2])
+            └── 'b' --> <Size 0x7f0f5c3c8b50>
+                └── 'x' --> torch.Size([3, 1, 4])
+
+        .. note::
+            :class:`RuntimeError` will be raised when the sizes of any of the leaves are not broadcastable.
+        """
+        table = self.__table()
+        other_table = _to_size_table(other, table)
+        if other_table.paths != table.paths:
+            raise ValueError(f'Tree structure not match, {other_table.paths!r} expected but {table.paths!r} found.')
+
+        width = int(max(table.dims.shape[1], other_table.dims.shape[1]))
+        a, b = table.right_aligned(width), other_table.right_aligned(width)
+        invalid = ~((a == b) | (a == 1) | (b == 1))
+        if invalid.any():
+            row = int(invalid.any(axis=1).argmax())
+            raise RuntimeError(f'Shape mismatch on {".".join(table.paths[row])}: '
+                               f'{tuple(a[row, width - table.ndims[row]:].tolist())} can not be '
+                               f'broadcast with {tuple(b[row, width - other_table.ndims[row]:].tolist())}.')
+
+        result = np.where(a == 1, b, a).tolist()
+        ndims = np.maximum(table.ndims, other_table.ndims).tolist()
+        return table.tree([torch.Size(row[width - n:]) for row, n in zip(result, ndims)], Size)
+
+    def __eq__(self, other):
+        """
+        Check if the sizes and the structure are all the same.
+        """
+        if isinstance(other, Size):
+            table, other_table = self.__table(), other.__table()
+            return table.paths == other_table.paths and \
+                np.array_equal(table.ndims, other_table.ndims) and \
+                np.array_equal(table.dims, other_table.dims)
+        else:
+            return Torch.__eq__(self, other)
+
+    def __ne__(self, other):
+        """
+        Check if the sizes or the structure are different.
+        """
+        return not (self == other)
+
+    __hash__ = Torch.__hash__
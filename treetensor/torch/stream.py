@@ -1,40 +1,533 @@
 import itertools
+import threading
+import weakref
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import wraps
 from typing import Optional, List
 
 import torch
-
-_stream_pool: Optional[List[torch.cuda.Stream]] = None
-_global_streams: Optional[List[torch.cuda.Stream]] = None
+from treevalue import TreeValue, flatten, mapping
 
 __all__ = [
-    'stream', 'stream_call',
+    'stream', 'stream_call', 'stream_affinity', 'stream_wait', 'current_streams', 'current_executor',
+    'StreamExecutor', 'CudaStreamExecutor', 'CpuStreamExecutor', 'ThreadPoolStreamExecutor',
 ]
 
 
-def stream(cnt):
-    assert torch.cuda.is_available(), "CUDA is not supported."
+class CpuEvent:
+    """
+    Overview:
+        Event of the CPU simulation backend, which records the stream and the position \
+        in the stream's timeline when it is recorded.
+    """
+
+    def __init__(self):
+        self.stream: Optional['CpuStream'] = None
+        self.position: Optional[int] = None
+
+    def record(self, stream: 'CpuStream'):
+        self.stream = stream
+        self.position = len(stream.timeline)
+
+    def query(self) -> bool:
+        return True
+
+
+class CpuStream:
+    """
+    Overview:
+        Stream of the CPU simulation backend. The operations are executed synchronously, \
+        while the launches and the waits are logged in ``timeline`` so that \
+        the scheduling can be checked without GPU.
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+        self.timeline = []
+
+    def record_event(self, event: Optional[CpuEvent] = None) -> CpuEvent:
+        event = event or CpuEvent()
+        event.record(self)
+        return event
+
+    def wait_event(self, event: CpuEvent):
+        self.timeline.append(('wait', event.stream.index, event.position))
+
+    def launch(self, func):
+        self.timeline.append(('launch', getattr(func, '__name__', repr(func))))
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.index}>'
+
+
+class StreamExecutor:
+    """
+    Overview:
+        Base class of the executors of the tree operations, which is pluggable by :func:`stream`.
+
+        - :meth:`call` is called for each leaf operation, such as ``torch.add`` on a pair of tensors.
+        - :meth:`submit` is called for each leaf of a tree operation when :attr:`parallel` is ``True``, \
+            and the leaves are waited before the tree operation returns.
+
+        The base class executes everything synchronously in the current thread.
+    """
+    parallel = False
+
+    @property
+    def streams(self) -> Optional[List]:
+        """
+        Streams used by the executor, ``None`` means the executor is not stream-based.
+        """
+        return None
+
+    def call(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as err:
+            future.set_exception(err)
+        return future
+
+    def close(self):
+        pass
+
+
+class _LeafRecord:
+    __slots__ = ('ref', 'owner', 'stream', 'source', 'event')
+
+    def __init__(self, ref, owner, stream_, source, event):
+        self.ref = ref
+        self.owner = owner  # executor recording the event
+        self.stream = stream_  # stream the consumers are scheduled to
+        self.source = source  # stream the event is recorded on
+        self.event = event
+
+
+# id of tensor -> record of the stream producing it, shared by all the executors and threads
+_records = {}
+
+
+def _forget(key):
+    def _callback(_):
+        _records.pop(key, None)
+
+    return _callback
+
+
+def _set_record(tensor, owner, s, source, event):
+    key = id(tensor)
+    _records[key] = _LeafRecord(weakref.ref(tensor, _forget(key)), owner, s, source, event)
+
+
+def _get_record(tensor) -> Optional[_LeafRecord]:
+    record = _records.get(id(tensor), None)
+    if record is not None and record.ref() is tensor:
+        return record
+    else:
+        return None
+
+
+def _iter_tensors(args, kwargs):
+    for arg in itertools.chain(args, kwargs.values()):
+        if isinstance(arg, torch.Tensor):
+            yield arg
+        elif isinstance(arg, (list, tuple)):
+            for item in arg:
+                if isinstance(item, torch.Tensor):
+                    yield item
+
+
+def _iter_outputs(ret):
+    if isinstance(ret, torch.Tensor):
+        yield ret
+    elif isinstance(ret, (list, tuple)):
+        for item in ret:
+            if isinstance(item, torch.Tensor):
+                yield item
+
+
+def _wait_for(tensors, s=None):
+    for tensor in tensors:
+        record = _get_record(tensor)
+        if record is not None:
+            _s = s if s is not None else record.owner.current_stream()
+            if record.source is not _s:
+                _s.wait_event(record.event)
+                record.owner.hold(tensor, _s)
+
+
+class _StreamScheduler(StreamExecutor):
+    """
+    Overview:
+        Executor scheduling the leaf operations to streams. The leaves follow the streams \
+        of their inputs (see :func:`stream_affinity`), and an event is recorded for each output, \
+        so the operations consuming the leaves on other streams will wait for them.
+    """
+
+    def __init__(self, streams):
+        self._streams = list(streams)
+        self._count = itertools.count()
+
+    @property
+    def streams(self) -> Optional[List]:
+        return list(self._streams)
+
+    def current_stream(self):
+        raise NotImplementedError  # pragma: no cover
+
+    def use(self, s):
+        raise NotImplementedError  # pragma: no cover
+
+    def launch(self, s, func):
+        pass
+
+    def record(self, s):
+        return s.record_event()
+
+    def hold(self, tensor, s):
+        pass
+
+    def pin(self, tensor, s, event_cache: list):
+        record = _get_record(tensor)
+        if record is not None:
+            _set_record(tensor, record.owner, s, record.source, record.event)
+        else:
+            # the leaf is produced on the current stream
+            current = self.current_stream()
+            if not event_cache:
+                event_cache.append(self.record(current))
+            _set_record(tensor, self, s, current, event_cache[0])
+
+    def call(self, func, *args, **kwargs):
+        inputs = list(_iter_tensors(args, kwargs))
+        _stream = None
+        for tensor in inputs:
+            record = _get_record(tensor)
+            if record is not None and record.stream in self._streams:  # follow the stream of the inputs
+                _stream = record.stream
+                break
+        if _stream is None:
+            _stream = self._streams[next(self._count) % len(self._streams)]
+
+        with self.use(_stream):
+            _wait_for(inputs, _stream)
+            self.launch(_stream, func)
+            ret = func(*args, **kwargs)
+            outputs = list(_iter_outputs(ret))
+            if outputs:
+                event = self.record(_stream)
+                for tensor in outputs:
+                    _set_record(tensor, self, _stream, _stream, event)
+            return ret
+
+
+_cuda_pool = []
+_cpu_pool = []
+_pool_lock = threading.Lock()
+
+
+def _pooled_streams(pool, cnt, new_stream):
+    # the streams are shared by the executors, so that they are not created repeatedly
+    with _pool_lock:
+        while len(pool) < cnt:
+            pool.append(new_stream(len(pool)))
+        return pool[:cnt]
+
+
+class CudaStreamExecutor(_StreamScheduler):
+    """
+    Overview:
+        Executor scheduling the leaf operations to ``cnt`` cuda streams of the current device, \
+        the first one is the current stream.
+    """
+
+    def __init__(self, cnt: int):
+        assert torch.cuda.is_available(), "CUDA is not supported."
+        _StreamScheduler.__init__(self, _pooled_streams(
+            _cuda_pool, cnt,
+            lambda i: torch.cuda.current_stream() if i == 0 else torch.cuda.Stream(),
+        ))
+
+    def current_stream(self):
+        return torch.cuda.current_stream()
+
+    def use(self, s):
+        return torch.cuda.stream(s)
+
+    def hold(self, tensor, s):
+        # the memory of the tensor should not be reused before the kernels on ``s`` are finished
+        if tensor.is_cuda:
+            tensor.record_stream(s)
+
 
-    global _stream_pool, _global_streams
-    if _stream_pool is None:
-        _stream_pool = [torch.cuda.current_stream()]
+_CPU_CURRENT_STREAM: ContextVar[Optional[CpuStream]] = ContextVar('treetensor_cpu_current_stream', default=None)
 
-    if cnt is None:  # close stream support by
-        _global_streams = None
-    else:  # use the given number of streams
-        while len(_stream_pool) < cnt:
-            _stream_pool.append(torch.cuda.Stream())
 
-        _global_streams = _stream_pool[:cnt]
+class CpuStreamExecutor(_StreamScheduler):
+    """
+    Overview:
+        Executor simulating the scheduling of :class:`CudaStreamExecutor` with :class:`CpuStream`, \
+        the operations are executed synchronously, but the launches and waits are logged.
+    """
 
+    def __init__(self, cnt: int):
+        _StreamScheduler.__init__(self, _pooled_streams(_cpu_pool, cnt, CpuStream))
 
-_stream_count = itertools.count()
+    def current_stream(self):
+        return _CPU_CURRENT_STREAM.get() or _pooled_streams(_cpu_pool, 1, CpuStream)[0]
+
+    @contextmanager
+    def use(self, s):
+        token = _CPU_CURRENT_STREAM.set(s)
+        try:
+            yield s
+        finally:
+            _CPU_CURRENT_STREAM.reset(token)
+
+    def launch(self, s, func):
+        s.launch(func)
+
+
+_IN_WORKER: ContextVar[bool] = ContextVar('treetensor_stream_in_worker', default=False)
+
+
+class ThreadPoolStreamExecutor(StreamExecutor):
+    """
+    Overview:
+        Executor processing the leaves of the tree operations in a thread pool, \
+        which makes use of multiple cores on the CPU-only hosts. \
+        The tree operations called inside the workers are executed synchronously.
+
+    Arguments:
+        - max_workers (:obj:`Optional[int]`): Number of the threads, \
+            the same as :class:`concurrent.futures.ThreadPoolExecutor`.
+    """
+    parallel = True
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix='treetensor')
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        ctx = copy_context()
+        ctx.run(_IN_WORKER.set, True)
+        return self._pool.submit(ctx.run, func, *args, **kwargs)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+_STREAM_EXECUTOR: ContextVar[Optional[StreamExecutor]] = ContextVar('treetensor_stream_executor', default=None)
+
+
+class _StreamContext:
+    def __init__(self, executor: Optional[StreamExecutor], owned: bool = False):
+        self.executor = executor
+        self._owned = owned
+        self._token = _STREAM_EXECUTOR.set(executor)
+
+    def __enter__(self):
+        return self.executor
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _STREAM_EXECUTOR.reset(self._token)
+        if self._owned:  # the executors given by the users are closed by themselves
+            self.executor.close()
+
+
+_EXECUTORS = {'cuda': CudaStreamExecutor, 'cpu': CpuStreamExecutor, 'thread': ThreadPoolStreamExecutor}
+
+
+def stream(cnt=None, backend: str = 'cuda', executor: Optional[StreamExecutor] = None):
+    """
+    Overview:
+        Set the executor of the tree operations in the current context. \
+        The configuration is stored in :mod:`contextvars`, so each thread \
+        (and each asyncio task) has its own one. \
+        It can be used as a context manager, and the previous configuration is restored at exit.
+
+    Arguments:
+        - cnt: Number of streams, ``None`` means the stream support is closed.
+        - backend (:obj:`str`): Backend of the streams, ``cuda`` (:class:`CudaStreamExecutor`), \
+            ``cpu`` (:class:`CpuStreamExecutor`) or ``thread`` (:class:`ThreadPoolStreamExecutor` \
+            with ``cnt`` threads), default is ``cuda``.
+        - executor (:obj:`Optional[StreamExecutor]`): Customized executor, such as \
+            :class:`ThreadPoolStreamExecutor`, ``cnt`` and ``backend`` are ignored when it is given. \
+            It is not closed at exit, call :meth:`StreamExecutor.close` when it is not used any more.
+
+    .. note::
+        The executor created from ``cnt`` and ``backend`` is closed when the context manager exits, \
+        so the threads of the ``thread`` backend are shut down.
+
+    Examples::
+
+        >>> import treetensor.torch as ttorch
+        >>> ttorch.stream(4)  # use 4 cuda streams
+        >>> ttorch.stream(None)  # close the stream support
+        >>> with ttorch.stream(4, backend='cpu'):  # simulate the scheduling on cpu
+        ...     pass
+        >>> with ttorch.stream(8, backend='thread'):
+        ...     ttorch.matmul(a, b)  # leaves are processed by 8 threads
+    """
+    if executor is None and cnt is not None:
+        if backend not in _EXECUTORS:
+            raise ValueError(f'Unknown stream backend - {backend!r}, {"/".join(_EXECUTORS)} expected.')
+        return _StreamContext(_EXECUTORS[backend](cnt), owned=True)
+
+    return _StreamContext(executor)
+
+
+def current_executor() -> Optional[StreamExecutor]:
+    """
+    Overview:
+        Executor of the tree operations in the current context, ``None`` means the operations \
+        are executed directly.
+    """
+    return _STREAM_EXECUTOR.get()
+
+
+def current_streams() -> Optional[List]:
+    """
+    Overview:
+        Streams used by the tree operations in the current context, \
+        ``None`` means the stream support is closed.
+    """
+    executor = _STREAM_EXECUTOR.get()
+    return executor.streams if executor is not None else None
+
+
+def _tree_tensors(tree):
+    for _, value in flatten(tree):
+        if isinstance(value, torch.Tensor):
+            yield value
+
+
+def stream_affinity(tree, index: Optional[int] = None):
+    """
+    Overview:
+        Pin the leaves of the tree to streams, the following operations consuming the leaves \
+        are scheduled to the same streams, and so are their outputs.
+
+    Arguments:
+        - tree: Tree of tensors, can be a subtree.
+        - index (:obj:`Optional[int]`): Index of the stream in :func:`current_streams`. \
+            ``None`` means the streams are assigned by the keys of the leaves, \
+            so a leaf with the same key is always scheduled to the same stream.
+
+    Returns:
+        - tree: The given tree.
+
+    Examples::
+
+        >>> import treetensor.torch as ttorch
+        >>> ttorch.stream(4)
+        >>> t = ttorch.randn({'obs': (4, 3), 'reward': (4,)}, device='cuda')
+        >>> ttorch.stream_affinity(t)  # 'obs' and 'reward' are assigned by their keys
+        >>> ttorch.stream_affinity(t.obs, 2)  # pin 'obs' to the 3rd stream
+    """
+    executor = _STREAM_EXECUTOR.get()
+    if not isinstance(executor, _StreamScheduler):
+        return tree
+
+    streams = executor.streams
+    items = flatten(tree) if isinstance(tree, TreeValue) else [((), tree)]
+    event_cache = []
+    for path, value in items:
+        if not isinstance(value, torch.Tensor):
+            continue
+
+        if index is None:
+            s = streams[zlib.crc32('.'.join(map(str, path)).encode()) % len(streams)]
+        else:
+            s = streams[index]
+        executor.pin(value, s, event_cache)
+
+    return tree
+
+
+def stream_wait(tree):
+    """
+    Overview:
+        Make the current stream wait for the leaves of the tree, \
+        should be called before the leaves are consumed outside the tree operations.
+
+    Arguments:
+        - tree: Tree of tensors.
+
+    Returns:
+        - tree: The given tree.
+    """
+    if _records:
+        _wait_for(_tree_tensors(tree) if isinstance(tree, TreeValue) else [tree])
+    return tree
+
+
+def streams_enabled() -> bool:
+    return isinstance(_STREAM_EXECUTOR.get(), _StreamScheduler)
+
+
+def wait_tensors(tensors):
+    """
+    Make the current stream wait for the producers of ``tensors``.
+    """
+    if _records:
+        _wait_for(tensors)
 
 
 def stream_call(func, *args, **kwargs):
-    if _global_streams is not None:
-        _stream_index = next(_stream_count) % len(_global_streams)
-        _stream = _global_streams[_stream_index]
-        with torch.cuda.stream(_stream):
-            return func(*args, **kwargs)
+    executor = _STREAM_EXECUTOR.get()
+    if executor is not None:
+        return executor.call(func, *args, **kwargs)
     else:
+        if _records:
+            _wait_for(_iter_tensors(args, kwargs))
         return func(*args, **kwargs)
+
+
+def _resolve(x):
+    return x.result() if isinstance(x, Future) else x
+
+
+def executor_treelize(treelize):
+    """
+    Overview:
+        Wrap ``func_treelize`` or ``method_treelize``, so that the leaves are submitted to the \
+        executor when it is :attr:`StreamExecutor.parallel`.
+        The functions with ``rise`` are always executed synchronously.
+    """
+
+    @wraps(treelize)
+    def _treelize(*args, **kwargs):
+        if kwargs.get('rise', False):
+            return treelize(*args, **kwargs)
+
+        def _decorator(func):
+            _sequential = treelize(*args, **kwargs)(func)
+
+            def _submit(*args_, **kwargs_):
+                return _STREAM_EXECUTOR.get().submit(func, *args_, **kwargs_)
+
+            _submitted = treelize(*args, **kwargs)(_submit)
+
+            @wraps(_sequential)
+            def _new_func(*args_, **kwargs_):
+                executor = _STREAM_EXECUTOR.get()
+                if executor is None or not executor.parallel or _IN_WORKER.get():
+                    return _sequential(*args_, **kwargs_)
+
+                futures = _submitted(*args_, **kwargs_)
+                if isinstance(futures, TreeValue):
+                    return mapping(futures, _resolve)
+                else:
+                    return _resolve(futures)
+
+            return _new_func
+
+        return _decorator
+
+    return _treelize
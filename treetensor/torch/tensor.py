@@ -1,13 +1,22 @@
+import operator
+from collections import namedtuple
+
 import numpy as np
 import torch as pytorch
 from hbutils.reflection import post_process
-from treevalue import method_treelize, TreeValue, typetrans
+from treevalue import method_treelize as original_method_treelize, TreeValue, typetrans, flatten, unflatten
 
-from .base import Torch, rmreduce, post_reduce, auto_reduce
+from .base import Torch, rmreduce, post_reduce, auto_reduce, scope_amax, scope_amin
+from .batch import BatchIndexer
+from .dispatch import torch_function
+from .memory import MemoryReport, memory_summary
+from .base import foreach_dispatch, foreach_unary, foreach_binary, foreach_clamp
 from .size import Size
-from .stream import stream_call
-from ..common import Object, ireduce, clsmeta, return_self, auto_tree, get_tree_proxy
+from .stream import stream_call, executor_treelize
+from ..common import Object, ireduce, clsmeta, return_self, auto_tree, get_tree_proxy, tree_cache, mark_mutated, \
+    leaf_operator
 from ..numpy import ndarray
+from ..profiler import profile_treelize, profile_call
 from ..utils import current_names, class_autoremove, replaceable_partial
 from ..utils import doc_from_base as original_doc_from_base
 
@@ -16,6 +25,7 @@ __all__ = [
 ]
 
 doc_from_base = replaceable_partial(original_doc_from_base, base=pytorch.Tensor)
+method_treelize = profile_treelize(executor_treelize(original_method_treelize))
 
 
 def _auto_tensor(t):
@@ -27,7 +37,27 @@ def _auto_tensor(t):
     return t
 
 
-_TorchProxy, _InstanceTorchProxy = get_tree_proxy(pytorch.Tensor, _auto_tensor)
+# in-place methods which change the shape, dtype or device of the tensors
+_METADATA_INPLACE_METHODS = {
+    'resize_', 'resize_as_', 'squeeze_', 'unsqueeze_', 't_', 'transpose_',
+    'swapdims_', 'swapaxes_', 'as_strided_', 'set_',
+}
+
+_TorchProxy, _InstanceTorchProxy = get_tree_proxy(pytorch.Tensor, _auto_tensor, _METADATA_INPLACE_METHODS)
+
+_TensorMetadata = namedtuple('_TensorMetadata', ['paths', 'shapes', 'dtypes', 'devices', 'numels', 'nbytes'])
+
+
+def _tensor_metadata(tree) -> _TensorMetadata:
+    paths, shapes, dtypes, devices, numels, nbytes = [], [], [], [], [], []
+    for path, leaf in flatten(tree):
+        paths.append(path)
+        shapes.append(leaf.shape)
+        dtypes.append(leaf.dtype)
+        devices.append(leaf.device)
+        numels.append(leaf.numel())
+        nbytes.append(numels[-1] * leaf.element_size())
+    return _TensorMetadata(paths, shapes, dtypes, devices, numels, nbytes)
 
 
 def _to_tensor(data, *args, **kwargs):
@@ -116,6 +146,30 @@ class Tensor(Torch, metaclass=_TensorMeta):
             else:
                 return tree
 
+    @classmethod
+    def __torch_function__(cls, func, types, args=(), kwargs=None):
+        """
+        Overview:
+            Torch function protocol, so the torch functions (such as ``torch.add(t, 1)`` and \
+            ``torch.nn.functional.relu(t)``) can be called with the trees directly. \
+            The functions implemented in :mod:`treetensor.torch` are used for the ones with the same names, \
+            and the others are applied to each leaf. See :func:`treetensor.torch.dispatch.torch_function`.
+
+        Examples::
+
+            >>> import torch
+            >>> import treetensor.torch as ttorch
+            >>> t = ttorch.tensor({'a': [-1., 2.], 'b': {'x': [3., -4.]}})
+            >>> torch.nn.functional.relu(t)
+            <Tensor 0x7f0c2ee3c2b0>
+            ├── 'a' --> tensor([0., 2.])
+            └── 'b' --> <Tensor 0x7f0c2ee3c1f0>
+                └── 'x' --> tensor([3., 0.])
+        """
+        if not all(issubclass(t, (pytorch.Tensor, TreeValue)) for t in types):
+            return NotImplemented
+        return profile_call(f'torch.{func.__name__}', torch_function, cls, func, args, kwargs or {})
+
     @property
     def torch(self):
         """
@@ -200,6 +254,18 @@ class Tensor(Torch, metaclass=_TensorMeta):
         """
         return stream_call(self.cuda, *args, **kwargs)
 
+    @doc_from_base()
+    @method_treelize()
+    def pin_memory(self: pytorch.Tensor, *args, **kwargs):
+        """
+        Copies the tree tensor to pinned memory, if it's not already pinned.
+
+        .. note::
+            The leaves are pinned one by one, use :class:`treetensor.torch.TransferPipeline` \
+            to copy a tree to cuda with one pinned staging buffer.
+        """
+        return stream_call(self.pin_memory, *args, **kwargs)
+
     @doc_from_base()
     @method_treelize()
     def to(self: pytorch.Tensor, *args, **kwargs):
@@ -224,19 +290,22 @@ class Tensor(Torch, metaclass=_TensorMeta):
         """
         return stream_call(self.to, *args, **kwargs)
 
+    @tree_cache
+    def __metadata(self) -> _TensorMetadata:
+        return _tensor_metadata(self)
+
     @doc_from_base()
-    @ireduce(sum)
-    @method_treelize(return_type=Object)
-    def numel(self: pytorch.Tensor):
+    @tree_cache
+    def numel(self) -> int:
         """
         See :func:`treetensor.torch.numel`
         """
-        return stream_call(self.numel, )
+        return sum(self.__metadata().numels)
 
     @property
     @doc_from_base()
-    @method_treelize(return_type=Size)
-    def shape(self: pytorch.Tensor):
+    @tree_cache
+    def shape(self) -> Size:
         """
         Get the size of the tensors in the tree.
 
@@ -252,8 +321,152 @@ class Tensor(Torch, metaclass=_TensorMeta):
             ├── a --> torch.Size([3, 2])
             └── b --> <Size 0x7ff363bbbcf8>
                 └── x --> torch.Size([2, 2])
+
+        .. note::
+            The metadata of the tensors (``shape``, ``dtype``, ``device``, ``numel()``, ``nbytes`` \
+            and ``devices``) are calculated once and cached on the tree object, until any tree is modified \
+            or in-place method which changes the shapes (such as :meth:`squeeze_`) is called on a tree. \
+            Call :func:`treetensor.common.mark_mutated` after changing the shapes of the tensors \
+            directly with native torch methods.
+        """
+        meta = self.__metadata()
+        return unflatten(zip(meta.paths, meta.shapes), return_type=Size)
+
+    @property
+    @doc_from_base()
+    @tree_cache
+    def dtype(self) -> Object:
+        """
+        Get the dtype of the tensors in the tree.
+
+        Example::
+
+            >>> import torch
+            >>> import treetensor.torch as ttorch
+            >>> ttorch.tensor({
+            ...     'a': [[1, 11], [2, 22], [3, 33]],
+            ...     'b': {'x': [[4.0, 5], [6, 7]]},
+            ... }).dtype
+            <Object 0x7f6b5a1ce2b0>
+            ├── 'a' --> torch.int64
+            └── 'b' --> <Object 0x7f6b5a1ce310>
+                └── 'x' --> torch.float32
+        """
+        meta = self.__metadata()
+        return unflatten(zip(meta.paths, meta.dtypes), return_type=Object)
+
+    @property
+    @doc_from_base()
+    @tree_cache
+    def device(self) -> Object:
+        """
+        Get the device of the tensors in the tree.
+
+        Example::
+
+            >>> import torch
+            >>> import treetensor.torch as ttorch
+            >>> ttorch.tensor({
+            ...     'a': [[1, 11], [2, 22], [3, 33]],
+            ...     'b': {'x': [[4.0, 5], [6, 7]]},
+            ... }).device
+            <Object 0x7f6b5a1ce430>
+            ├── 'a' --> device(type='cpu')
+            └── 'b' --> <Object 0x7f6b5a1ce490>
+                └── 'x' --> device(type='cpu')
+        """
+        meta = self.__metadata()
+        return unflatten(zip(meta.paths, meta.devices), return_type=Object)
+
+    @property
+    @doc_from_base()
+    @tree_cache
+    def nbytes(self) -> int:
+        """
+        Get the total bytes of the tensors in the tree.
+
+        Example::
+
+            >>> import torch
+            >>> import treetensor.torch as ttorch
+            >>> ttorch.tensor({
+            ...     'a': [[1, 11], [2, 22], [3, 33]],
+            ...     'b': {'x': [[4.0, 5], [6, 7]]},
+            ... }).nbytes
+            64
         """
-        return self.shape
+        return sum(self.__metadata().nbytes)
+
+    @property
+    @tree_cache
+    def devices(self) -> frozenset:
+        """
+        Get the set of the devices which the tensors in the tree are placed on.
+
+        Example::
+
+            >>> import torch
+            >>> import treetensor.torch as ttorch
+            >>> ttorch.tensor({
+            ...     'a': [[1, 11], [2, 22], [3, 33]],
+            ...     'b': {'x': [[4.0, 5], [6, 7]]},
+            ... }).devices
+            frozenset({device(type='cpu')})
+        """
+        return frozenset(self.__metadata().devices)
+
+    def memory_report(self) -> MemoryReport:
+        """
+        Report the memory of the tree, see :func:`treetensor.torch.memory_summary`.
+
+        Example::
+
+            >>> import torch
+            >>> import treetensor.torch as ttorch
+            >>> big = torch.zeros(1024, 1024)
+            >>> t = ttorch.Tensor({'a': big[:2], 'b': {'x': torch.zeros(3)}})
+            >>> report = t.memory_report()
+            >>> report.logical_bytes, report.storage_bytes
+            (8204, 4194316)
+            >>> report.subtrees['a'].storage_bytes
+            4194304
+        """
+        return memory_summary(self)
+
+    @property
+    def batch(self) -> BatchIndexer:
+        """
+        Index the first dimension of all the leaves, such as sampling the minibatches.
+
+        Example::
+
+            >>> import torch
+            >>> import treetensor.torch as ttorch
+            >>> t = ttorch.tensor({
+            ...     'a': [[1, 11], [2, 22], [3, 33]],
+            ...     'b': {'x': [4, 5, 6]},
+            ... })
+            >>> t.batch[1:]  # views of the leaves
+            <Tensor 0x7f0c2ee3c2b0>
+            ├── 'a' --> tensor([[ 2, 22],
+            │                   [ 3, 33]])
+            └── 'b' --> <Tensor 0x7f0c2ee3c220>
+                └── 'x' --> tensor([5, 6])
+            >>> t.batch[torch.tensor([2, 0])]
+            <Tensor 0x7f0c2ee3c190>
+            ├── 'a' --> tensor([[ 3, 33],
+            │                   [ 1, 11]])
+            └── 'b' --> <Tensor 0x7f0c2ee3c100>
+                └── 'x' --> tensor([6, 4])
+            >>> t.batch.view[torch.tensor([0, 2])]  # views of the leaves, the same as t.batch[0:3:2]
+            <Tensor 0x7f0c2ee3c070>
+            ├── 'a' --> tensor([[ 1, 11],
+            │                   [ 3, 33]])
+            └── 'b' --> <Tensor 0x7f0c2ee3c040>
+                └── 'x' --> tensor([4, 6])
+            >>> t.batch[t.b.x > 4] = 0  # assignment is supported as well
+        """
+        return BatchIndexer(self)
 
     @property
     @method_treelize()
@@ -367,8 +580,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.detach_, )
 
     # noinspection PyShadowingBuiltins,PyUnusedLocal
-    @post_reduce(pytorch.all)
-    @method_treelize(return_type=Object)
+    @post_reduce(pytorch.all, stream=True)
     def __all_r(self, *args, **kwargs):
         return self
 
@@ -379,7 +591,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
 
     # noinspection PyArgumentList
     @doc_from_base()
-    @auto_reduce(__all_r, __all_nr)
+    @auto_reduce(__all_r, __all_nr, sfunc=pytorch.all)
     def all(self: pytorch.Tensor, *args, reduce=None, **kwargs) -> bool:
         """
         See :func:`treetensor.torch.all`
@@ -387,8 +599,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         pass  # pragma: no cover
 
     # noinspection PyShadowingBuiltins,PyUnusedLocal
-    @post_reduce(pytorch.any)
-    @method_treelize(return_type=Object)
+    @post_reduce(pytorch.any, stream=True)
     def __any_r(self, *args, **kwargs):
         return self
 
@@ -399,7 +610,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
 
     # noinspection PyArgumentList
     @doc_from_base()
-    @auto_reduce(__any_r, __any_nr)
+    @auto_reduce(__any_r, __any_nr, sfunc=pytorch.any)
     def any(self: pytorch.Tensor, *args, reduce=None, **kwargs) -> bool:
         """
         See :func:`treetensor.torch.any`
@@ -407,8 +618,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         pass  # pragma: no cover
 
     # noinspection PyShadowingBuiltins,PyUnusedLocal
-    @post_reduce(pytorch.max)
-    @method_treelize(return_type=Object)
+    @post_reduce(pytorch.max, stream=True)
     def __max_r(self, *args, **kwargs):
         return self
 
@@ -419,7 +629,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return pytorch.max(self, *args, **kwargs)
 
     @doc_from_base()
-    @auto_reduce(__max_r, __max_nr)
+    @auto_reduce(__max_r, __max_nr, sfunc=scope_amax)
     def max(self: pytorch.Tensor, *args, reduce=None, **kwargs):
         """
         See :func:`treetensor.torch.max`
@@ -427,8 +637,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         pass  # pragma: no cover
 
     # noinspection PyShadowingBuiltins,PyUnusedLocal
-    @post_reduce(pytorch.min)
-    @method_treelize(return_type=Object)
+    @post_reduce(pytorch.min, stream=True)
     def __min_r(self, *args, **kwargs):
         return self
 
@@ -439,7 +648,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return pytorch.min(self, *args, **kwargs)
 
     @doc_from_base()
-    @auto_reduce(__min_r, __min_nr)
+    @auto_reduce(__min_r, __min_nr, sfunc=scope_amin)
     def min(self: pytorch.Tensor, *args, reduce=None, **kwargs):
         """
         See :func:`treetensor.torch.min`
@@ -447,8 +656,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         pass  # pragma: no cover
 
     # noinspection PyShadowingBuiltins,PyUnusedLocal
-    @post_reduce(pytorch.sum)
-    @method_treelize(return_type=Object)
+    @post_reduce(pytorch.sum, stream=True)
     def __sum_r(self, *args, **kwargs):
         return self
 
@@ -459,13 +667,14 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return pytorch.sum(self, *args, **kwargs)
 
     @doc_from_base()
-    @auto_reduce(__sum_r, __sum_nr)
+    @auto_reduce(__sum_r, __sum_nr, sfunc=pytorch.sum)
     def sum(self: pytorch.Tensor, *args, reduce=None, **kwargs):
         """
         See :func:`treetensor.torch.sum`
         """
         pass  # pragma: no cover
 
+    @leaf_operator(operator.eq)
     @method_treelize()
     def __eq__(self, other):
         """
@@ -473,6 +682,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         """
         return self == other
 
+    @leaf_operator(operator.ne)
     @method_treelize()
     def __ne__(self, other):
         """
@@ -480,6 +690,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         """
         return self != other
 
+    @leaf_operator(operator.lt)
     @method_treelize()
     def __lt__(self, other):
         """
@@ -487,6 +698,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         """
         return self < other
 
+    @leaf_operator(operator.gt)
     @method_treelize()
     def __gt__(self, other):
         """
@@ -494,6 +706,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         """
         return self > other
 
+    @leaf_operator(operator.le)
     @method_treelize()
     def __le__(self, other):
         """
@@ -501,6 +714,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         """
         return self <= other
 
+    @leaf_operator(operator.ge)
     @method_treelize()
     def __ge__(self, other):
         """
@@ -573,6 +787,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.isclose, other, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_unary('abs'))
     @method_treelize()
     def abs(self, *args, **kwargs):
         """
@@ -581,6 +796,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.abs, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_unary('abs', inplace=True), inplace=True)
     @return_self
     @method_treelize()
     def abs_(self, *args, **kwargs):
@@ -590,6 +806,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.abs_, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_clamp())
     @method_treelize()
     def clamp(self, *args, **kwargs):
         """
@@ -598,6 +815,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.clamp, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_clamp(inplace=True), inplace=True)
     @return_self
     @method_treelize()
     def clamp_(self, *args, **kwargs):
@@ -624,6 +842,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.sign_, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_unary('sigmoid'))
     @method_treelize()
     def sigmoid(self, *args, **kwargs):
         """
@@ -632,6 +851,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.sigmoid, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_unary('sigmoid', inplace=True), inplace=True)
     @return_self
     @method_treelize()
     def sigmoid_(self, *args, **kwargs):
@@ -692,6 +912,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.round_, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_binary('add', alpha=True))
     @method_treelize()
     def add(self, other, *args, **kwargs):
         """
@@ -700,6 +921,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.add, other, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_binary('add', inplace=True, alpha=True), inplace=True)
     @return_self
     @method_treelize()
     def add_(self, other, *args, **kwargs):
@@ -709,6 +931,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.add_, other, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_binary('sub', alpha=True))
     @method_treelize()
     def sub(self, other, *args, **kwargs):
         """
@@ -717,6 +940,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.sub, other, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_binary('sub', inplace=True, alpha=True), inplace=True)
     @return_self
     @method_treelize()
     def sub_(self, other, *args, **kwargs):
@@ -726,6 +950,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.sub_, other, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_binary('mul'))
     @method_treelize()
     def mul(self, other, *args, **kwargs):
         """
@@ -734,6 +959,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.mul, other, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_binary('mul', inplace=True), inplace=True)
     @return_self
     @method_treelize()
     def mul_(self, other, *args, **kwargs):
@@ -743,6 +969,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.mul_, other, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_binary('div'))
     @method_treelize()
     def div(self, other, *args, **kwargs):
         """
@@ -751,6 +978,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.div, other, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_binary('div', inplace=True), inplace=True)
     @return_self
     @method_treelize()
     def div_(self, other, *args, **kwargs):
@@ -760,6 +988,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.div_, other, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_binary('pow'))
     @method_treelize()
     def pow(self, exponent, *args, **kwargs):
         """
@@ -768,6 +997,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.pow, exponent, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_binary('pow', inplace=True), inplace=True)
     @return_self
     @method_treelize()
     def pow_(self, exponent, *args, **kwargs):
@@ -777,6 +1007,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.pow_, exponent, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_unary('neg'))
     @method_treelize()
     def neg(self, *args, **kwargs):
         """
@@ -785,6 +1016,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.neg, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_unary('neg', inplace=True), inplace=True)
     @return_self
     @method_treelize()
     def neg_(self, *args, **kwargs):
@@ -794,6 +1026,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.neg_, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_unary('exp'))
     @method_treelize()
     def exp(self, *args, **kwargs):
         """
@@ -802,6 +1035,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.exp, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_unary('exp', inplace=True), inplace=True)
     @return_self
     @method_treelize()
     def exp_(self, *args, **kwargs):
@@ -828,6 +1062,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.exp2_, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_unary('sqrt'))
     @method_treelize()
     def sqrt(self, *args, **kwargs):
         """
@@ -836,6 +1071,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.sqrt, *args, **kwargs)
 
     @doc_from_base()
+    @foreach_dispatch(foreach_unary('sqrt', inplace=True), inplace=True)
     @return_self
     @method_treelize()
     def sqrt_(self, *args, **kwargs):
@@ -929,14 +1165,21 @@ class Tensor(Torch, metaclass=_TensorMeta):
         """
         return stream_call(self.squeeze, *args, **kwargs)
 
-    @doc_from_base()
-    @return_self
+    # noinspection PyShadowingBuiltins
     @method_treelize()
+    def __squeeze_(self, *args, **kwargs):
+        return stream_call(self.squeeze_, *args, **kwargs)
+
+    @doc_from_base()
     def squeeze_(self, *args, **kwargs):
         """
         In-place version of :meth:`Tensor.squeeze'.
         """
-        return stream_call(self.squeeze_, *args, **kwargs)
+        try:
+            self.__squeeze_(*args, **kwargs)
+        finally:
+            mark_mutated()
+        return self
 
     @doc_from_base()
     @method_treelize()
@@ -946,14 +1189,20 @@ class Tensor(Torch, metaclass=_TensorMeta):
         """
         return stream_call(self.unsqueeze, dim)
 
-    @doc_from_base()
-    @return_self
     @method_treelize()
+    def __unsqueeze_(self, dim):
+        return stream_call(self.unsqueeze_, dim)
+
+    @doc_from_base()
     def unsqueeze_(self, dim):
         """
         In-place version of :meth:`Tensor.unsqueeze'.
         """
-        return stream_call(self.unsqueeze_, dim)
+        try:
+            self.__unsqueeze_(dim)
+        finally:
+            mark_mutated()
+        return self
 
     @doc_from_base()
     @method_treelize()
@@ -974,8 +1223,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return stream_call(self.index_select, dim, index)
 
     # noinspection PyShadowingBuiltins,PyUnusedLocal
-    @rmreduce()
-    @method_treelize(return_type=Object)
+    @rmreduce(stream=True)
     def __masked_select_r(self, mask, *args, **kwargs):
         return pytorch.masked_select(self, mask, *args, **kwargs)
 
@@ -1002,8 +1250,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         pass  # pragma: no cover
 
     # noinspection PyUnusedLocal
-    @post_reduce(pytorch.std)
-    @method_treelize(return_type=Object)
+    @post_reduce(pytorch.std, stream=True)
     def __std_r(self, *args, **kwargs):
         return self
 
@@ -1012,7 +1259,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return pytorch.std(self, *args, **kwargs)
 
     @doc_from_base()
-    @auto_reduce(__std_r, __std_nr)
+    @auto_reduce(__std_r, __std_nr, sfunc=pytorch.std)
     @method_treelize()
     def std(self, *args, reduce=None, **kwargs):
         """
@@ -1021,8 +1268,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         pass  # pragma: no cover
 
     # noinspection PyUnusedLocal
-    @post_reduce(pytorch.mean)
-    @method_treelize(return_type=Object)
+    @post_reduce(pytorch.mean, stream=True)
     def __mean_r(self, *args, **kwargs):
         return self
 
@@ -1031,7 +1277,7 @@ class Tensor(Torch, metaclass=_TensorMeta):
         return pytorch.mean(self, *args, **kwargs)
 
     @doc_from_base()
-    @auto_reduce(__mean_r, __mean_nr)
+    @auto_reduce(__mean_r, __mean_nr, sfunc=pytorch.mean)
     @method_treelize()
     def mean(self, *args, reduce=None, **kwargs):
         """
@@ -0,0 +1,185 @@
+from typing import Optional, Union
+
+import torch
+from treevalue import TreeValue, flatten, unflatten
+
+__all__ = [
+    'TransferPipeline',
+]
+
+_ALIGNMENT = 64
+
+
+def _align(n: int) -> int:
+    return (n + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class _Layout:
+    """
+    Offsets of the leaves in the packed buffer, shared by the batches with the same structure.
+    """
+
+    def __init__(self, leaves):
+        self.offsets, self.sizes = [], []
+        total = 0
+        for leaf in leaves:
+            nbytes = leaf.numel() * leaf.element_size()
+            self.offsets.append(total)
+            self.sizes.append(nbytes)
+            total = _align(total + nbytes)
+        self.total = total
+
+    def views(self, buffer, leaves):
+        return [
+            buffer[offset:offset + size].view(leaf.dtype).view(leaf.shape)
+            for offset, size, leaf in zip(self.offsets, self.sizes, leaves)
+        ]
+
+
+def _layout_key(leaves):
+    return tuple((leaf.dtype, leaf.shape) for leaf in leaves)
+
+
+class TransferPipeline:
+    """
+    Overview:
+        Transfer the tree tensors to another device with a single copy. \
+        The leaves are packed into a reusable staging buffer (pinned when the target is a cuda device), \
+        the buffer is copied with ``non_blocking=True``, and then unpacked as views on the target device.
+
+        The staging buffers are double-buffered, so with :meth:`iterate`, the transfer of the next batch \
+        is issued before the current batch is consumed, and overlaps the computation. \
+        When the target device is the cpu, the same path degrades to a packed cpu-to-cpu copy.
+
+    Arguments:
+        - device: Target device, default is ``cuda`` when it is available, otherwise ``cpu``.
+        - pin_memory (:obj:`Optional[bool]`): Pin the staging buffers, default is ``None`` which means \
+            the buffers are pinned when the target is a cuda device.
+        - buffers (:obj:`int`): Number of the staging buffers, default is ``2``.
+
+    Examples::
+
+        >>> import treetensor.torch as ttorch
+        >>> pipeline = ttorch.TransferPipeline('cuda')
+        >>> for batch in pipeline.iterate(loader):  # batch of the loader is a tree tensor on cpu
+        ...     loss = model(batch)  # the next batch is being transferred
+
+    .. note::
+        The leaves of the result are views of one buffer on the target device, \
+        in-place operations resizing the leaves are not supported.
+    """
+
+    def __init__(self, device: Union[str, torch.device, None] = None,
+                 pin_memory: Optional[bool] = None, buffers: int = 2):
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.device = torch.device(device)
+        if pin_memory is None:
+            pin_memory = self.device.type == 'cuda'
+        self.pin_memory = pin_memory
+        if buffers < 1:
+            raise ValueError(f'At least 1 staging buffer is required, but {buffers!r} found.')
+
+        self._buffers = [None] * buffers
+        self._events = [None] * buffers
+        self._index = 0
+        self._layouts = {}
+        self._copy_stream = torch.cuda.Stream(self.device) if self.device.type == 'cuda' else None
+
+    def _layout(self, leaves) -> _Layout:
+        key = _layout_key(leaves)
+        layout = self._layouts.get(key, None)
+        if layout is None:
+            layout = _Layout(leaves)
+            self._layouts[key] = layout
+        return layout
+
+    def _staging(self, nbytes: int):
+        index = self._index
+        self._index = (self._index + 1) % len(self._buffers)
+
+        if self._events[index] is not None:  # the previous copy from this buffer should be finished
+            self._events[index].synchronize()
+            self._events[index] = None
+
+        buffer = self._buffers[index]
+        if buffer is None or buffer.numel() < nbytes:
+            buffer = torch.empty(_align(max(nbytes, 1)), dtype=torch.uint8, pin_memory=self.pin_memory)
+            self._buffers[index] = buffer
+        return index, buffer
+
+    def _copy(self, index, staging: torch.Tensor) -> torch.Tensor:
+        if self._copy_stream is not None:
+            with torch.cuda.stream(self._copy_stream):
+                buffer = staging.to(self.device, non_blocking=True)
+                self._events[index] = self._copy_stream.record_event()
+
+            current = torch.cuda.current_stream(self.device)
+            current.wait_stream(self._copy_stream)
+            buffer.record_stream(current)
+            return buffer
+        elif self.device.type == 'cpu':
+            # the staging buffer is reused, so the result should be a copy of it
+            return staging.clone()
+        else:
+            return staging.to(self.device, non_blocking=self.pin_memory)
+
+    def transfer(self, tree):
+        """
+        Overview:
+            Transfer the tree to the target device.
+
+        Arguments:
+            - tree: Tree of tensors, the leaves which are not tensors are kept as they are.
+
+        Returns:
+            - transferred: Tree on the target device.
+        """
+        items = flatten(tree) if isinstance(tree, TreeValue) else [((), tree)]
+        tensor_indices = [i for i, (_, value) in enumerate(items) if torch.is_tensor(value)]
+        leaves = [items[i][1] for i in tensor_indices]
+        if not leaves:
+            return tree
+
+        layout = self._layout(leaves)
+        index, staging = self._staging(layout.total)
+        staging = staging[:layout.total]
+        dst = layout.views(staging, leaves)
+        if hasattr(torch, '_foreach_copy_') and all(leaf.device.type == 'cpu' for leaf in leaves):
+            torch._foreach_copy_(dst, leaves)
+        else:
+            for d, s in zip(dst, leaves):
+                d.copy_(s)
+
+        results = layout.views(self._copy(index, staging), leaves)
+        values = [value for _, value in items]
+        for i, result in zip(tensor_indices, results):
+            values[i] = result
+
+        if isinstance(tree, TreeValue):
+            return unflatten([(path, value) for (path, _), value in zip(items, values)], return_type=type(tree))
+        else:
+            return values[0]
+
+    __call__ = transfer
+
+    def iterate(self, iterable):
+        """
+        Overview:
+            Transfer the batches of ``iterable``, the transfer of the next batch is issued \
+            before the current one is yielded.
+
+        Arguments:
+            - iterable: Iterable of the trees, such as a data loader.
+
+        Returns:
+            - iterator: Iterator of the transferred trees.
+        """
+        pending = None
+        for batch in iterable:
+            current = self.transfer(batch)
+            if pending is not None:
+                yield pending
+            pending = current
+        if pending is not None:
+            yield pending
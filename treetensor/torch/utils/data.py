@@ -0,0 +1,192 @@
+import queue
+import threading
+from collections.abc import Mapping
+from numbers import Number
+from typing import Optional
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from treevalue import TreeValue, flatten, unflatten
+
+from ..tensor import Tensor
+from ...common import Object
+from ..transfer import TransferPipeline
+
+__all__ = [
+    'tree_collate', 'TreeDataLoader',
+]
+
+
+def _collate_leaves(values, out=None):
+    first = values[0]
+    if torch.is_tensor(first):
+        return torch.stack(values, out=out)
+    elif isinstance(first, np.ndarray):
+        return torch.stack([torch.as_tensor(value) for value in values], out=out)
+    elif isinstance(first, (bool, Number, np.bool_, np.number)):
+        if out is not None:
+            out.copy_(torch.as_tensor(values))
+            return out
+        return torch.as_tensor(values)
+    else:  # strings and the other objects are kept in a list
+        return list(values)
+
+
+def tree_collate(batch, out=None):
+    """
+    Overview:
+        Collate function of :class:`torch.utils.data.DataLoader` for the samples of trees. \
+        The samples are flattened once, and the leaves with the same key are stacked \
+        along a new first dimension, instead of the recursion on each sample.
+
+    Arguments:
+        - batch: List of the samples, which can be dicts, :class:`treetensor.torch.Tensor` \
+            or tuples (lists) of them. The tensors, numpy arrays, bools and numbers are stacked \
+            as tensors, the other leaves are kept in lists.
+        - out: Preallocated tree tensor to store the result, such as the result of the previous call.
+
+    Returns:
+        - collated: Collated :class:`treetensor.torch.Tensor`, or :class:`treetensor.common.Object` \
+            when some of the leaves are kept in lists.
+
+    Examples::
+
+        >>> import torch
+        >>> from treetensor.torch.utils.data import tree_collate
+        >>> batch = [
+        ...     {'obs': torch.randn(3, 32, 32), 'action': torch.tensor([1]), 'done': False},
+        ...     {'obs': torch.randn(3, 32, 32), 'action': torch.tensor([3]), 'done': True},
+        ... ]
+        >>> tree_collate(batch)
+        <Tensor 0x7f0c2ee3c2b0>
+        ├── 'action' --> tensor([[1],
+        │                        [3]])
+        ├── 'done' --> tensor([False,  True])
+        └── 'obs' --> tensor([[[[ 0.2387, ...]]]])
+    """
+    if not batch:
+        raise ValueError('Empty batch is not supported.')
+
+    first = batch[0]
+    if isinstance(first, (tuple, list)):
+        outs = out if out is not None else [None] * len(first)
+        items = [tree_collate(list(column), o) for column, o in zip(zip(*batch), outs)]
+        if hasattr(first, '_fields'):  # namedtuple
+            return type(first)(*items)
+        else:
+            return type(first)(items)
+    elif not isinstance(first, (Mapping, TreeValue)):
+        return _collate_leaves(list(batch), out)
+
+    samples = [flatten(TreeValue(sample) if isinstance(sample, Mapping) else sample) for sample in batch]
+    paths = [path for path, _ in samples[0]]
+    columns = [[value] for _, value in samples[0]]
+    for i, sample in enumerate(samples[1:], start=1):
+        if len(sample) != len(paths) or any(path != p for (path, _), p in zip(sample, paths)):
+            mapping = dict(sample)
+            if len(mapping) != len(paths) or any(p not in mapping for p in paths):
+                raise ValueError(f'The structure of sample #{i} is different from sample #0.')
+            sample = [(p, mapping[p]) for p in paths]
+        for column, (_, value) in zip(columns, sample):
+            column.append(value)
+
+    outs = dict(flatten(out)) if out is not None else {}
+    pairs = [(path, _collate_leaves(column, outs.get(path, None))) for path, column in zip(paths, columns)]
+    return_type = Tensor if all(torch.is_tensor(value) for _, value in pairs) else Object
+    return unflatten(pairs, return_type=return_type)
+
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+class TreeDataLoader(DataLoader):
+    """
+    Overview:
+        :class:`torch.utils.data.DataLoader` with :func:`tree_collate`, which prefetches the batches \
+        in a background thread. \
+        When ``device`` is given, the batches are also transferred by :class:`treetensor.torch.TransferPipeline` \
+        in the background thread, with one packed (and pinned) copy for each batch.
+
+    Arguments:
+        - dataset: Dataset of the samples.
+        - batch_size: Size of the batches, default is ``1``.
+        - prefetch (:obj:`int`): Number of the batches prefetched, ``0`` means no background thread, \
+            default is ``2``.
+        - device: Device of the batches, ``None`` means the batches are not transferred.
+        - pin_memory (:obj:`Optional[bool]`): Pin the staging buffers of the transfer, \
+            default is ``None`` which means the buffers are pinned when ``device`` is a cuda device.
+        - kwargs: Other arguments of :class:`torch.utils.data.DataLoader`, such as ``shuffle`` \
+            and ``num_workers``. The ``collate_fn`` is :func:`tree_collate` by default.
+
+    Examples::
+
+        >>> from treetensor.torch.utils.data import TreeDataLoader
+        >>> loader = TreeDataLoader(dataset, batch_size=64, shuffle=True, prefetch=4, device='cuda')
+        >>> for batch in loader:
+        ...     loss = model(batch.obs, batch.action)
+    """
+
+    def __init__(self, dataset, batch_size: Optional[int] = 1, prefetch: int = 2,
+                 device=None, pin_memory: Optional[bool] = None, **kwargs):
+        kwargs.setdefault('collate_fn', tree_collate)
+        DataLoader.__init__(self, dataset, batch_size, **kwargs)
+        if prefetch < 0:
+            raise ValueError(f'Prefetch should be no less than 0, but {prefetch!r} found.')
+        self.prefetch = prefetch
+        self.device = torch.device(device) if device is not None else None
+        self.transfer_pin_memory = pin_memory
+
+    def _batches(self):
+        iterator = DataLoader.__iter__(self)
+        if self.device is None:
+            return iterator
+        else:
+            return map(TransferPipeline(self.device, self.transfer_pin_memory), iterator)
+
+    def __iter__(self):
+        if not self.prefetch:
+            yield from self._batches()
+            return
+
+        q = queue.Queue(maxsize=self.prefetch)
+        stopped = threading.Event()
+
+        def _put(item):
+            while not stopped.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def _produce():
+            try:
+                for batch in self._batches():
+                    if not _put(batch):
+                        return
+            except BaseException as err:
+                _put(_Failure(err))
+            else:
+                _put(_END)
+
+        worker = threading.Thread(target=_produce, name='treetensor-prefetch', daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = q.get()
+                if item is _END:
+                    break
+                elif isinstance(item, _Failure):
+                    raise item.error
+                else:
+                    yield item
+        finally:
+            stopped.set()
+            worker.join()